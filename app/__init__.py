@@ -0,0 +1,8 @@
+def green():
+    """
+    Patches the standard library for eventlet, which the webservice runs on.
+    Call before importing any module that creates locks or thread-locals, so
+    that they cooperate with its green threads.
+    """
+    import eventlet
+    eventlet.monkey_patch()
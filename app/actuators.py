@@ -0,0 +1,105 @@
+import contextlib
+import threading
+import time
+import config
+import drivers
+import tenancy
+
+class Actuators(object):
+    """
+    Commands to the controls of one driver. Remembers the state each control
+    was last switched to, so that commands which would not change it are not
+    sent, and keeps a control in its state for at least +dwell+ seconds after
+    switching it unless forced. Commands given within `batch` are sent to the
+    driver together once it ends.
+    """
+
+    def __init__(self, driver, dwell=0.0):
+        self.driver = driver
+        self.dwell = dwell
+        # Whether each control is on, once it has been switched
+        self.states = {}
+        self.switched_at = {}
+        self.pending = None
+        # Called once the commands of the batch have been sent
+        self.callbacks = []
+        self.lock = threading.RLock()
+
+    def switch(self, name, on, force=False, then=None):
+        """
+        Switches control +name+ on (or off). Returns whether the control is,
+        or will be at the end of the batch, in that state; a control still
+        within its dwell time is left as it is unless +force+. +then+ is
+        called once the control is in that state, which within a batch is
+        after the batch has been sent, and not at all if sending it fails.
+        """
+        with self.lock:
+            if self.state(name) != on:
+                if not force and self.dwelling(name):
+                    return False
+                if self.pending is None:
+                    self._send({name: on})
+                else:
+                    self.pending[name] = on
+            if then is not None and self.pending is not None:
+                self.callbacks.append(then)
+                then = None
+        if then is not None:
+            then()
+        return True
+
+    def state(self, name):
+        """Whether control +name+ is (or is about to be) on, None if unknown"""
+        with self.lock:
+            if self.pending and name in self.pending:
+                return self.pending[name]
+            return self.states.get(name)
+
+    def dwelling(self, name):
+        with self.lock:
+            switched_at = self.switched_at.get(name)
+            return switched_at is not None and \
+                   time.time() - switched_at < self.dwell
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Sends the commands given within it in one call to the driver"""
+        with self.lock:
+            if self.pending is not None:
+                # Already batching; the outer batch sends these
+                yield self
+                return
+            self.pending = {}
+            try:
+                yield self
+            finally:
+                pending, self.pending = self.pending, None
+                callbacks, self.callbacks = self.callbacks, []
+                self._send(pending)
+        for callback in callbacks:
+            callback()
+
+    def _send(self, changes):
+        if not changes:
+            return
+        self.driver.control(
+            on=sorted(name for name, on in changes.items() if on),
+            off=sorted(name for name, on in changes.items() if not on))
+        # Only once the driver has taken them, so failures are retried
+        now = time.time()
+        for name, on in changes.items():
+            self.states[name] = on
+            self.switched_at[name] = now
+
+
+_actuators = {}
+_lock = threading.Lock()
+
+def current():
+    """The actuators of the current greenhouse"""
+    greenhouse = tenancy.current()
+    with _lock:
+        if greenhouse.name not in _actuators:
+            _actuators[greenhouse.name] = Actuators(drivers.current(),
+                                                    config.CONTROL_DWELL)
+        return _actuators[greenhouse.name]
@@ -0,0 +1,174 @@
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import jinja2
+from werkzeug.exceptions import NotFound
+from werkzeug.http import http_date, parse_etags, quote_etag
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+try:
+    import rjsmin
+except ImportError:
+    # Builds are left unminified where it is not installed
+    rjsmin = None
+
+# "js/app.0123456789.js" is "js/app.js" with that digest of its content
+FINGERPRINTED = re.compile(r"^(?P<base>.+)\.(?P<digest>[0-9a-f]{10})"
+                           r"(?P<ext>\.[^./]+)$")
+
+class Fingerprints(object):
+    """
+    Digests of the content of the files in +directory+, so that the name a
+    file is linked by changes whenever its content does. Digests are only
+    recomputed once a file has been modified.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        # Modification time and digest of each file, by its name
+        self.digests = {}
+
+    def path(self, filename):
+        """The path of +filename+ in the directory, None if it is not a file"""
+        path = safe_join(self.directory, filename)
+        if path is not None and os.path.isfile(path):
+            return path
+
+    def digest(self, filename):
+        """The digest of +filename+, None if it does not exist"""
+        path = self.path(filename)
+        if path is None:
+            return None
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            known = self.digests.get(filename)
+            if known is None or known[0] != mtime:
+                with open(path, "rb") as asset:
+                    known = (mtime, hashlib.md5(asset.read()).hexdigest()[:10])
+                self.digests[filename] = known
+            return known[1]
+
+    def fingerprinted(self, filename):
+        """The name to link +filename+ by, carrying its digest"""
+        digest = self.digest(filename)
+        if digest is None:
+            return filename
+        base, ext = os.path.splitext(filename)
+        return "{}.{}{}".format(base, digest, ext)
+
+    def resolve(self, name):
+        """
+        Returns the file a linked +name+ is for and the digest it was linked
+        with (None if it has none).
+        """
+        match = FINGERPRINTED.match(name)
+        if match:
+            filename = match.group("base") + match.group("ext")
+            if self.path(filename) is not None:
+                return filename, match.group("digest")
+        return name, None
+
+
+class StaticFiles(object):
+    """
+    Serves the files under +prefix+ from the +directory+ of +fingerprints+
+    without going through the application, so none of its request hooks run
+    for them. Files requested by their current fingerprinted name are cached
+    by clients for +max_age+ seconds, since that name changes with their
+    content; others must be revalidated by their ETag each time.
+    """
+
+    def __init__(self, app, fingerprints, prefix="/static/", max_age=0):
+        self.app = app
+        self.fingerprints = fingerprints
+        self.prefix = prefix
+        self.max_age = max_age
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if not path.startswith(self.prefix) or \
+           environ.get("REQUEST_METHOD") not in ("GET", "HEAD"):
+            return self.app(environ, start_response)
+        filename, digest = self.fingerprints.resolve(path[len(self.prefix):])
+        asset = self.fingerprints.path(filename)
+        if asset is None:
+            return NotFound()(environ, start_response)
+        current = self.fingerprints.digest(filename)
+        if digest == current:
+            cache_control = "public, max-age={}, immutable".format(
+                self.max_age)
+        else:
+            cache_control = "no-cache"
+        headers = [("Cache-Control", cache_control),
+                   ("ETag", quote_etag(current))]
+        if current in parse_etags(environ.get("HTTP_IF_NONE_MATCH")):
+            start_response("304 Not Modified", headers)
+            return []
+        mimetype = mimetypes.guess_type(filename)[0] or \
+                   "application/octet-stream"
+        headers += [("Content-Type", mimetype),
+                    ("Content-Length", str(os.path.getsize(asset))),
+                    ("Last-Modified", http_date(os.path.getmtime(asset)))]
+        start_response("200 OK", headers)
+        if environ["REQUEST_METHOD"] == "HEAD":
+            return []
+        return wrap_file(environ, open(asset, "rb"))
+
+
+def build(directory, bundles, minify=True):
+    """
+    Writes each of +bundles+ (the name of a script in +directory+ by the
+    names of the scripts it is made of, in order) and minifies it, unless
+    not +minify+ or rjsmin is not installed. Returns the names written.
+    """
+    for bundle, filenames in sorted(bundles.items()):
+        parts = []
+        for filename in filenames:
+            with open(safe_join(directory, filename), "rb") as script:
+                parts.append(script.read())
+        # Statements that end a script must not run on into the next
+        content = "\n;".join(parts)
+        if minify and rjsmin is not None:
+            content = rjsmin.jsmin(content)
+        path = safe_join(directory, bundle)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as script:
+            script.write(content)
+    return sorted(bundles)
+
+
+class BytecodeCache(jinja2.FileSystemBytecodeCache):
+    """
+    Cache of compiled templates kept in +directory+, which is only created
+    once a template is first written to it, so that merely importing the
+    webservice leaves nothing behind
+    """
+
+    def dump_bytecode(self, bucket):
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                # Created by another process in the meantime
+                if not os.path.isdir(self.directory):
+                    raise
+        super(BytecodeCache, self).dump_bytecode(bucket)
+
+def bytecode_cache(directory):
+    """A cache of compiled templates kept in +directory+"""
+    return BytecodeCache(directory)
+
+def compile_templates(environment):
+    """
+    Compiles every template of +environment+ ahead of its first render,
+    writing each to the bytecode cache of +environment+ (if it has one) for
+    later processes to load. Returns the names compiled.
+    """
+    names = environment.list_templates()
+    for name in names:
+        environment.get_template(name)
+    return names
@@ -0,0 +1,76 @@
+import itertools
+import zlib
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+class Compress(object):
+    """
+    Compresses the responses of +app+ that are of one of +mimetypes+ and at
+    least +minimum_size+ bytes long, with gzip or else deflate, whichever
+    the client accepts, at zlib +level+. Other responses are passed through
+    as they are, without being buffered.
+    """
+
+    def __init__(self, app, mimetypes=("application/json", "text/plain"),
+                 minimum_size=1024, level=6):
+        self.app = app
+        self.mimetypes = mimetypes
+        self.minimum_size = minimum_size
+        self.level = level
+
+    def __call__(self, environ, start_response):
+        encoding = self.encoding_for(environ)
+        if encoding is None:
+            return self.app(environ, start_response)
+        started = []
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            started[:] = [status, headers, exc_info]
+            return written.append
+
+        body = self.app(environ, capture)
+        chunks = iter(body)
+        # Applications may start their response on the first chunk only
+        first = list(itertools.islice(chunks, 1))
+        status, headers, exc_info = started
+        headers = Headers(headers)
+        if not self.compressible(status, headers):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return ClosingIterator(itertools.chain(written, first, chunks),
+                                   getattr(body, "close", None))
+        try:
+            content = b"".join(itertools.chain(written, first, chunks))
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+        headers.add("Vary", "Accept-Encoding")
+        if len(content) >= self.minimum_size:
+            content = self.compress(content, encoding)
+            headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(content))
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return [content]
+
+    def encoding_for(self, environ):
+        """The encoding to compress the response to the request with"""
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return None
+        accepted = parse_accept_header(environ.get("HTTP_ACCEPT_ENCODING"))
+        for encoding in ("gzip", "deflate"):
+            if accepted.quality(encoding) > 0:
+                return encoding
+
+    def compressible(self, status, headers):
+        mimetype = headers.get("Content-Type", "").split(";")[0].strip()
+        return mimetype in self.mimetypes and \
+               "Content-Encoding" not in headers and \
+               not status.startswith(("204", "304"))
+
+    def compress(self, content, encoding):
+        if encoding == "gzip":
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED,
+                                          16 + zlib.MAX_WBITS)
+            return compressor.compress(content) + compressor.flush()
+        return zlib.compress(content, self.level)
@@ -8,4 +8,69 @@ DEBUG = True
 SECRET_KEY = "development key"
 PORT = 5000
 PLANT_DATABASE = "greenhouse.conklins.net"
-NUMBER_OF_PLANTS = 2
+# Seconds clients may cache static files linked by their fingerprinted name
+STATIC_MAX_AGE = 365 * 24 * 3600
+# Responses (JSON and log downloads) and Socket.IO payloads of at least this
+# many bytes are compressed; responses at this zlib level
+COMPRESSION_THRESHOLD = 1024
+COMPRESSION_LEVEL = 6
+# Compiled CoffeeScript by the digest of its source, kept across deploys
+COFFEE_CACHE = os.environ.get("GREENHOUSE_COFFEE_CACHE", os.path.join(
+    os.path.expanduser("~"), ".cache", "greenhouse-webservice", "coffee"))
+# Scripts served as one minified file each in production, once built by
+# `setup.py build`, and otherwise as the files they are made of. Pages are
+# loaded into the layout by dynamicpage.js, so each page's script is a
+# bundle of its own, run only with that page.
+BUNDLES = {
+    "build/head.js": ["js/Chart.min.js", "js/flash.js",
+                      "js/bootstrap-switch.min.js",
+                      "js/jquery.timepicker.min.js"],
+    "build/body.js": ["js/modernizr.js", "js/dynamicpage.js"],
+    "build/plants/show.js": ["js/plants/show.js"],
+    "build/logs/index.js": ["js/logs/index.js"],
+    "build/plant_settings/index.js": ["js/plant_settings/index.js"],
+    "build/global_settings/index.js": ["js/global_settings/index.js"],
+}
+BUNDLE_ASSETS = False
+# Compiled templates by name and source, kept across deploys; None to keep
+# them in memory only. `setup.py build` and `setup.py production` use
+# BUILD_TEMPLATE_CACHE unless one is given; there templates are compiled
+# ahead of time and not checked for changes.
+TEMPLATE_CACHE = os.environ.get("GREENHOUSE_TEMPLATE_CACHE")
+BUILD_TEMPLATE_CACHE = os.path.join(
+    os.path.expanduser("~"), ".cache", "greenhouse-webservice", "templates")
+TEMPLATE_AUTO_RELOAD = True
+# Number of plant slots in the rack; set per deployment
+NUMBER_OF_PLANTS = int(os.environ.get("GREENHOUSE_NUMBER_OF_PLANTS", 2))
+# Sensor clusters read at once, and seconds before a poll of them all gives
+# up on the reads that have not finished
+SENSOR_POLL_WORKERS = 8
+SENSOR_POLL_TIMEOUT = 5.0
+# Seconds the notification settings of the Plant Database are kept, and the
+# seconds pages wait for them before showing those last fetched
+NOTIFICATION_SETTINGS_TTL = 60
+NOTIFICATION_SETTINGS_TIMEOUT = 0.5
+# Seconds a control is kept on (or off) by the control policies once switched
+CONTROL_DWELL = 60
+# Backend for sensors and controls: "hardware" (greenhouse_envmgmt over
+# I2C) or "simulated", with the settings of the simulator
+DRIVER = os.environ.get("GREENHOUSE_DRIVER", "hardware")
+SIMULATOR = {
+    "seed": 0,
+    "latency": 0.05,
+    "noise": 1.0,
+    "failure_rate": 0.01,
+    "step": 10.0,
+}
+# Greenhouses served by this process. Each has its own database, I2C bus,
+# background task intervals (in seconds, by runner) and optionally driver,
+# and is served under /greenhouses/<name>; the default greenhouse is also
+# served at /.
+DEFAULT_GREENHOUSE = "default"
+GREENHOUSES = {
+    DEFAULT_GREENHOUSE: {
+        "database": DATABASE,
+        "bus": 1,
+        "refresh": {},
+    },
+}
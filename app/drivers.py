@@ -0,0 +1,204 @@
+import contextlib
+import random
+import threading
+import time
+import config
+import tenancy
+from greenhouse_envmgmt.control import ControlCluster
+try:
+    # This will fail on systems without linux/types.h
+    import smbus
+    from greenhouse_envmgmt.sense import SensorCluster
+    import greenhouse_envmgmt.sense
+except:
+    # HACK so that SensorCluster is defined when the above import fails
+    # this is to allow automated testing even when smbus cannot be installed
+    smbus = None
+    SensorCluster = None
+    class greenhouse_envmgmt(object):
+        class sense(object):
+            class I2CBusError(Exception):
+                pass
+            class SensorError(Exception):
+                pass
+
+SensorError = greenhouse_envmgmt.sense.SensorError
+
+class HardwareDriver(object):
+    """
+    Sensors and controls of a greenhouse, driven over its I2C bus by
+    greenhouse_envmgmt. The library keeps the bus, and the control states of
+    every cluster, on its classes, so each driver's are swapped in while it
+    holds the (shared) lock.
+    """
+
+    lock = threading.RLock()
+
+    def __init__(self, bus=1):
+        self.bus_id = bus
+        self.bus = None
+        self.clusters = None
+
+    def sensor_values(self, slot_id):
+        with self.holding():
+            return SensorCluster(ID=slot_id).sensor_values()
+
+    def water_level(self):
+        """The fraction of the water tank that is full"""
+        with self.holding():
+            return SensorCluster.get_water_level()
+
+    def control(self, on=[], off=[]):
+        with self.holding() as cluster:
+            cluster.control(on=on, off=off)
+
+    @contextlib.contextmanager
+    def holding(self):
+        """Holds the bus of this driver, giving its ControlCluster"""
+        with HardwareDriver.lock:
+            if self.clusters is None:
+                self._open()
+            previous = self._swap(self.bus, self.clusters)
+            try:
+                yield self.clusters[0]
+            finally:
+                self._swap(*previous)
+
+    def _open(self):
+        if smbus:
+            self.bus = smbus.SMBus(self.bus_id)
+        # Give the cluster a list of its own to register in
+        previous = self._swap(self.bus, [])
+        try:
+            ControlCluster(1)
+            self.clusters = ControlCluster._list
+        finally:
+            self._swap(*previous)
+
+    @staticmethod
+    def _swap(bus, clusters):
+        previous = (ControlCluster.bus, ControlCluster._list)
+        ControlCluster.bus = bus
+        ControlCluster._list = clusters
+        if SensorCluster:
+            SensorCluster.bus = bus
+        return previous
+
+
+class SimulatedDriver(object):
+    """
+    Stands in for the hardware of a greenhouse. Each read advances the
+    simulated conditions of its slot by +step+ seconds, during which the
+    pump raises the soil moisture and drains the tank, the fan cools and
+    dries the air and the light brightens it, and otherwise conditions
+    drift back towards ambient. Reads take +latency+ seconds, carry
+    gaussian +noise+ and fail with probability +failure_rate+. Given the
+    same +seed+ and sequence of calls, the readings are the same.
+    """
+
+    lock = None
+
+    AMBIENT = {
+        "light": 25.0,
+        "water": 20.0,
+        "humidity": 67.0,
+        "temperature": 87.1,
+    }
+
+    # The value each condition approaches while a control is on, and the
+    # fraction of the way there it moves per second
+    RESPONSES = {
+        "pump": {"water": (100.0, 0.5)},
+        "fan": {"temperature": (60.0, 0.05), "humidity": (30.0, 0.1)},
+        "light": {"light": (90.0, 1.0), "temperature": (100.0, 0.01)},
+    }
+
+    # Fraction of the way back to ambient conditions move per second
+    DRIFT = 0.01
+
+    # Fraction of the tank the pump uses per second
+    PUMP_RATE = 0.001
+
+    def __init__(self, seed=0, latency=0.0, noise=0.0, failure_rate=0.0,
+                 step=10.0):
+        self.seed = seed
+        self.latency = latency
+        self.noise = noise
+        self.failure_rate = failure_rate
+        self.step = step
+        self.active = set()
+        self.tank = 1.0
+        self.slots = {}
+        self.guard = threading.Lock()
+
+    def sensor_values(self, slot_id):
+        time.sleep(self.latency)
+        with self.guard:
+            conditions, generator = self._slot(slot_id)
+            self._advance(conditions)
+            if generator.random() < self.failure_rate:
+                raise SensorError("Simulated failure of slot {}".format(
+                    slot_id))
+            return {
+                sensor: min(max(value + generator.gauss(0, self.noise),
+                                0.0), 100.0)
+                for sensor, value in sorted(conditions.items())
+            }
+
+    def water_level(self):
+        time.sleep(self.latency)
+        with self.guard:
+            return self.tank
+
+    def control(self, on=[], off=[]):
+        with self.guard:
+            self.active |= self._names(on)
+            self.active -= self._names(off)
+
+    def _slot(self, slot_id):
+        # Each slot has its own generator, so that its readings do not
+        # depend on the order in which slots are read
+        if slot_id not in self.slots:
+            self.slots[slot_id] = (dict(SimulatedDriver.AMBIENT),
+                                   random.Random((self.seed, slot_id)))
+        return self.slots[slot_id]
+
+    def _advance(self, conditions):
+        for sensor in conditions:
+            responses = [self.RESPONSES[control][sensor]
+                         for control in sorted(self.active)
+                         if sensor in self.RESPONSES[control]]
+            for target, rate in responses or [(self.AMBIENT[sensor],
+                                               self.DRIFT)]:
+                # Approach the target exponentially
+                weight = min(rate * self.step, 1.0)
+                conditions[sensor] += (target - conditions[sensor]) * weight
+        if "pump" in self.active:
+            self.tank = max(self.tank - self.PUMP_RATE * self.step, 0.0)
+
+    @staticmethod
+    def _names(controls):
+        names = set(SimulatedDriver.RESPONSES)
+        if controls == "all":
+            return names
+        if isinstance(controls, str):
+            controls = [controls]
+        return set(controls) & names
+
+
+BACKENDS = {
+    "hardware": lambda greenhouse: HardwareDriver(bus=greenhouse.bus),
+    "simulated": lambda greenhouse: SimulatedDriver(**config.SIMULATOR),
+}
+
+_drivers = {}
+_lock = threading.Lock()
+
+def current():
+    """The driver of the current greenhouse, built on first use"""
+    greenhouse = tenancy.current()
+    with _lock:
+        if greenhouse.name not in _drivers:
+            _drivers[greenhouse.name] = \
+                BACKENDS[greenhouse.driver or config.DRIVER](greenhouse)
+        return _drivers[greenhouse.name]
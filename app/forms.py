@@ -1,5 +1,7 @@
+import collections
 from datetime import time
 import models
+import services
 
 class GlobalSettingsForm(object):
 
@@ -11,7 +13,15 @@ class GlobalSettingsForm(object):
     def data(self):
         def to_bool(onoff):
             return onoff == "on"
-        controls = {control: self._data_for(control.id)
+        enabled = map(int, self.form_data.getlist('enabled'))
+        # Times are only submitted for enabled controls, in the same order
+        periods = {}
+        times = zip(self.form_data.getlist('active_start'),
+                    self.form_data.getlist('active_end'))
+        for control_id, period in zip(enabled, times):
+            periods.setdefault(control_id, period)
+        enabled = set(enabled)
+        controls = {control: self._data_for(control.id, enabled, periods)
                     for control in self.controls}
         return dict(controls,
                     notifications={
@@ -25,25 +35,15 @@ class GlobalSettingsForm(object):
                     })
 
     def submit(self):
-        for control, data in self.data.items():
-            if control == "notifications":
-                models.PlantDatabase.update_notification_settings(data)
-            elif control == "global_settings":
-                models.GlobalSetting.notify_plants = data['notify_plants']
-                models.GlobalSetting.notify_maintenance = \
-                    data['notify_maintenance']
-            else:
-                control.update(**data)
-                control.save()
+        data = self.data
+        notifications = data.pop("notifications")
+        global_settings = data.pop("global_settings")
+        # The controls and global settings are saved together
+        models.GlobalSetting.update_all(data, **global_settings)
+        services.notification_settings.update(notifications)
 
-    def _data_for(self, control_id):
-        enabled = map(int, self.form_data.getlist('enabled'))
-        active_starts = self.form_data.getlist('active_start')
-        active_ends = self.form_data.getlist('active_end')
-        data = zip(active_starts, active_ends, enabled)
-        as_val, ae_val = next(((astart, aend)
-                              for astart, aend, id in data
-                              if int(id) == control_id), ('', ''))
+    def _data_for(self, control_id, enabled, periods):
+        as_val, ae_val = periods.get(control_id, ('', ''))
         active_start = self._parse_timestamp(as_val)
         active_end = self._parse_timestamp(ae_val)
         return {
@@ -62,3 +62,77 @@ class GlobalSettingsForm(object):
         elif ampm == "AM" and hours == 12:
             hours = 0
         return time(hours, minutes)
+
+
+class PlantSettingsForm(object):
+    """
+    The notification thresholds of the plant settings form, parsed once
+    into rows. A row is only saved if it is neither deleted, nor blank, nor
+    has errors: fields left empty in a row that was partly filled in, or
+    values the threshold would not be valid with.
+    """
+
+    FIELDS = ("attribute", "deviation_percent", "deviation_time",
+              "threshold_id", "delete")
+
+    Row = collections.namedtuple("Row", ["id", "attributes", "deleted",
+                                         "blank", "errors"])
+
+    def __init__(self, form_data):
+        self.form_data = form_data
+        self.rows = [self._parse(*fields) for fields in
+                     zip(*[form_data.getlist(field) for field in self.FIELDS])]
+
+    @property
+    def valid(self):
+        return not any(row.errors for row in self.rows if not row.deleted)
+
+    @property
+    def deleted_ids(self):
+        return [row.id for row in self.rows
+                if row.deleted and row.id is not None]
+
+    @property
+    def new_thresholds(self):
+        """The attributes of each threshold to create"""
+        return [row.attributes for row in self._saved() if row.id is None]
+
+    @property
+    def old_thresholds(self):
+        """The id and attributes of each existing threshold to update"""
+        return [(row.id, row.attributes) for row in self._saved()
+                if row.id is not None]
+
+    def _saved(self):
+        return [row for row in self.rows
+                if not (row.deleted or row.blank or row.errors)]
+
+    def _parse(self, attr, percent, time, threshold_id, deleted):
+        values = {'sensor_name': attr, 'deviation_percent': percent,
+                  'deviation_time': time}
+        blank = attr == percent == time == ""
+        errors = {}
+        attributes = None
+        if not blank:
+            errors = {name: "is empty" for name, value in values.items()
+                      if value == ""}
+        if not (blank or errors):
+            try:
+                attributes = {
+                    'sensor_name': str(attr),
+                    'deviation_percent': int(float(percent)),
+                    'deviation_time': float(time),
+                }
+            except ValueError:
+                errors = {'deviation_percent': "is not a number",
+                          'deviation_time': "is not a number"}
+            else:
+                invalid = {}
+                models.NotificationThreshold(**attributes).is_valid(
+                    attrs=invalid)
+                errors = {name: "is invalid" for name in invalid}
+        return self.Row(id=int(threshold_id) if threshold_id else None,
+                        attributes=attributes,
+                        deleted=deleted != "false",
+                        blank=blank,
+                        errors=errors)
@@ -9,14 +9,20 @@
     :license: MIT, see LICENSE for more details.
 """
 
-import os, subprocess
+import collections, hashlib, os, shutil, subprocess, threading, time
 
-def livecompile(app):
-    @app.before_request
-    def _render_coffee():
-        precompile(app)
+def livecompile(app, interval=1.0, cache_dir=None):
+    # Compile in a background thread rather than before each request, so
+    # requests never walk the static tree or wait on the compiler
+    precompile(app, cache_dir)
+    watcher = Watcher(static_dir(app), interval, cache_dir)
+    watcher.start()
+    return watcher
 
-def precompile(app):
+def precompile(app, cache_dir=None):
+    return compile_stale(static_dir(app), cache_dir)
+
+def static_dir(app):
     if not hasattr(app, 'static_url_path'):
         from warnings import warn
         warn(DeprecationWarning('static_path is called '
@@ -28,24 +34,124 @@ def precompile(app):
     else:
         static_url_path = app.static_url_path
 
-    static_dir = app.root_path + app.static_url_path
-
+    return app.root_path + static_url_path
 
+def sources(static_dir):
     coffee_paths = []
     for path, subdirs, filenames in os.walk(static_dir):
         coffee_paths.extend([
             os.path.join(path, f)
             for f in filenames if os.path.splitext(f)[1] == '.coffee'
         ])
+    return coffee_paths
+
+def js_path_for(coffee_path):
+    return os.path.splitext(coffee_path)[0] + '.js'
+
+def is_stale(coffee_path):
+    # CHASE: FIXED issue where the js_path had a .coffee extension
+    # that resulted in compilation every time...
+    js_path = js_path_for(coffee_path)
+    if not os.path.isfile(js_path):
+        js_mtime = -1
+    else:
+        js_mtime = os.path.getmtime(js_path)
+    coffee_mtime = os.path.getmtime(coffee_path)
+    return coffee_mtime >= js_mtime
+
+class Compilation(collections.namedtuple("Compilation",
+                                          ["compiled", "cached", "failed",
+                                           "seconds"])):
+    """
+    The sources compiled, copied from the cache and left stale because
+    they could not be compiled by compile_stale
+    """
+
+    def __str__(self):
+        report = "Compiled {} CoffeeScript sources ({} from cache) in " \
+                 "{:.2f}s".format(len(self.compiled) + len(self.cached),
+                                  len(self.cached), self.seconds)
+        if self.failed:
+            report += "; could not compile {}".format(", ".join(self.failed))
+        return report
 
+def cache_path_for(cache_dir, coffee_path):
+    with open(coffee_path, 'rb') as source:
+        digest = hashlib.sha1(source.read()).hexdigest()
+    return os.path.join(cache_dir, digest + '.js')
+
+def compile_stale(static_dir, cache_dir=None, skip=()):
+    """
+    Compiles the sources under +static_dir+ that changed (but those in
+    +skip+), all in one run of the compiler. With a +cache_dir+, output is
+    kept there by the digest of its source, and sources that have been
+    compiled before (by an earlier deploy, say) are copied from it instead.
+    Returns a Compilation.
+    """
+    started = time.time()
+    stale = [path for path in sources(static_dir)
+             if path not in skip and is_stale(path)]
+    cached = []
+    if cache_dir:
+        for coffee_path in stale:
+            cache_path = cache_path_for(cache_dir, coffee_path)
+            if os.path.isfile(cache_path):
+                shutil.copyfile(cache_path, js_path_for(coffee_path))
+                cached.append(coffee_path)
+    compiled = [path for path in stale if path not in cached]
+    failed = []
+    if compiled:
+        # Starting the compiler takes far longer than compiling a file
+        if subprocess.call(['coffee', '-c'] + compiled, shell=False) != 0:
+            # The compiler stops at the first source it cannot compile, so
+            # those it did not get to are compiled on their own
+            failed = [path for path in compiled if is_stale(path) and
+                      subprocess.call(['coffee', '-c', path],
+                                      shell=False) != 0]
+            compiled = [path for path in compiled if path not in failed]
+        if cache_dir:
+            _store(cache_dir, [path for path in compiled
+                               if not is_stale(path)])
+    return Compilation(compiled, cached, failed, time.time() - started)
+
+def _store(cache_dir, coffee_paths):
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
     for coffee_path in coffee_paths:
-        # CHASE: FIXED issue where the js_path had a .coffee extension
-        # that resulted in compilation every time...
-        js_path = os.path.splitext(coffee_path)[0] + '.js'
-        if not os.path.isfile(js_path):
-            js_mtime = -1
-        else:
-            js_mtime = os.path.getmtime(js_path)
-        coffee_mtime = os.path.getmtime(coffee_path)
-        if coffee_mtime >= js_mtime:
-            subprocess.call(['coffee', '-c', coffee_path], shell=False)
+        shutil.copyfile(js_path_for(coffee_path),
+                        cache_path_for(cache_dir, coffee_path))
+
+class Watcher(threading.Thread):
+    """
+    Compiles the sources under +static_dir+ every +interval+ seconds. Those
+    that could not be compiled are not tried again until they change.
+    """
+
+    daemon = True
+
+    def __init__(self, static_dir, interval=1.0, cache_dir=None):
+        super(Watcher, self).__init__(name="coffee-watcher")
+        self.static_dir = static_dir
+        self.interval = interval
+        self.cache_dir = cache_dir
+        self.stopped = threading.Event()
+        # Modification time of each source that could not be compiled
+        self.failed = {}
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.failed = {path: mtime
+                               for path, mtime in self.failed.items()
+                               if os.path.getmtime(path) == mtime}
+                compilation = compile_stale(self.static_dir, self.cache_dir,
+                                            set(self.failed))
+                for path in compilation.failed:
+                    self.failed[path] = os.path.getmtime(path)
+            except OSError:
+                # A file was removed while we looked at it; try again
+                self.failed = {}
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
@@ -2,13 +2,31 @@ import datetime
 import urllib2
 import requests
 import json
+import collections
+import itertools
 from config import PLANT_DATABASE, NUMBER_OF_PLANTS
 import lazy_record
 from lazy_record.validations import *
 from lazy_record.associations import *
 import support
 import services
-
+import readings
+import stats
+import preload
+import settings
+
+def save_together(records):
+    """
+    Saves +records+ (not their related records) in one transaction, where
+    their save would commit each on its own.
+    """
+    with lazy_record.repo.Repo.db:
+        for record in records:
+            record._do_save()
+    for record in records:
+        record._finish_save()
+
+@preload.eager
 @has_one("plant_setting")
 @has_many("sensor_data_points")
 class Plant(lazy_record.Base):
@@ -30,21 +48,32 @@ class Plant(lazy_record.Base):
     }
 
     __validates__ = {
-        "slot_id": lambda record: unique(record, "slot_id") and \
-                                  record.slot_id in
-                                  range(1, NUMBER_OF_PLANTS + 1),
+        "slot_id": lambda record: 1 <= record.slot_id <= NUMBER_OF_PLANTS \
+                                  and unique(record, "slot_id"),
     }
 
     def record_sensor(self, sensor_name, sensor_value):
         points = getattr(self.sensor_data_points, sensor_name)()
         points.build(sensor_value=sensor_value).save()
 
+    def recent(self, sensor_name, count=1):
+        """Returns the last +count+ values of +sensor_name+, newest first"""
+        return readings.recent.last(self.id, sensor_name, count)
+
+    def current_values(self):
+        """
+        Returns a dictionary of the current value of every sensor (0 if there
+        are no readings), fetched together.
+        """
+        values = readings.recent.current(self.id, SensorDataPoint.SENSORS)
+        return {sensor: value or 0 for sensor, value in values.items()}
+
     def __getattr__(self, attr):
         if attr in SensorDataPoint.SENSORS:
             # Asking for a sensor value
-            point = getattr(self.sensor_data_points, attr)().last()
-            if point:
-                return point.sensor_value
+            values = self.recent(attr)
+            if values:
+                return values[0]
             else:
                 return 0
         else:
@@ -67,13 +96,29 @@ class Plant(lazy_record.Base):
         return self.mature_in == Plant.Mature
 
     @classmethod
-    def for_slot(Plant, slot_id, raise_if_not_found=True):
+    def for_slot(Plant, slot_id, raise_if_not_found=True, include=()):
+        """
+        Returns the plant in slot +slot_id+, with the associations in
+        +include+ preloaded (see preload.include).
+        """
         try:
-            return Plant.find_by(slot_id=slot_id)
+            plant = Plant.find_by(slot_id=slot_id)
+            preload.include([plant], include)
+            return plant
         except lazy_record.RecordNotFound:
             if raise_if_not_found:
                 raise
 
+    @classmethod
+    def for_slots(Plant, slot_ids):
+        """
+        Returns the plant in each of +slot_ids+ (None for empty slots), in
+        order, fetched in one query.
+        """
+        plants = {plant.slot_id: plant
+                  for plant in Plant.where(slot_id=list(slot_ids))}
+        return [plants.get(slot_id) for slot_id in slot_ids]
+
     @classmethod
     def from_json(Plant, json_object):
         plant = Plant(**json_object)
@@ -87,9 +132,11 @@ class Plant(lazy_record.Base):
                 # Remove all sensor data points in one transaction
                 lazy_record.repo.Repo("sensor_data_points"
                     ).where(plant_id=self.id).delete()
+            readings.recent.discard(self.id)
 
         super(Plant, self).destroy()
 
+@preload.eager
 @belongs_to("plant")
 class SensorDataPoint(lazy_record.Base):
 
@@ -115,11 +162,104 @@ class SensorDataPoint(lazy_record.Base):
         "sensor_name": lambda record: record.sensor_name in SensorDataPoint.SENSORS
     }
 
+    Reading = collections.namedtuple("Reading", ["created_at",
+                                                 "sensor_name",
+                                                 "sensor_value"])
+
+    @classmethod
+    def values(cls, plant_id, sensor_name=None, since=None):
+        """
+        Iterates over the readings of the plant with id +plant_id+ (of only
+        +sensor_name+, and only after +since+, if given) oldest first, as
+        read-only Reading tuples rather than records.
+        """
+        rows = cls._scan(plant_id, sensor_name, since, cls.Reading._fields)
+        return itertools.imap(cls.Reading._make, rows)
+
+    @classmethod
+    def column(cls, column, plant_id, sensor_name=None, since=None):
+        """Like `values`, but iterates over the values of +column+ alone"""
+        rows = cls._scan(plant_id, sensor_name, since, [column])
+        return (row[0] for row in rows)
+
+    @classmethod
+    def window(cls, plant_id, sensor_name, since=None):
+        """The values of +sensor_name+ as a stats.Window (see `values`)"""
+        return stats.Window(cls.column("sensor_value", plant_id,
+                                       sensor_name, since))
+
+    @classmethod
+    def _scan(cls, plant_id, sensor_name, since, columns):
+        restrictions = {"plant_id": plant_id}
+        if sensor_name is not None:
+            restrictions["sensor_name"] = sensor_name
+        custom_restrictions = []
+        if since is not None:
+            custom_restrictions.append(("created_at > ?", since))
+        return lazy_record.repo.Repo("sensor_data_points").where(
+                   custom_restrictions, **restrictions
+               ).order_by(id="asc").select(*columns)
+
+    def save(self):
+        new_record = self.id is None
+        super(SensorDataPoint, self).save()
+        if new_record:
+            readings.recent.record(self.plant_id, self.sensor_name,
+                                   self.sensor_value)
+
+@preload.eager
 @has_many("notification_thresholds")
 @belongs_to("plant")
 class PlantSetting(lazy_record.Base):
-    pass
 
+    def replace_thresholds(self, thresholds):
+        """
+        Makes +thresholds+ (the attributes of each, with the id of those that
+        already exist) the notification thresholds of the setting, in one
+        transaction: those left out are destroyed, new ones created and
+        changed ones updated. Raises RecordInvalid, changing nothing, if any
+        is invalid, and RecordNotFound for the id of another setting's.
+        Returns the thresholds as they are then.
+        """
+        current = {threshold.id: threshold
+                   for threshold in self.notification_thresholds}
+        kept, created, changed = set(), [], []
+        for attributes in thresholds:
+            attributes = dict(attributes)
+            id = attributes.pop("id", None)
+            threshold = NotificationThreshold(**attributes)
+            threshold.validate()
+            if id is None:
+                created.append(threshold)
+                continue
+            id = int(id)
+            if id not in current:
+                raise lazy_record.RecordNotFound({"id": id})
+            kept.add(id)
+            values = {attr: getattr(threshold, attr) for attr in attributes}
+            if any(getattr(current[id], attr) != value
+                   for attr, value in values.items()):
+                changed.append((id, values))
+        deleted = [id for id in current if id not in kept]
+        now = datetime.datetime.today()
+        Repo = lazy_record.repo.Repo
+        with Repo.db:
+            if deleted:
+                Repo("notification_thresholds").where(id=deleted).delete()
+            for id, values in changed:
+                Repo("notification_thresholds").where(id=id).update(
+                    updated_at=now, **values)
+            for threshold in created:
+                Repo("notification_thresholds").insert(
+                    plant_setting_id=self.id,
+                    sensor_name=threshold.sensor_name,
+                    deviation_percent=threshold.deviation_percent,
+                    deviation_time=threshold.deviation_time,
+                    triggered_at=threshold.triggered_at,
+                    created_at=now, updated_at=now)
+        return self.notification_thresholds
+
+@preload.eager
 @belongs_to("plant_setting")
 class NotificationThreshold(lazy_record.Base):
 
@@ -147,6 +287,10 @@ class NotificationThreshold(lazy_record.Base):
         return self.plant.sensor_data_points.where(
             sensor_name=self.sensor_name)
 
+    def window(self, since=None):
+        """Values of the sensor recorded after +since+, as a stats.Window"""
+        return SensorDataPoint.window(self.plant.id, self.sensor_name, since)
+
     @property
     def plant(self):
         return self.plant_setting.plant
@@ -221,9 +365,21 @@ class PlantDatabase(object):
         else:
             return None
 
+    @classmethod
+    def plants_params(PlantDatabase, ids, filter=[]):
+        """
+        The params of each plant of +ids+ by its id, all fetched in one
+        request for the catalog. Plants no longer in it are left out.
+        """
+        ids = set(ids)
+        response = PlantDatabase._get_response("plants")
+        return {params["id"]: PlantDatabase._filter_params(params,
+                                                           list(filter))
+                for params in response if params["id"] in ids}
+
     @classmethod
     def add_device(PlantDatabase, device_id):
-        token = Token.last()
+        token = Token.current()
         if not token:
             return None
         params = {"token": token.token, "device_id": device_id}
@@ -231,17 +387,19 @@ class PlantDatabase(object):
 
     @classmethod
     def update_notification_settings(PlantDatabase, settings):
-        token = Token.last()
+        """The response of the Plant Database, None if nothing was sent"""
+        token = Token.current()
         if not token:
             return None
         params = dict(settings, token=token.token)
-        PlantDatabase._post_request("api/notification_settings", params)
+        return PlantDatabase._post_request("api/notification_settings",
+                                           params)
 
     @classmethod
     def get_notification_settings(PlantDatabase):
         def raise_error():
             raise PlantDatabase.CannotConnect
-        token = Token.last()
+        token = Token.current()
         if not token:
             raise PlantDatabase.CannotConnect
         params = {'token': token.token}
@@ -275,7 +433,25 @@ class Token(lazy_record.Base):
 
     @classmethod
     def refresh(Token):
-        Token.get(token=Token.last().token)
+        Token.get(token=Token.current().token)
+
+    @classmethod
+    def current(Token):
+        """The newest token, held in settings.store"""
+        return settings.store.fetch("token", Token.last)
+
+    def save(self):
+        new_record = self.id is None
+        # Tokens have no related records, so this is all Base.save would do;
+        # the older tokens are deleted in the same transaction
+        with lazy_record.repo.Repo.db:
+            if new_record:
+                # Only the newest token is ever used
+                lazy_record.repo.Repo("tokens").delete()
+            self._do_save()
+        self._finish_save()
+        if new_record:
+            settings.store.put("token", self)
 
 
 class WaterLevel(lazy_record.Base):
@@ -285,12 +461,18 @@ class WaterLevel(lazy_record.Base):
 
     @classmethod
     def current(cls):
-        record = cls.last()
+        record = settings.store.fetch("water_level", cls.last)
         if record:
             return record.level
         else:
             return None
 
+    def save(self):
+        new_record = self.id is None
+        super(WaterLevel, self).save()
+        if new_record:
+            settings.store.put("water_level", self)
+
 
 class GlobalSetting(lazy_record.Base):
 
@@ -299,42 +481,75 @@ class GlobalSetting(lazy_record.Base):
         'notify_maintenance': bool,
     }
 
+    # Settings are read from settings.store, which save keeps up to date
+
     class __metaclass__(lazy_record.Base.__metaclass__):
 
+        @property
+        def singleton(cls):
+            return settings.store.fetch("global_setting", cls.last)
+
         @property
         def notify_plants(cls):
-            return cls.last().notify_plants
+            return cls.singleton.notify_plants
 
         @notify_plants.setter
         def notify_plants(cls, value):
-            singleton = cls.last()
+            singleton = cls.singleton
             singleton.notify_plants = value
             singleton.save()
 
         @property
         def notify_maintenance(cls):
-            return cls.last().notify_maintenance
+            return cls.singleton.notify_maintenance
 
         @notify_maintenance.setter
         def notify_maintenance(cls, value):
-            singleton = cls.last()
+            singleton = cls.singleton
             singleton.notify_maintenance = value
             singleton.save()
 
         @property
         def controls(cls):
-            return Control.all()
+            return settings.store.fetch(
+                "controls", lambda: settings.Records(Control.all()))
 
         @property
         def enabled_controls(cls):
-            return Control.where(enabled=True)
+            # As enabled was stored, including those temporarily disabled
+            return settings.Records(control for control in cls.controls
+                                    if control._enabled)
 
         def control(cls, control):
             try:
-                return Control.find_by(name=control)
+                return cls.controls.find_by(name=control)
             except lazy_record.RecordNotFound:
                 return None
 
+    @classmethod
+    def update_all(GlobalSetting, controls, **attributes):
+        """
+        Updates the global setting with +attributes+ and each of +controls+
+        (a dict of the attributes to update by Control), saving them all in
+        one transaction. If saving fails, both are dropped from the store,
+        whose records have already been changed.
+        """
+        singleton = GlobalSetting.singleton
+        with settings.store.writing("controls"), \
+             settings.store.writing("global_setting"):
+            singleton.update(**attributes)
+            for control, control_attributes in controls.items():
+                control.update(**control_attributes)
+            save_together(list(controls) + [singleton])
+        for control in controls:
+            settings.store.put_record("controls", control)
+        settings.store.put("global_setting", singleton)
+
+    def save(self):
+        with settings.store.writing("global_setting"):
+            super(GlobalSetting, self).save()
+        settings.store.put("global_setting", self)
+
 class Control(lazy_record.Base):
 
     class Always(object):
@@ -395,16 +610,31 @@ class Control(lazy_record.Base):
             return ''
         return self.active_end.strftime("%I:%M %p")
 
-    def activate(self):
-        self.disabled_at = None
-        self.active = True
-        services.Control(self.name).on()
-        self.save()
-
-    def deactivate(self):
-        self.active = False
-        services.Control(self.name).off()
-        self.save()
+    def activate(self, force=True):
+        """
+        Turns the control on, unless it was switched too recently and not
+        +force+ (see services.Control). Returns whether it is on. It is
+        saved as on only once the command has been sent, which within a
+        batch (see actuators.Actuators.batch) is when the batch ends.
+        """
+        return services.Control(self.name).on(force=force,
+                                              then=self._switched_on)
+
+    def deactivate(self, force=True):
+        """As activate, but turning the control off"""
+        return services.Control(self.name).off(force=force,
+                                               then=self._switched_off)
+
+    def _switched_on(self):
+        if self.active is not True or self.disabled_at is not None:
+            self.disabled_at = None
+            self.active = True
+            self.save()
+
+    def _switched_off(self):
+        if self.active is not False:
+            self.active = False
+            self.save()
 
     def _set_time(self, attr, value):
         if value is not None:
@@ -420,8 +650,20 @@ class Control(lazy_record.Base):
         else:
             super(Control, self).__setattr__(attr, value)
 
+    def save(self):
+        with settings.store.writing("controls"):
+            super(Control, self).save()
+        settings.store.put_record("controls", self)
+
+    def destroy(self):
+        super(Control, self).destroy()
+        settings.store.remove_record("controls", self)
+
     def temporarily_disable(self):
         self.disabled_at = datetime.datetime.now()
+        if self.active is False:
+            # deactivate has nothing to change, so won't save
+            self.save()
         self.deactivate()
 
     @property
@@ -465,11 +707,5 @@ class PlantConditions(object):
     def average_value_of(self, sensor):
         values = []
         for plant in self.plants:
-            datapoints = list(plant.sensor_data_points
-                                   .where(sensor_name=sensor)
-                                   .last(PlantConditions.points))
-            for value in datapoints:
-                values.append(value.sensor_value)
-        if len(values) == 0:
-            return None
-        return sum(values) / len(values)
+            values.extend(plant.recent(sensor, PlantConditions.points))
+        return stats.Window(values).mean()
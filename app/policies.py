@@ -9,11 +9,9 @@ class NotificationPolicy(object):
     def relevant_points(self):
         hour_delta = int(self.notification_threshold.deviation_time)
         minute_delta = (self.notification_threshold.deviation_time % 1) * 60
-        return self.notification_threshold\
-                   .sensor_data_points\
-                   .where("created_at > ?",
-                          datetime.datetime.now() - datetime.timedelta(
-                              hours=hour_delta, minutes=minute_delta))
+        return self.notification_threshold.window(
+            datetime.datetime.now() - datetime.timedelta(hours=hour_delta,
+                                                         minutes=minute_delta))
 
     def _get_metric(self, kind):
         return getattr(self.notification_threshold.plant,
@@ -33,26 +31,22 @@ class NotificationPolicy(object):
 
     def already_triggered(self):
         low_threshold, high_threshold = self.thresholds()
-        points = self.notification_threshold\
-                     .sensor_data_points\
-                     .where("created_at > ?",
-                            self.notification_threshold.triggered_at)
-        return all(p.sensor_value > high_threshold or
-                   p.sensor_value < low_threshold for
-                   p in points)
+        points = self.notification_threshold.window(
+            self.notification_threshold.triggered_at)
+        return points.all_out_of_band(low_threshold, high_threshold)
 
     def should_notify(self):
         low_threshold, high_threshold = self.thresholds()
         return not self.already_triggered() and \
-               all(p.sensor_value > high_threshold or
-                   p.sensor_value < low_threshold for
-                   p in self.relevant_points())
+               self.relevant_points().all_out_of_band(low_threshold,
+                                                      high_threshold)
 
 class TokenRefreshPolicy(object):
 
     def _token_older_than(self, if_none=False, **kwargs):
-        if models.Token.last():
-            return (models.Token.last().created_at + \
+        token = models.Token.current()
+        if token:
+            return (token.created_at + \
                     datetime.timedelta(**kwargs)) < datetime.datetime.today()
         else:
             return if_none
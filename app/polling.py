@@ -0,0 +1,90 @@
+import contextlib
+import threading
+import time
+import Queue
+import tenancy
+
+class Poll(object):
+    """One read of a plant's sensors by a Poller"""
+
+    def __init__(self, plant):
+        self.plant = plant
+        self.values = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class Poller(object):
+    """
+    Reads the sensors of many plants concurrently, through at most +workers+
+    threads. +read+ is called with each plant and returns its sensor values.
+    A poll takes at most +timeout+ seconds: reads that fail, or that have
+    not finished by then, are skipped, and reads not yet started are not
+    started at all. Where the hardware cannot be read concurrently,
+    +lock_for+ gives the lock to hold while reading a plant (e.g. that of
+    its bus).
+
+    The timeout can only be kept while reads let other threads run. Under
+    eventlet, a read that blocks in C (as smbus reads do) holds up every
+    green thread, this one included, until it returns.
+    """
+
+    class Timeout(Exception):
+        pass
+
+    def __init__(self, read, workers=8, timeout=5.0, lock_for=None):
+        self.read = read
+        self.workers = workers
+        self.timeout = timeout
+        self.lock_for = lock_for or (lambda plant: None)
+
+    def poll(self, plants):
+        """Returns (plant, values) for each plant that was read in time"""
+        polls = [Poll(plant) for plant in plants]
+        if not polls:
+            return []
+        queue = Queue.Queue()
+        for poll in polls:
+            queue.put(poll)
+        greenhouse = tenancy.current()
+        deadline = time.time() + self.timeout
+        for _ in range(min(self.workers, len(polls))):
+            worker = threading.Thread(target=self._work,
+                                      args=(queue, greenhouse, deadline))
+            worker.daemon = True
+            worker.start()
+        for poll in polls:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            poll.done.wait(remaining)
+        return [(poll.plant, poll.values) for poll in polls
+                if poll.done.is_set() and poll.error is None]
+
+    def _work(self, queue, greenhouse, deadline):
+        with tenancy.activate(greenhouse):
+            while True:
+                try:
+                    poll = queue.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    with self._holding(self.lock_for(poll.plant)):
+                        if time.time() >= deadline:
+                            raise Poller.Timeout(poll.plant)
+                        values = self.read(poll.plant)
+                    if time.time() > deadline:
+                        raise Poller.Timeout(poll.plant)
+                    poll.values = values
+                except Exception as error:
+                    poll.error = error
+                poll.done.set()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _holding(lock):
+        if lock is None:
+            yield
+        else:
+            with lock:
+                yield
@@ -0,0 +1,147 @@
+import collections
+import lazy_record
+from lazy_record.associations import (associations_for, foreign_keys_for,
+                                      model_from_name, inflector)
+
+class IdentityMap(object):
+    """
+    Holds at most one instance of each record (by model and id), so that
+    records shared between several preloads are only fetched once.
+    """
+
+    def __init__(self):
+        self.records = {}
+
+    def add(self, record):
+        """Returns the instance held for +record+, holding it if new"""
+        return self.records.setdefault((record.__class__, record.id), record)
+
+    def get(self, model, id):
+        return self.records.get((model, id))
+
+
+def eager(klass):
+    """
+    Class decorator (placed above lazy_record's association decorators) that
+    makes the association properties of +klass+ return preloaded records,
+    where `preload` has set them, instead of querying.
+    """
+    for name in associations_for(klass):
+        association = klass.__dict__.get(name)
+        if isinstance(association, property):
+            foreign_key = foreign_keys_for(klass).get(name)
+            if foreign_key not in klass.__attributes__:
+                foreign_key = None
+            setattr(klass, name,
+                    property(_getter(name, association.fget, foreign_key),
+                             _setter(name, association.fset)))
+    return klass
+
+def preload(records, association, identity_map=None):
+    """
+    Loads +association+ for every one of +records+ (all of one model) in a
+    single query, so that reading it from any of them does not query again.
+    +association+ may be a belongs_to, has_one or has_many without a
+    through; preloaded has_many associations are lists rather than queries.
+    Returns the associated records that were loaded.
+    """
+    records = [record for record in records if record is not None]
+    if not records:
+        return []
+    identity_map = identity_map or IdentityMap()
+    model = records[0].__class__
+    if associations_for(model).get(association) is not None:
+        raise ValueError("Cannot preload '{}' of {} through '{}'".format(
+            association, model.__name__, associations_for(model)[association]))
+    foreign_key = foreign_keys_for(model)[association]
+    associated = model_from_name(association)
+    if foreign_key in model.__attributes__:
+        return _preload_parents(records, association, associated,
+                                foreign_key, identity_map)
+    return _preload_children(records, association, associated,
+                             foreign_key, identity_map)
+
+def include(records, paths, identity_map=None):
+    """
+    Preloads each of the dotted association +paths+ (e.g.
+    "plant_setting.plant") for +records+, one query per association, and
+    returns +records+ as a list.
+    """
+    records = list(records)
+    identity_map = identity_map or IdentityMap()
+    for path in paths:
+        loaded = records
+        for association in path.split("."):
+            loaded = preload(loaded, association, identity_map)
+    return records
+
+def _preload_parents(records, association, parent, foreign_key,
+                     identity_map):
+    ids = set(getattr(record, foreign_key) for record in records)
+    ids.discard(None)
+    missing = [id for id in ids if identity_map.get(parent, id) is None]
+    if missing:
+        for record in lazy_record.Query(parent).where(id=missing):
+            identity_map.add(record)
+    for record in records:
+        _set(record, association,
+             identity_map.get(parent, getattr(record, foreign_key)))
+    return [identity_map.get(parent, id) for id in ids
+            if identity_map.get(parent, id) is not None]
+
+def _preload_children(records, association, child, foreign_key,
+                      identity_map):
+    ids = [record.id for record in records if record.id is not None]
+    children = collections.defaultdict(list)
+    loaded = []
+    if ids:
+        query = lazy_record.Query(child).where(**{foreign_key: ids})
+        for record in query.order_by(id="asc"):
+            record = identity_map.add(record)
+            children[getattr(record, foreign_key)].append(record)
+            loaded.append(record)
+    singular = inflector.singularize(association) == association
+    inverse = _inverse(records[0].__class__, child, foreign_key)
+    for record in records:
+        found = children[record.id]
+        if inverse:
+            for loaded_child in found:
+                _set(loaded_child, inverse, record)
+        if singular:
+            _set(record, association, found[0] if found else None)
+        else:
+            _set(record, association, found)
+    return loaded
+
+def _inverse(parent, child, foreign_key):
+    # The belongs_to of +child+ that points back at +parent+, if any
+    name = inflector.singularize(lazy_record.repo.Repo.table_name(parent))
+    if name in associations_for(child) and \
+       associations_for(child)[name] is None and \
+       foreign_keys_for(child).get(name) == foreign_key:
+        return name
+
+def _set(record, association, value):
+    if "_preloaded" not in record.__dict__:
+        record._preloaded = {}
+    record._preloaded[association] = value
+
+def _getter(name, load, foreign_key):
+    def get(record):
+        preloaded = record.__dict__.get("_preloaded", {})
+        if name in preloaded:
+            value = preloaded[name]
+            # A parent is stale once the foreign key has been changed
+            if foreign_key is None or \
+               getattr(record, foreign_key) == getattr(value, "id", None):
+                return value
+        return load(record)
+    return get
+
+def _setter(name, assign):
+    if assign is None:
+        return None
+    def set(record, value):
+        record.__dict__.get("_preloaded", {}).pop(name, None)
+        assign(record, value)
+    return set
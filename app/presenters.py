@@ -1,14 +1,39 @@
 import models
+import collections
 import re
 from datetime import datetime
 
 class PlantPresenter(object):
 
+    Vital = collections.namedtuple("Vital", ["value",
+                                             "bar_width",
+                                             "error_bar_width",
+                                             "within_tolerance",
+                                             "over_ideal"])
+
     def __init__(self, plant):
         self.plant = plant
+        self._current_values = None
+        self._vitals = {}
+
+    def current_value(self, metric):
+        """
+        Returns the current value of +metric+. All of them are fetched at
+        once, the first time one is needed.
+        """
+        if self._current_values is None:
+            self._current_values = self.plant.current_values()
+        return self._current_values[metric]
+
+    def vital(self, metric):
+        """Returns the Vital view model for +metric+, computed once"""
+        if metric not in self._vitals:
+            self._vitals[metric] = self._vital(metric,
+                                               self.current_value(metric))
+        return self._vitals[metric]
 
     def formatted_value(self, metric):
-        value = getattr(self.plant, metric)
+        value = self.current_value(metric)
         if metric == "humidity":
             return "{0:0.1f}%".format(value)
         elif metric == "temperature":
@@ -32,17 +57,16 @@ class PlantPresenter(object):
         return lower_limit < current < upper_limit
 
     def bar_width(self, metric):
-        return self._bar_width(*self._get_params(metric))
+        return self.vital(metric).bar_width
 
     def error_bar_width(self, metric):
-        return self._error_bar_width(*self._get_params(metric))
+        return self.vital(metric).error_bar_width
 
     def within_tolerance(self, metric):
-        return self._within_tolerance(*self._get_params(metric))
+        return self.vital(metric).within_tolerance
 
     def over_ideal(self, metric):
-        ideal, current, tolerance = self._get_params(metric)
-        return current > ideal
+        return self.vital(metric).over_ideal
 
     def icon_for(self, metric):
         icons = {
@@ -76,9 +100,19 @@ class PlantPresenter(object):
         else:
             return 0.0
 
-    def _get_params(self, metric):
+    def _vital(self, metric, current):
+        params = self._get_params(metric, current)
+        ideal, normalized_current, tolerance = params
+        return PlantPresenter.Vital(value=current,
+                                    bar_width=self._bar_width(*params),
+                                    error_bar_width=self._error_bar_width(
+                                        *params),
+                                    within_tolerance=self._within_tolerance(
+                                        *params),
+                                    over_ideal=normalized_current > ideal)
+
+    def _get_params(self, metric, current):
         # normalize values so that ideal is 50%
-        current = getattr(self.plant, metric)
         ideal = getattr(self.plant, metric + "_ideal")
         tolerance = getattr(self.plant, metric + "_tolerance")
         normalized_current = ((current * 50.0) / ideal)
@@ -98,7 +132,7 @@ class LogDataPresenter(object):
                 time=point.created_at.strftime("%d/%b/%Y:%H:%M:%S"),
                 name=point.sensor_name,
                 value=point.sensor_value)
-            for point in self.plant.sensor_data_points) + "\n"
+            for point in models.SensorDataPoint.values(self.plant.id)) + "\n"
 
 class ChartDataPresenter(object):
 
@@ -130,22 +164,14 @@ class ChartDataPresenter(object):
 
     def ideal_chart_data(self):
         def sensor_data_for(sensor):
-            ideal_points = getattr(self.plant.sensor_data_points, sensor)()
-            points = getattr(self.plant.sensor_data_points, sensor)()
+            points = models.SensorDataPoint.window(self.plant.id, sensor)
             ideal = getattr(self.plant, "{}_ideal".format(sensor))
             tolerance = getattr(self.plant, "{}_tolerance".format(sensor))
-            within_tolerance_count = len(ideal_points.where(
-                "sensor_value >= ? AND sensor_value <= ?",
-                ideal - tolerance,
-                ideal + tolerance))
-            total_count = len(points)
             colors = ChartDataPresenter.formats.get(sensor,
                 ChartDataPresenter.formats["default"])
-            if total_count > 0:
-                percent_within_tolerance = int(
-                    round(float(within_tolerance_count) * 100.0 / total_count))
-            else:
-                percent_within_tolerance = 0
+            percent_within_tolerance = int(round(
+                points.within_band_fraction(ideal - tolerance,
+                                            ideal + tolerance) * 100.0))
             return {
                 "label": sensor.title(),
                 "value": percent_within_tolerance,
@@ -157,8 +183,7 @@ class ChartDataPresenter(object):
     def history_chart_data_for(self, sensor):
         # For some reason, it is getting 2 new points per cycle -- caused by being in debug mode
         num_points = 8
-        points = getattr(self.plant.sensor_data_points, sensor)().last(num_points)
-        data = [point.sensor_value for point in points]
+        data = self.plant.recent(sensor, num_points)
         return  {
                     "labels": [""] * num_points,
                     "datasets": [
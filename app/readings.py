@@ -0,0 +1,136 @@
+import threading
+from array import array
+from itertools import chain
+import lazy_record
+import tenancy
+
+class RingBuffer(object):
+    """Fixed-size buffer of the most recent readings for one sensor"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = array('d', [0.0] * size)
+        self.count = 0
+        # Index of the slot the next reading is written to
+        self.head = 0
+
+    def append(self, value):
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def last(self, count=1):
+        """Returns up to +count+ of the most recent values, newest first"""
+        values = self.values
+        size = self.size
+        head = self.head
+        return [values[(head - i) % size]
+                for i in range(1, min(count, self.count) + 1)]
+
+    def __len__(self):
+        return self.count
+
+
+class RecentReadings(object):
+    """
+    In-memory store of a RingBuffer per (plant, sensor), so that reads of a
+    small recent window don't go to the database. Buffers are loaded from
+    the database the first time they are read and kept up to date by
+    SensorDataPoint.save.
+    """
+
+    size = 16
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffers = {}
+        # The buffers of each connection (one per greenhouse)
+        self.stores = tenancy.PerConnection(dict)
+
+    def last(self, plant_id, sensor_name, count=1):
+        """
+        Returns up to +count+ of the most recent values of +sensor_name+ for
+        the plant with id +plant_id+, newest first.
+        """
+        if plant_id is None:
+            return []
+        with self.lock:
+            return self._buffer(plant_id, sensor_name).last(count)
+
+    def current(self, plant_id, sensor_names):
+        """
+        Returns a dictionary of the most recent value of each of
+        +sensor_names+ (None if there is none) for the plant with id
+        +plant_id+, loading any buffers that are missing in one query.
+        """
+        if plant_id is None:
+            return dict.fromkeys(sensor_names)
+        with self.lock:
+            self._load_missing(plant_id, sensor_names)
+            buffers = self._buffers()
+            return {sensor_name: (buffers[(plant_id, sensor_name)].last(1)
+                                  or [None])[0]
+                    for sensor_name in sensor_names}
+
+    def record(self, plant_id, sensor_name, value):
+        """Adds a reading that has just been saved to the database"""
+        with self.lock:
+            buffer = self._buffers().get((plant_id, sensor_name))
+            # Buffers that have not been loaded yet will pick this reading
+            # up from the database when they are
+            if buffer is not None:
+                buffer.append(value)
+
+    def warm(self, plant_ids, sensor_names):
+        """Loads the buffers for all +plant_ids+ and +sensor_names+"""
+        with self.lock:
+            for plant_id in plant_ids:
+                self._load_missing(plant_id, sensor_names)
+
+    def discard(self, plant_id):
+        """Drops the buffers for the plant with id +plant_id+"""
+        with self.lock:
+            buffers = self._buffers()
+            for key in [key for key in buffers if key[0] == plant_id]:
+                del buffers[key]
+
+    def clear(self):
+        """Drops the buffers of the current connection"""
+        with self.lock:
+            self._buffers().clear()
+
+    def _buffers(self):
+        # Buffers are only valid for the connection they were loaded from
+        self.buffers = self.stores.get()
+        return self.buffers
+
+    def _buffer(self, plant_id, sensor_name):
+        self._load_missing(plant_id, [sensor_name])
+        return self._buffers()[(plant_id, sensor_name)]
+
+    def _load_missing(self, plant_id, sensor_names):
+        buffers = self._buffers()
+        missing = [sensor_name for sensor_name in sensor_names
+                   if (plant_id, sensor_name) not in buffers]
+        if missing:
+            for sensor_name, buffer in self._load(plant_id, missing):
+                buffers[(plant_id, sensor_name)] = buffer
+
+    def _load(self, plant_id, sensor_names):
+        # The newest +size+ rows of each sensor, in a single query
+        query = " union all ".join(
+            ["select * from (select sensor_name, sensor_value "
+             "from sensor_data_points "
+             "where plant_id == ? and sensor_name == ? "
+             "order by id desc limit ?)"] * len(sensor_names))
+        args = list(chain(*[(plant_id, sensor_name, self.size)
+                            for sensor_name in sensor_names]))
+        rows = lazy_record.repo.Repo.db.execute(query, args).fetchall()
+        buffers = {sensor_name: RingBuffer(self.size)
+                   for sensor_name in sensor_names}
+        for sensor_name, value in reversed(rows):
+            buffers[sensor_name].append(value)
+        return buffers.items()
+
+recent = RecentReadings()
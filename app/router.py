@@ -1,7 +1,27 @@
+import threading
+import timeit
+from werkzeug.routing import Map, MapAdapter
+
 class Router(object):
+
+    # URL (after the base URL) and method of each action
+    actions = {
+        'index': ('', 'GET'),
+        'new': ('/new', 'GET'),
+        'create': ('', 'POST'),
+        'show': ('/<id>', 'GET'),
+        'edit': ('/<id>/edit', 'GET'),
+        'update': ('/<id>', 'POST'), # Change to PATCH?
+        'destroy': ('/<id>', 'DELETE'),
+        # Replaces the whole collection; only routed when asked for
+        'replace': ('', 'PUT'),
+    }
+
     def __init__(self, app):
         self.app = app
-    
+        # Match requests against the routes through a RouteTable
+        app.url_map = RouteTable.from_map(app.url_map)
+
     def route(router_instance, base_url, only=[], exclude=[]):
 
         class route_decorator(object):
@@ -16,42 +36,29 @@ class Router(object):
                 self.app = router_instance.app
 
             def __call__(self, klass):
-                defined_methods = [method for method in dir(klass)
-                                   if not method.startswith("__")]
-                mappings = {
-                    'index': (self.base_url, 'GET'),
-                    'new': (self.base_url + '/new', 'GET'),
-                    'create': (self.base_url, 'POST'),
-                    'show': (self.base_url + "/<id>", 'GET'),
-                    'edit': (self.base_url + "/<id>/edit", 'GET'),
-                    'update': (self.base_url + "/<id>", 'POST'), # Change to PATCH?
-                    'destroy': (self.base_url + "/<id>", 'DELETE')
-                }
                 for method in self.methods:
-                    action = getattr(klass, method)
-                    action.__name__ = "{}.{}".format(
-                        klass.__name__, action.__name__)
-                    mapping = mappings[method][0]
-                    html_method = mappings[method][1]
-                    wrapped_action = self.app.route(mapping,
-                                                    methods=[html_method])(action)
-                    wrapped_action = staticmethod(wrapped_action)
-                    setattr(klass, method, wrapped_action)
-                for method in defined_methods:
-                    action = getattr(klass, method)
+                    end_url, html_method = Router.actions[method]
+                    self.register(klass, method, self.base_url + end_url,
+                                  html_method)
+                for method, action in vars(klass).items():
                     if hasattr(action, "EP"):
                         html_method, end_url = action.EP
-                        action = action.__func__
                         del action.EP
-                        action.__name__ = "{}.{}".format(
-                            klass.__name__, action.__name__)
-                        wrapped_action = self.app.route(
-                            self.base_url + "/" + end_url,
-                            methods=[html_method])(action)
-                        wrapped_action = staticmethod(wrapped_action)
-                        setattr(klass, method, wrapped_action)
+                        self.register(klass, method,
+                                      self.base_url + "/" + end_url,
+                                      html_method)
                 return klass
 
+            def register(self, klass, method, url, html_method):
+                # Actions are looked up on the class, as static methods
+                action = vars(klass)[method]
+                if not isinstance(action, staticmethod):
+                    action = staticmethod(action)
+                    setattr(klass, method, action)
+                self.app.add_url_rule(url,
+                                      "{}.{}".format(klass.__name__, method),
+                                      action.__func__, methods=[html_method])
+
         return route_decorator(base_url, only, exclude)
 
     def endpoint(router_instance, end_url, method="GET"):
@@ -61,8 +68,158 @@ class Router(object):
         return wrapper
 
     def root(self, controller, action):
-        action_func = getattr(controller, action)
-        wrapped_action = self.app.route("/")(action_func)
-        wrapped_action = staticmethod(action)
-        setattr(controller, action, wrapped_action)
+        self.app.add_url_rule("/", "{}.{}".format(controller.__name__, action),
+                              getattr(controller, action))
+
+
+class RouteTable(Map):
+    """
+    Map that compiles its rules into a trie of the static segments they
+    begin with (e.g. "api" then "plants" for /api/plants/<plant_id>), so that
+    a path is only matched against the rules along its branch rather than
+    against all of them.
+    """
+
+    @classmethod
+    def from_map(cls, url_map):
+        table = cls(default_subdomain=url_map.default_subdomain,
+                    charset=url_map.charset,
+                    strict_slashes=url_map.strict_slashes,
+                    redirect_defaults=url_map.redirect_defaults,
+                    sort_parameters=url_map.sort_parameters,
+                    sort_key=url_map.sort_key,
+                    encoding_errors=url_map.encoding_errors,
+                    host_matching=url_map.host_matching)
+        table.converters = url_map.converters.copy()
+        for rule in url_map.iter_rules():
+            table.add(rule.empty())
+        return table
+
+    def __init__(self, *args, **kwargs):
+        self.trie = None
+        self.trie_lock = threading.Lock()
+        super(RouteTable, self).__init__(*args, **kwargs)
+
+    def add(self, rulefactory):
+        super(RouteTable, self).add(rulefactory)
+        self.trie = None
+
+    def update(self):
+        super(RouteTable, self).update()
+        if self.trie is None:
+            with self.trie_lock:
+                if self.trie is None:
+                    self.trie = self._compile()
+
+    def candidates(self, path_info):
+        """The rules that +path_info+ could match, in matching order"""
+        return self.branch(path_info)._rules
+
+    def branch(self, path_info):
+        # The map to match +path_info+ against: just the rules of its branch
+        self.update()
+        node = self.trie
+        for segment in path_info.lstrip("/").split("/"):
+            if segment not in node.children:
+                return node.rules
+            node = node.children[segment]
+        # A rule ending in a slash matches (redirects) the path without it
+        return node.rules_with_slash
+
+    def bind(self, *args, **kwargs):
+        adapter = super(RouteTable, self).bind(*args, **kwargs)
+        adapter.__class__ = RouteAdapter
+        return adapter
+
+    def _compile(self):
+        root = _Node()
+        for rule in self._rules:
+            node = root
+            for segment in _static_segments(rule.rule):
+                node = node.children.setdefault(segment, _Node())
+            node.own.append(rule)
+        order = {id(rule): index for index, rule in enumerate(self._rules)}
+        root.finish(self, [], order)
+        return root
+
+
+class RouteAdapter(MapAdapter):
+    """Adapter of a RouteTable, matching against the candidate rules only"""
+
+    def match(self, path_info=None, method=None, return_rule=False,
+              query_args=None):
+        table = self.map
+        path = self.path_info if path_info is None else path_info
+        # Adapters are bound per request, so this is seen by no other thread;
+        # URLs are still built against the whole table
+        self.map = table.branch(path or "/")
+        try:
+            return super(RouteAdapter, self).match(path_info, method,
+                                                   return_rule, query_args)
+        finally:
+            self.map = table
+
+
+class _Rules(object):
+    # Stands in for the map of a MapAdapter, giving it only +rules+ to match
+    # against
+
+    def __init__(self, url_map, rules):
+        self.url_map = url_map
+        self._rules = rules
+        # Read on every match, so not left to __getattr__
+        self.charset = url_map.charset
+        self.host_matching = url_map.host_matching
+        self.redirect_defaults = url_map.redirect_defaults
+
+    def update(self):
+        pass
+
+    def __getattr__(self, attr):
+        return getattr(self.url_map, attr)
+
+
+class _Node(object):
+
+    def __init__(self):
+        self.children = {}
+        # Rules whose static segments end here
+        self.own = []
+
+    def finish(self, url_map, inherited, order):
+        # Every rule that a path reaching this node could match
+        rules = sorted(inherited + self.own, key=lambda rule: order[id(rule)])
+        self.rules = _Rules(url_map, rules)
+        slashed = self.children.get("")
+        self.rules_with_slash = self.rules if slashed is None else _Rules(
+            url_map, sorted(rules + slashed.own,
+                            key=lambda rule: order[id(rule)]))
+        for child in self.children.values():
+            child.finish(url_map, rules, order)
+
+def _static_segments(rule):
+    segments = []
+    for segment in rule.lstrip("/").split("/"):
+        if "<" in segment:
+            break
+        segments.append(segment)
+    return segments
 
+def routes(url_map, number=1000):
+    """
+    Lists the method, rule and endpoint of each route of +url_map+, with the
+    seconds taken to match a request to it, and to do so by checking every
+    rule in turn as werkzeug's own Map does.
+    """
+    table = url_map.bind("localhost")
+    linear = Map([rule.empty() for rule in url_map.iter_rules()],
+                 converters=url_map.converters).bind("localhost")
+    listing = []
+    for rule in sorted(url_map.iter_rules(), key=lambda rule: rule.rule):
+        path = rule.build({argument: 1 for argument in rule.arguments})[1]
+        method = sorted(rule.methods - {"HEAD", "OPTIONS"})[0]
+        seconds = [min(timeit.repeat(lambda: adapter.match(path, method),
+                                     number=number, repeat=3)) / number
+                   for adapter in (table, linear)]
+        listing.append((method, rule.rule, rule.endpoint) + tuple(seconds))
+    return listing
@@ -0,0 +1,50 @@
+import datetime
+import json
+import flask
+from werkzeug.http import http_date
+try:
+    import simplejson
+except ImportError:
+    # The standard library's encoder is used, with its C speedups
+    simplejson = None
+
+def default(value):
+    """A value JSON has a type for, standing in for +value+"""
+    if isinstance(value, datetime.datetime):
+        # As flask.jsonify gives them, which clients already parse
+        return http_date(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if hasattr(value, "__html__"):
+        return unicode(value.__html__())
+    raise TypeError("{!r} is not JSON serializable".format(value))
+
+
+class Serializer(object):
+    """
+    Encodes values as JSON with +module+ (json, or anything with its dumps
+    and loads), including dates and times. Output is compact and keys are
+    left unsorted, so that the C encoder of the module is used rather than
+    the pure Python one flask.jsonify ends up in by pretty-printing.
+    """
+
+    mimetype = "application/json"
+
+    def __init__(self, module=json):
+        self.module = module
+
+    def dumps(self, value, **kwargs):
+        kwargs.setdefault("separators", (",", ":"))
+        return self.module.dumps(value, default=default, **kwargs)
+
+    def loads(self, data, **kwargs):
+        return self.module.loads(data, **kwargs)
+
+    def jsonify(self, *args, **kwargs):
+        """A response of the dict of +args+ and +kwargs+, as flask.jsonify"""
+        return flask.current_app.response_class(
+            self.dumps(dict(*args, **kwargs)), mimetype=self.mimetype)
+
+
+serializer = Serializer(simplejson or json)
+jsonify = serializer.jsonify
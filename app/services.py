@@ -1,25 +1,13 @@
 import datetime
+import threading
+import time
 import requests
+import config
 from config import PLANT_DATABASE
 import models
-from greenhouse_envmgmt.control import ControlCluster
-try:
-    # This will fail on systems without linux/types.h
-    import smbus
-    from greenhouse_envmgmt.sense import SensorCluster
-    import greenhouse_envmgmt.sense
-    ControlCluster.bus = smbus.SMBus(1)
-    SensorCluster.bus = ControlCluster.bus
-except:
-    # HACK so that SensorCluster is defined when the above import fails
-    # this is to allow automated testing even when smbus cannot be installed
-    SensorCluster = None
-    class greenhouse_envmgmt(object):
-        class sense(object):
-            class I2CBusError(Exception):
-                pass
-            class SensorError(Exception):
-                pass
+import drivers
+import actuators
+import tenancy
 
 class Notifier(object):
 
@@ -31,7 +19,7 @@ class Notifier(object):
         self.callback = callback
 
     def notify(self):
-        token = models.Token.last()
+        token = models.Token.current()
         if token:
             self.data['token'] = token.token
         else:
@@ -74,53 +62,162 @@ class PlantUpdater(object):
     def __init__(self, plant):
         self.plant = plant
 
-    def update(self):
-        try:
-            plant_data = models.PlantDatabase.plant_params(
-                self.plant.plant_database_id,
-                filter=['maturity'])
-            self.plant.update(**plant_data)
-            self.plant.save()
-            return True
-        except:
+    @classmethod
+    def update_all(PlantUpdater, plants):
+        """
+        Refreshes +plants+ from the Plant Database with one request, saving
+        only those it changed, in one transaction. Returns the plants saved.
+        """
+        plants = list(plants)
+        params = models.PlantDatabase.plants_params(
+            [plant.plant_database_id for plant in plants],
+            filter=['maturity'])
+        changed = [plant for plant in plants
+                   if plant.plant_database_id in params and
+                      PlantUpdater(plant).apply(
+                          params[plant.plant_database_id])]
+        models.save_together(changed)
+        return changed
+
+    def apply(self, plant_data):
+        """
+        Updates the plant with +plant_data+, ignoring fields that plants do
+        not have; returns whether it changed
+        """
+        plant_data = {attr: value for attr, value in plant_data.items()
+                      if attr in models.Plant.__attributes__}
+        fetched = models.Plant(**plant_data)
+        if all(getattr(self.plant, attr) == getattr(fetched, attr)
+               for attr in plant_data):
             return False
+        self.plant.update(**plant_data)
+        return True
 
 class Control(object):
-    """Wrapper for greenhouse_envmgmt Control API"""
-
-    cluster = ControlCluster(1)
+    """
+    Wrapper for the controls of the current greenhouse's driver. Unless
+    +force+, a control switched less than config.CONTROL_DWELL seconds ago is
+    left as it is; returns whether the control is in the requested state.
+    +then+ is called once it is (see actuators.Actuators.switch).
+    """
 
     def __init__(self, name):
         self.name = name
 
-    def on(self):
-        Control.cluster.control(on=self.name)
+    def on(self, force=True, then=None):
+        return actuators.current().switch(self.name, True, force=force,
+                                          then=then)
 
-    def off(self):
-        Control.cluster.control(off=self.name)
+    def off(self, force=True, then=None):
+        return actuators.current().switch(self.name, False, force=force,
+                                          then=then)
 
 class Sensor(object):
-    """Wrapper for greenhouse_envmgmt Sensor API"""
+    """Wrapper for the sensors of the current greenhouse's driver"""
 
     def __init__(self, plant):
         self.plant = plant
 
-    def get_values(self):
-        try:
-            cluster = SensorCluster(ID=self.plant.slot_id)
-            values = cluster.sensor_values()
-            for sensor, value in values.items():
-                self.plant.record_sensor(sensor, value)
-        except:
-            # Something has gone wrong
-            # (module disconnected, had an error collecting, etc.)
-            # Don't let it crash the webserver.
-            pass
+    def read(self):
+        return drivers.current().sensor_values(self.plant.slot_id)
+
+    def record(self, values):
+        for sensor, value in values.items():
+            self.plant.record_sensor(sensor, value)
 
     @classmethod
     def get_water_level(cls):
         try:
-            level = SensorCluster.get_water_level()
+            level = drivers.current().water_level()
             models.WaterLevel.create(level=level*100)
         except:
             pass
+
+
+class NotificationSettings(object):
+    """
+    The notification settings of the Plant Database, kept for +ttl+ seconds
+    once fetched. They are fetched in a thread of their own, which `start`
+    starts, so that other work can be done meanwhile; `get` then waits at
+    most +timeout+ seconds before giving the settings last fetched instead.
+    Only when none have been fetched yet does it wait for the Plant
+    Database, raising PlantDatabase.CannotConnect if it cannot be reached.
+    """
+
+    class Fetch(object):
+
+        def __init__(self):
+            self.settings = None
+            self.error = None
+            self.done = threading.Event()
+
+    def __init__(self, ttl=60, timeout=0.5):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        # The settings, when they were fetched and the fetch under way
+        self.states = tenancy.PerConnection(
+            lambda: {"settings": None, "fetched_at": None, "fetch": None})
+
+    def start(self):
+        """
+        Starts fetching the settings, unless they are fresh. Returns the
+        Fetch under way, None if they are fresh.
+        """
+        with self.lock:
+            state = self.states.get()
+            fresh = state["fetched_at"] is not None and \
+                    time.time() - state["fetched_at"] < self.ttl
+            if fresh or state["fetch"] is not None:
+                return state["fetch"]
+            fetch = state["fetch"] = NotificationSettings.Fetch()
+        worker = threading.Thread(target=self._fetch,
+                                  args=(state, fetch, tenancy.current()))
+        worker.daemon = True
+        worker.start()
+        return fetch
+
+    def get(self):
+        """The settings, as fresh as the Plant Database answers in time"""
+        fetch = self.start()
+        state = self.states.get()
+        if fetch is not None:
+            if state["settings"] is None:
+                fetch.done.wait()
+                if fetch.error is not None:
+                    raise fetch.error
+            else:
+                fetch.done.wait(self.timeout)
+        return dict(state["settings"])
+
+    def update(self, settings):
+        """
+        Sends +settings+ to the Plant Database, keeping them once it has
+        taken them. Returns whether it has.
+        """
+        response = models.PlantDatabase.update_notification_settings(settings)
+        if response is None or not response.ok:
+            return False
+        with self.lock:
+            state = self.states.get()
+            if state["settings"] is not None:
+                state["settings"] = dict(state["settings"], **settings)
+        return True
+
+    def _fetch(self, state, fetch, greenhouse):
+        with tenancy.activate(greenhouse):
+            try:
+                fetch.settings = \
+                    models.PlantDatabase.get_notification_settings()
+            except Exception as error:
+                fetch.error = error
+        with self.lock:
+            if fetch.error is None:
+                state["settings"] = fetch.settings
+                state["fetched_at"] = time.time()
+            state["fetch"] = None
+        fetch.done.set()
+
+notification_settings = NotificationSettings(
+    ttl=config.NOTIFICATION_SETTINGS_TTL,
+    timeout=config.NOTIFICATION_SETTINGS_TIMEOUT)
@@ -0,0 +1,109 @@
+import contextlib
+import threading
+import lazy_record
+import tenancy
+
+class Records(list):
+    """Records held in memory, answering the lookups of a query"""
+
+    def find(self, id):
+        # Ids from URLs are strings, which the database would have cast
+        try:
+            id = int(id)
+        except (TypeError, ValueError):
+            raise lazy_record.RecordNotFound({"id": id})
+        return self.find_by(id=id)
+
+    def find_by(self, **kwargs):
+        for record in self.where(**kwargs):
+            return record
+        raise lazy_record.RecordNotFound(kwargs)
+
+    def where(self, **kwargs):
+        return Records(record for record in self
+                       if all(getattr(record, attr) == value
+                              for attr, value in kwargs.items()))
+
+
+class SettingsStore(object):
+    """
+    In-memory copy of the settings of each greenhouse (the GlobalSetting,
+    its Controls and the latest WaterLevel), so that reading them doesn't
+    go to the database. Each is loaded the first time it is read, then
+    written through by the save of its model, which also notifies the
+    listeners subscribed to changes.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.stores = tenancy.PerConnection(dict)
+        self.listeners = []
+
+    def fetch(self, key, load):
+        """The value of +key+, loaded by calling +load+ if not yet held"""
+        with self.lock:
+            store = self.stores.get()
+            if key not in store:
+                store[key] = load()
+            return store[key]
+
+    def put(self, key, value):
+        """Holds +value+ as the value of +key+ once it has been saved"""
+        with self.lock:
+            self.stores.get()[key] = value
+        self._notify(key, value)
+
+    def put_record(self, key, record):
+        """Holds saved +record+ in the Records of +key+, if they are held"""
+        with self.lock:
+            records = self.stores.get().get(key)
+            if records is not None:
+                index = next((i for i, held in enumerate(records)
+                              if held.id == record.id), None)
+                if index is None:
+                    records.append(record)
+                else:
+                    records[index] = record
+        self._notify(key, record)
+
+    def remove_record(self, key, record):
+        """Drops destroyed +record+ from the Records of +key+"""
+        with self.lock:
+            records = self.stores.get().get(key)
+            if records is not None:
+                records[:] = [held for held in records
+                              if held.id != record.id]
+        self._notify(key, record)
+
+    @contextlib.contextmanager
+    def writing(self, key):
+        """
+        Drops +key+ if saving a change to it within fails, since the value
+        held may already have been changed in memory.
+        """
+        try:
+            yield
+        except Exception:
+            self.invalidate(key)
+            raise
+
+    def invalidate(self, key):
+        """Drops +key+, so that it is loaded again when next read"""
+        with self.lock:
+            self.stores.get().pop(key, None)
+
+    def clear(self):
+        """Drops the settings of the current greenhouse"""
+        with self.lock:
+            self.stores.get().clear()
+
+    def subscribe(self, listener):
+        """Calls +listener+ with the key and value of every change"""
+        self.listeners.append(listener)
+        return listener
+
+    def _notify(self, key, value):
+        for listener in list(self.listeners):
+            listener(key, value)
+
+store = SettingsStore()
@@ -0,0 +1,94 @@
+try:
+    import numpy
+except ImportError:
+    # Fall back to plain python on systems where numpy cannot be installed
+    numpy = None
+
+class Window(object):
+    """
+    The values of one sensor over a period of time, held as an array so that
+    statistics over them are computed without building records.
+    """
+
+    def __init__(self, values):
+        if numpy:
+            self.values = numpy.fromiter(values, dtype=float)
+        else:
+            self.values = [float(value) for value in values]
+
+    def __len__(self):
+        return len(self.values)
+
+    def mean(self):
+        """Returns the mean value, or None if the window is empty"""
+        if len(self) == 0:
+            return None
+        if numpy:
+            return float(self.values.mean())
+        return sum(self.values) / len(self.values)
+
+    def percentile(self, percent):
+        """
+        Returns the +percent+ (0-100) percentile, linearly interpolating
+        between values, or None if the window is empty
+        """
+        if len(self) == 0:
+            return None
+        if numpy:
+            return float(numpy.percentile(self.values, percent))
+        values = sorted(self.values)
+        rank = (len(values) - 1) * percent / 100.0
+        lower = int(rank)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+    def within_band_fraction(self, low, high):
+        """
+        Returns the fraction of values between +low+ and +high+ (inclusive),
+        or 0.0 if the window is empty
+        """
+        if len(self) == 0:
+            return 0.0
+        if numpy:
+            values = self.values
+            return float(numpy.count_nonzero((values >= low) &
+                                             (values <= high))) / len(values)
+        within = sum(1 for value in self.values if low <= value <= high)
+        return float(within) / len(self.values)
+
+    def out_of_band(self, low, high):
+        """Returns a mask that is True where values are below +low+ or above
+        +high+"""
+        if numpy:
+            return (self.values < low) | (self.values > high)
+        return [value < low or value > high for value in self.values]
+
+    def all_out_of_band(self, low, high):
+        """Returns True if every value is below +low+ or above +high+ (which
+        is the case for an empty window)"""
+        if numpy:
+            return bool(self.out_of_band(low, high).all())
+        return all(self.out_of_band(low, high))
+
+    def out_of_band_runs(self, low, high):
+        """Returns the lengths of each run of consecutive values that are
+        below +low+ or above +high+, in order"""
+        if numpy:
+            mask = numpy.concatenate(([False],
+                                      self.out_of_band(low, high),
+                                      [False])).astype(numpy.int8)
+            edges = numpy.diff(mask)
+            starts = numpy.flatnonzero(edges == 1)
+            ends = numpy.flatnonzero(edges == -1)
+            return [int(length) for length in ends - starts]
+        runs = []
+        length = 0
+        for outside in self.out_of_band(low, high):
+            if outside:
+                length += 1
+            elif length:
+                runs.append(length)
+                length = 0
+        if length:
+            runs.append(length)
+        return runs
@@ -0,0 +1,198 @@
+import contextlib
+import sqlite3
+import sys
+import threading
+import lazy_record
+import config
+from task_runner import BackgroundTaskRunner
+
+# Key in the WSGI environment naming the greenhouse of a request
+ENVIRON_KEY = "greenhouse.name"
+
+class Greenhouse(object):
+    """One greenhouse served by this process (see config.GREENHOUSES)"""
+
+    def __init__(self, name, database, bus=1, refresh={}, driver=None):
+        self.name = name
+        self.database = database
+        self.bus = bus
+        self.refresh = dict(refresh)
+        # Backend in drivers.BACKENDS, if not config.DRIVER
+        self.driver = driver
+        self.lock = threading.Lock()
+        self.db = None
+
+    @property
+    def prefix(self):
+        return "/greenhouses/{}".format(self.name)
+
+    def connection(self):
+        """The connection to this greenhouse's database, opened on first use"""
+        with self.lock:
+            if self.db is None:
+                self.db = sqlite3.connect(self.database,
+                                          detect_types=sqlite3.PARSE_DECLTYPES)
+            return self.db
+
+    def within(self, task):
+        """Wraps +task+ so that it runs against this greenhouse"""
+        def run_within():
+            with activate(self):
+                return task()
+        run_within.__name__ = task.__name__
+        return run_within
+
+    def __repr__(self):
+        return "Greenhouse({!r})".format(self.name)
+
+
+class Connection(object):
+    """
+    Stands in for lazy_record's database connection, forwarding everything
+    to the connection of the current greenhouse.
+    """
+
+    def __getattr__(self, attr):
+        return getattr(current().connection(), attr)
+
+    def __enter__(self):
+        return current().connection().__enter__()
+
+    def __exit__(self, *args):
+        return current().connection().__exit__(*args)
+
+
+_greenhouses = {}
+_local = threading.local()
+
+def greenhouses():
+    """All greenhouses in config.GREENHOUSES, by name"""
+    if not _greenhouses:
+        for name, settings in config.GREENHOUSES.items():
+            _greenhouses[name] = Greenhouse(name, **settings)
+    return _greenhouses
+
+def default():
+    return greenhouses()[config.DEFAULT_GREENHOUSE]
+
+def current():
+    """
+    The greenhouse that is active in this thread, or the one the current
+    request was made to, or else the default greenhouse.
+    """
+    greenhouse = getattr(_local, "greenhouse", None)
+    if greenhouse is None:
+        # Without flask imported (as for the CLI commands) there can be no
+        # request, so there's no need to import it
+        flask = sys.modules.get("flask")
+        if flask is not None and flask.has_request_context():
+            greenhouse = greenhouses().get(
+                flask.request.environ.get(ENVIRON_KEY))
+    return greenhouse or default()
+
+@contextlib.contextmanager
+def activate(greenhouse):
+    """Makes +greenhouse+ the current greenhouse in this thread"""
+    previous = getattr(_local, "greenhouse", None)
+    _local.greenhouse = greenhouse
+    try:
+        yield greenhouse
+    finally:
+        _local.greenhouse = previous
+
+def install():
+    """Route lazy_record's queries to the database of the current greenhouse"""
+    # As lazy_record.connect_db does, since its modules import Repo apart
+    db = Connection()
+    lazy_record.repo.Repo.db = db
+    lazy_record.base.Repo.db = db
+    lazy_record.query.Repo.db = db
+
+def connection():
+    """The connection that lazy_record queries currently go to"""
+    db = lazy_record.repo.Repo.db
+    if isinstance(db, Connection):
+        return current().connection()
+    return db
+
+class PerConnection(object):
+    """
+    A value for each database connection (so each greenhouse), made by
+    +factory+ the first time it is asked for with that connection current.
+    Values of connections that have since been closed are dropped.
+    """
+
+    # Stands for no connection having been looked at, as None stands for
+    # there being none
+    UNSEEN = object()
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.db = PerConnection.UNSEEN
+        self.value = None
+        self.values = {}
+
+    def get(self):
+        db = connection()
+        if db is not self.db:
+            if db not in self.values:
+                self._forget_closed()
+                self.values[db] = self.factory()
+            self.db = db
+            self.value = self.values[db]
+        return self.value
+
+    def _forget_closed(self):
+        for db in list(self.values):
+            if db is None:
+                continue
+            try:
+                db.total_changes
+            except sqlite3.ProgrammingError:
+                del self.values[db]
+
+def schedule(runner, name):
+    """
+    Runs the tasks of +runner+ for every greenhouse, each in its own thread
+    and at the interval the greenhouse configures for +name+ (or the
+    runner's own).
+    """
+    for greenhouse in greenhouses().values():
+        scheduled = BackgroundTaskRunner(
+            refresh=greenhouse.refresh.get(name, runner.refresh))
+        scheduled.tasks = [greenhouse.within(task) for task in runner.tasks]
+        scheduled.run()
+
+
+class PrefixMiddleware(object):
+    """
+    Serves /greenhouses/<name>/<path> as <path> of greenhouse <name>, moving
+    the prefix into SCRIPT_NAME so that generated URLs keep it. Socket.IO
+    requests, which are made to the root, go to the greenhouse of the page
+    that made them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if path.startswith("/socket.io"):
+            # The referring page's path without the host
+            referrer = environ.get("HTTP_REFERER", "").split("://", 1)[-1]
+            greenhouse = self.greenhouse_for("/" + referrer.partition("/")[2])
+        else:
+            greenhouse = self.greenhouse_for(path)
+            if greenhouse:
+                environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + \
+                                         greenhouse.prefix
+                environ["PATH_INFO"] = path[len(greenhouse.prefix):] or "/"
+        if greenhouse:
+            environ[ENVIRON_KEY] = greenhouse.name
+        return self.app(environ, start_response)
+
+    @staticmethod
+    def greenhouse_for(path):
+        parts = path.split("/", 3)
+        if len(parts) > 2 and parts[1] == "greenhouses":
+            return greenhouses().get(parts[2])
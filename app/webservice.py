@@ -3,23 +3,31 @@ import models
 import forms
 import router
 import config
-import eventlet
 import json
-eventlet.monkey_patch()
+import flask_socketio
 from flask_socketio import SocketIO
-import jinja2
-import os
 import presenters
 import policies
 import services
+import readings
+import preload
+import tenancy
+import polling
+import drivers
+import actuators
+import settings
+import assets
+import serializers
+import compression
 import datetime
 from task_runner import BackgroundTaskRunner
 
-template_dir = os.path.join(os.path.dirname(__file__), "templates")
-loader = jinja2.FileSystemLoader(template_dir)
-environment = jinja2.Environment(loader=loader)
-
 app = flask.Flask(__name__)
+app.jinja_options = dict(app.jinja_options,
+                         auto_reload=config.TEMPLATE_AUTO_RELOAD)
+if config.TEMPLATE_CACHE:
+    app.jinja_options["bytecode_cache"] = assets.bytecode_cache(
+        config.TEMPLATE_CACHE)
 
 from werkzeug import url_decode
 
@@ -38,13 +46,48 @@ class MethodRewriteMiddleware(object):
         return self.app(environ, start_response)
 
 app.wsgi_app = MethodRewriteMiddleware(app.wsgi_app)
-
-socketio = SocketIO(app, async_mode='eventlet', allow_upgrades=True)
+app.wsgi_app = compression.Compress(app.wsgi_app,
+                                    minimum_size=config.COMPRESSION_THRESHOLD,
+                                    level=config.COMPRESSION_LEVEL)
+
+# Static files are served ahead of the application (and its request hooks),
+# linked by names that change with their content so they can be cached
+fingerprints = assets.Fingerprints(app.static_folder)
+static_files = assets.StaticFiles(app.wsgi_app, fingerprints,
+                                  prefix=app.static_url_path + "/",
+                                  max_age=config.STATIC_MAX_AGE)
+app.wsgi_app = static_files
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    if endpoint == "static" and "filename" in values:
+        values["filename"] = fingerprints.fingerprinted(values["filename"])
+
+@app.context_processor
+def script_urls():
+    def scripts(bundle):
+        """The URLs of the scripts in +bundle+ (see config.BUNDLES)"""
+        if config.BUNDLE_ASSETS:
+            filenames = [bundle]
+        else:
+            filenames = config.BUNDLES[bundle]
+        return [flask.url_for("static", filename=filename)
+                for filename in filenames]
+    return dict(scripts=scripts)
+
+socketio = SocketIO(app, async_mode='eventlet', allow_upgrades=True,
+                    json=serializers.serializer, http_compression=True,
+                    compression_threshold=config.COMPRESSION_THRESHOLD)
+app.wsgi_app = tenancy.PrefixMiddleware(app.wsgi_app)
 app.secret_key = config.SECRET_KEY
 router = router.Router(app)
 background = BackgroundTaskRunner(refresh=10)
 daily = BackgroundTaskRunner(refresh=24 * 3600)
 minutely = BackgroundTaskRunner(refresh=60)
+sensors = polling.Poller(lambda plant: services.Sensor(plant).read(),
+                         workers=config.SENSOR_POLL_WORKERS,
+                         timeout=config.SENSOR_POLL_TIMEOUT,
+                         lock_for=lambda plant: drivers.current().lock)
 
 # Routing & Controllers
 
@@ -53,8 +96,8 @@ class PlantsController(object):
     
     @staticmethod
     def index():
-        plants = [(models.Plant.for_slot(slot_id, False), slot_id)
-                  for slot_id in range(1, config.NUMBER_OF_PLANTS + 1)]
+        slot_ids = range(1, config.NUMBER_OF_PLANTS + 1)
+        plants = zip(models.Plant.for_slots(slot_ids), slot_ids)
         water_level = models.WaterLevel.current() or 0
         return flask.render_template("plants/index.html",
                                      plants=plants,
@@ -125,7 +168,8 @@ class PlantSettingsController(object):
 
     @staticmethod
     def index(plant_id):
-        plant = models.Plant.for_slot(plant_id)
+        plant = models.Plant.for_slot(
+            plant_id, include=["plant_setting.notification_thresholds"])
         settings = plant.plant_setting.notification_thresholds
         return flask.render_template("plant_settings/index.html",
                                      thresholds=settings,
@@ -135,113 +179,48 @@ class PlantSettingsController(object):
     @staticmethod
     def create(plant_id):
         plant = models.Plant.for_slot(plant_id)
-        setting = plant.plant_setting
-        thresholds = setting.notification_thresholds
-        form = flask.request.form
-        # Delete
-        ids_to_delete = list(PlantSettingsController.deleted_thresholds(form))
-        if ids_to_delete:
-            for threshold in thresholds.where(id=ids_to_delete):
+        thresholds = plant.plant_setting.notification_thresholds
+        form = forms.PlantSettingsForm(flask.request.form)
+        if form.deleted_ids:
+            for threshold in thresholds.where(id=form.deleted_ids):
                 threshold.destroy()
-        failures = 0
-        # Create
-        for kw in PlantSettingsController.new_thresholds(form):
+        saved = 0
+        for kw in form.new_thresholds:
             try:
                 thresholds.create(**kw)
+                saved += 1
             except models.lazy_record.RecordInvalid:
-                failures += 1
-        # Update
-        for id, kw in PlantSettingsController.old_thresholds(form):
+                pass
+        for id, kw in form.old_thresholds:
             threshold = thresholds.where(id=id).first()
             threshold.update(**kw)
             try:
                 threshold.save()
+                saved += 1
             except models.lazy_record.RecordInvalid:
-                failures += 1
-        some_succeeded = \
-            len(list(PlantSettingsController.all_thresholds(form))) > 0 and \
-            len(list(PlantSettingsController.all_thresholds(form))) > failures
+                pass
+        attempted = len(form.new_thresholds) + len(form.old_thresholds)
 
-        if PlantSettingsController.form_valid(form) and not failures:
+        if form.valid and saved == attempted:
             flask.flash("Settings Updated", 'notice')
-        elif some_succeeded:
+        elif saved:
             flask.flash("Some Settings Updated", 'warning')
         else:
             flask.flash("Settings could not be updated", 'error')
         return flask.redirect(flask.url_for('PlantSettingsController.index',
                                             plant_id=plant_id))
 
-    @staticmethod
-    def new_thresholds(form):
-        for attr, percent, time, thresh_id, deleted in \
-                PlantSettingsController.all_thresholds(form):
-            if thresh_id == "":
-                # New record
-                yield {
-                    'sensor_name': str(attr),
-                    'deviation_percent': int(float(percent)),
-                    'deviation_time': float(time),
-                }
-
-    @staticmethod
-    def all_thresholds(form):
-        thresholds = zip(form.getlist("attribute"),
-                         form.getlist("deviation_percent"),
-                         form.getlist("deviation_time"),
-                         form.getlist("threshold_id"),
-                         form.getlist("delete"))
-        for attr, percent, time, thresh_id, deleted in thresholds:
-            if "" in (attr, percent, time) or deleted != "false":
-                continue
-            yield attr, percent, time, thresh_id, deleted
-
-    @staticmethod
-    def old_thresholds(form):
-        for attr, percent, time, thresh_id, deleted in \
-                PlantSettingsController.all_thresholds(form):
-            if thresh_id != "":
-                # Old record
-                yield int(thresh_id), {
-                    'sensor_name': str(attr),
-                    'deviation_percent': int(float(percent)),
-                    'deviation_time': float(time),
-                }
-
-    @staticmethod
-    def deleted_thresholds(form):
-        thresholds = zip(form.getlist("attribute"),
-                         form.getlist("deviation_percent"),
-                         form.getlist("deviation_time"),
-                         form.getlist("threshold_id"),
-                         form.getlist("delete"))
-        for attr, percent, time, thresh_id, deleted in thresholds:
-            if deleted != "false" and thresh_id != "":
-                # Existing record
-                yield int(thresh_id)
-
-    @staticmethod
-    def form_valid(form):
-        all_thresholds = zip(form.getlist("attribute"),
-                             form.getlist("deviation_percent"),
-                             form.getlist("deviation_time"),
-                             form.getlist("threshold_id"),
-                             form.getlist("delete"))
-        for attr, percent, time, thresh_id, deleted in all_thresholds:
-            if deleted != "false":
-                continue
-            if "" in (attr, percent, time) and not (attr == percent == time):
-                return False
-        return True
-
 @router.route("/settings", only=["index", "create"])
 class GlobalSettingsController(object):
 
     @staticmethod
     def index():
+        # Fetched from the Plant Database while the rest are read
+        services.notification_settings.start()
         controls = models.GlobalSetting.controls
-        ns = models.PlantDatabase.get_notification_settings()
         notify_plants = models.GlobalSetting.notify_plants
         notify_maintenance = models.GlobalSetting.notify_maintenance
+        ns = services.notification_settings.get()
         return flask.render_template("global_settings/index.html",
                                      controls=controls,
                                      notification_settings=ns,
@@ -288,12 +267,12 @@ class APIPlantsController(object):
         else:
             level = 0
         plants = [present(plant) for plant in models.Plant.all()]
-        return flask.jsonify({'plants': plants, 'water_level': level})
+        return serializers.jsonify({'plants': plants, 'water_level': level})
 
     @staticmethod
     def show(id):
         plant = models.Plant.for_slot(id, raise_if_not_found=False)
-        return flask.jsonify(presenters.APIPlantPresenter(plant).long_info())
+        return serializers.jsonify(presenters.APIPlantPresenter(plant).long_info())
 
     @staticmethod
     def create():
@@ -305,9 +284,9 @@ class APIPlantsController(object):
             plant.slot_id = slot_id
             plant.plant_setting = models.PlantSetting()
             plant.save()
-            return flask.jsonify(presenters.APIPlantPresenter(plant).long_info())
+            return serializers.jsonify(presenters.APIPlantPresenter(plant).long_info())
         else:
-            return flask.jsonify({'error': 'could not save plant'})
+            return serializers.jsonify({'error': 'could not save plant'})
 
     @staticmethod
     def destroy(id):
@@ -318,24 +297,19 @@ class APIPlantsController(object):
         except models.lazy_record.RecordNotFound:
             return ('Plant not found', 404)
 
-@router.route("/api/plants/<plant_id>/settings", only=["index", "create", "update", "destroy"])
+@router.route("/api/plants/<plant_id>/settings",
+              only=["index", "create", "replace", "update", "destroy"])
 class APIPlantSettingsController(object):
 
     @staticmethod
     def index(plant_id):
         plant = models.Plant.for_slot(plant_id, False)
         if plant:
-            response = {'settings': []}
-            for threshold in plant.plant_setting.notification_thresholds:
-                response['settings'].append({
-                    'id': threshold.id,
-                    'sensor_name': threshold.sensor_name,
-                    'deviation_percent': threshold.deviation_percent,
-                    'deviation_time': threshold.deviation_time
-                })
-            return flask.jsonify(response)
+            thresholds = plant.plant_setting.notification_thresholds
+            return serializers.jsonify(
+                APIPlantSettingsController.present(thresholds))
         else:
-            return flask.jsonify({"error": "plant not found"})
+            return serializers.jsonify({"error": "plant not found"})
 
     @staticmethod
     def create(plant_id):
@@ -349,10 +323,41 @@ class APIPlantSettingsController(object):
         if plant:
             setting = plant.plant_setting.notification_thresholds.create(
                 **threshold_params)
-            return flask.jsonify(dict(id=setting.id, **threshold_params))
+            return serializers.jsonify(dict(id=setting.id, **threshold_params))
         else:
             return ('', 404)
 
+    @staticmethod
+    def replace(plant_id):
+        params = json.loads(flask.request.data)
+        try:
+            thresholds = [{
+                'id': setting.get('id'),
+                'sensor_name': setting['sensor_name'],
+                'deviation_percent': setting['deviation_percent'],
+                'deviation_time': setting['deviation_time']
+            } for setting in params['settings']]
+        except (KeyError, TypeError):
+            return ('', 400)
+        try:
+            plant = models.Plant.for_slot(plant_id)
+            thresholds = plant.plant_setting.replace_thresholds(thresholds)
+            return serializers.jsonify(
+                APIPlantSettingsController.present(thresholds))
+        except models.lazy_record.RecordNotFound:
+            return ('', 404)
+        except (models.lazy_record.RecordInvalid, ValueError):
+            return ('', 400)
+
+    @staticmethod
+    def present(thresholds):
+        return {'settings': [{
+            'id': threshold.id,
+            'sensor_name': threshold.sensor_name,
+            'deviation_percent': threshold.deviation_percent,
+            'deviation_time': threshold.deviation_time
+        } for threshold in thresholds]}
+
     @staticmethod
     def update(plant_id, id):
         params = json.loads(flask.request.data)
@@ -366,7 +371,7 @@ class APIPlantSettingsController(object):
             setting = plant.plant_setting.notification_thresholds.find(id)
             setting.update(**threshold_params)
             setting.save()
-            return flask.jsonify(threshold_params)
+            return serializers.jsonify(threshold_params)
         except models.lazy_record.RecordNotFound:
             return ('', 404)
         except models.lazy_record.RecordInvalid:
@@ -395,7 +400,7 @@ class APILogsController(object):
                 sensor : presenter.history_chart_data_for(sensor)
                 for sensor in models.SensorDataPoint.SENSORS
             }
-            return flask.jsonify(data)
+            return serializers.jsonify(data)
         except models.lazy_record.RecordNotFound:
             return ('{"error": "plant not found"}', 404)
 
@@ -414,7 +419,7 @@ class APIGlobalSettingsController(object):
                 return time.strftime("%X")
 
         controls = models.GlobalSetting.controls
-        return flask.jsonify({
+        return serializers.jsonify({
             control.name : {
                 'enabled': control.enabled is not False,
                 'id': control.id,
@@ -470,14 +475,15 @@ class APINotificationSettingsController(object):
     @staticmethod
     def index():
         try:
-            pd_settings = models.PlantDatabase.get_notification_settings()
+            # Fetched from the Plant Database while the rest are read
+            services.notification_settings.start()
             g_settings = {
                 'notify_plants': models.GlobalSetting.notify_plants,
                 'notify_maintenance': models.GlobalSetting.notify_maintenance,
             }
-            settings = dict(pd_settings)
+            settings = services.notification_settings.get()
             settings.update(g_settings)
-            return flask.jsonify(settings)
+            return serializers.jsonify(settings)
         except:
             return '', 404
 
@@ -488,7 +494,7 @@ class APINotificationSettingsController(object):
             "push": params["push"],
             "email": params["email"],
         }
-        models.PlantDatabase.update_notification_settings(pd_params)
+        services.notification_settings.update(pd_params)
         models.GlobalSetting.notify_plants = params["notify_plants"]
         models.GlobalSetting.notify_maintenance = params["notify_maintenance"]
         return '', 200
@@ -521,13 +527,15 @@ def send_chart_data(slot_id):
     presenter = presenters.ChartDataPresenter(plant)
     socketio.emit('ideal-chart-data', {
         'chart-content': presenter.ideal_chart_data()
-    }, namespace="/plants/{}".format(plant.slot_id), broadcast=False)
+    }, namespace="/plants/{}".format(plant.slot_id),
+       room=flask.request.sid)
     socketio.emit('history-chart-data', {
         'chart-content': {
             sensor: presenter.history_chart_data_for(sensor)
             for sensor in models.SensorDataPoint.SENSORS
         }
-    }, namespace="/plants/{}".format(plant.slot_id), broadcast=False)
+    }, namespace="/plants/{}".format(plant.slot_id),
+       room=flask.request.sid)
 
 @socketio.on("request-data", namespace="/plants")
 def send_data_to_client(slot_id):
@@ -556,62 +564,66 @@ def send_data_to_client(slot_id):
             'within-tolerance': presenter.within_tolerance('temperature'),
             'value': presenter.formatted_value('temperature'),
         },
-    }, namespace="/plants/{}".format(plant.slot_id))
+    }, namespace="/plants/{}".format(plant.slot_id), room=flask.request.sid)
+
+def join_greenhouse():
+    # Updates are only sent to clients of the same greenhouse
+    flask_socketio.join_room(tenancy.current().name)
+
+for namespace in ("/plants", "/settings"):
+    socketio.on("connect", namespace=namespace)(join_greenhouse)
 
 @socketio.on("update-control", namespace="/settings")
 def update_control(control_id, status):
-    control = models.Control.find(int(control_id))
+    control = models.GlobalSetting.controls.find(int(control_id))
     if status == "temporary_disable":
         control.temporarily_disable()
     else:
         control.activate()
+    # Confirmed even when nothing had to change, so nothing was saved
+    emit_control_updated(control)
+
+@settings.store.subscribe
+def control_updated(key, control):
+    # Sent whenever a control is saved by anything but the handler above,
+    # such as the control policies
+    if key == "controls" and not (flask.has_request_context() and
+                                  getattr(flask.request, "sid", None)):
+        emit_control_updated(control)
+
+def emit_control_updated(control):
     socketio.emit('control-updated', {
-        'control_id': control_id,
-        'status': status
-    }, namespace="/settings")
+        'control_id': control.id,
+        'status': "activate" if control.active else "temporary_disable"
+    }, namespace="/settings", room=tenancy.current().name)
 
 # Background Tasks
 
 @background.task
 def load_sensor_data():
-    socketio.emit('data-update', True, namespace="/plants")
+    socketio.emit('data-update', True, namespace="/plants",
+                  room=tenancy.current().name)
 
 @background.task
-def create_sensor_data(): # pragma: no cover
-    if config.DEBUG:
-        import random
-        sun = [25] * config.NUMBER_OF_PLANTS
-        water = [20] * config.NUMBER_OF_PLANTS
-        humidity = [67.0] * config.NUMBER_OF_PLANTS
-        temperature = [87.1] * config.NUMBER_OF_PLANTS
-        models.WaterLevel.create(level=52)
-        for i in range(config.NUMBER_OF_PLANTS):
-            sun[i] += random.randint(-5, 5)
-            sun[i] = min(max(sun[i], 0), 100)
-            water[i] += random.randint(-5, 5)
-            water[i] = min(max(water[i], 0), 100)
-            temperature[i] += random.uniform(-5, 5)
-            temperature[i] = min(max(temperature[i], 0), 100)
-            humidity[i] = random.random() * 100
-        plants = [models.Plant.for_slot(slot_id, False)
-                  for slot_id in range(1, config.NUMBER_OF_PLANTS + 1)]
-        for index, plant in enumerate(plants):
-            if plant:
-                plant.record_sensor("light", sun[index])
-                plant.record_sensor("water", water[index])
-                plant.record_sensor("humidity", humidity[index])
-                plant.record_sensor("temperature", temperature[index])
-    else:
-        # Production, as in on the pi
-        for plant in models.Plant.all():
-            sensor = services.Sensor(plant)
-            sensor.get_values()
-        services.Sensor.get_water_level()
+def create_sensor_data():
+    # The driver of each greenhouse is either its hardware or a simulator
+    # (see config.DRIVER)
+    for plant, values in sensors.poll(models.Plant.all()):
+        # Errors are logged rather than raised, which would end the thread
+        # that runs the background tasks
+        try:
+            services.Sensor(plant).record(values)
+        except Exception:
+            app.logger.exception("Could not record the sensor data of "
+                                 "plant %s", plant.id)
+    services.Sensor.get_water_level()
 
 @background.task
 def notify_plant_condition(): # pragma: no cover
     if models.GlobalSetting.notify_plants:
-        for nt in models.NotificationThreshold.all():
+        thresholds = preload.include(models.NotificationThreshold.all(),
+                                     ["plant_setting.plant"])
+        for nt in thresholds:
             if policies.NotificationPolicy(nt).should_notify():
                 services.PlantNotifier(nt).notify()
 
@@ -634,6 +646,8 @@ def clean_old_sensor_data(): # pragma: no cover
         # Remove water level in one transaction
         models.lazy_record.repo.Repo("water_levels"
                 ).where([("created_at < ?", cutoff)]).delete()
+    readings.recent.clear()
+    settings.store.invalidate("water_level")
 
 @background.task
 def refresh_token(): # pragma: no cover
@@ -643,12 +657,6 @@ def refresh_token(): # pragma: no cover
         except:
             pass
 
-@background.task
-def destroy_old_tokens(): # pragma: no cover
-    for token in models.Token.where("created_at < ?",
-                    datetime.datetime.today() - datetime.timedelta(days=1)):
-        token.destroy()
-
 @background.task
 def toggle_controls(): # pragma: no cover
     """Enable and disable controls as determined by the policies"""
@@ -657,22 +665,44 @@ def toggle_controls(): # pragma: no cover
     ideal_conditions = policies.IdealConditions(*plants)
     controls = {
         control.name: control
-        for control in models.Control.all()
+        for control in models.GlobalSetting.controls
     }
     control_policy = policies.ControlActivationPolicy(ideal_conditions,
                                                       conditions, controls)
-    for name, control in controls.items():
-        if control_policy.should_activate(name):
-            control.activate()
-        elif control_policy.should_deactivate(name):
-            control.deactivate()
+    # Controls hold their state for a while so that readings near the edge
+    # of a band don't flip them every tick, but are always turned off when
+    # they may not run. Changes go to the bus together.
+    with actuators.current().batch():
+        for name, control in controls.items():
+            if control_policy.should_activate(name):
+                control.activate(force=False)
+            elif control_policy.should_deactivate(name):
+                control.deactivate(force=not control.may_activate)
 
 @daily.task
-def updated_plants(): # pragma: no cover
-    for plant in models.Plant.all():
-        services.PlantUpdater(plant).update()
+def updated_plants():
+    # Errors are logged rather than raised, which would end the thread that
+    # runs the daily tasks
+    try:
+        plants = services.PlantUpdater.update_all(models.Plant.all())
+    except models.PlantDatabase.CannotConnect:
+        app.logger.warning("Cannot connect to the Plant Database to update "
+                           "the plants")
+        return
+    except Exception:
+        # A response the plants could not be updated or saved with
+        app.logger.exception("Could not update the plants")
+        return
+    if plants:
+        # Charts show the ideals of the plants, so are fetched again
+        socketio.emit('data-update', True, namespace="/plants",
+                      room=tenancy.current().name)
 
 def run(): # pragma: no cover
-    background.run()
-    daily.run()
+    for greenhouse in tenancy.greenhouses().values():
+        with tenancy.activate(greenhouse):
+            readings.recent.warm([plant.id for plant in models.Plant.all()],
+                                 models.SensorDataPoint.SENSORS)
+    tenancy.schedule(background, "background")
+    tenancy.schedule(daily, "daily")
     socketio.run(app, debug=config.DEBUG, host="0.0.0.0", port=config.PORT)
@@ -0,0 +1,26 @@
+"""CPU cost and savings of compressing responses, by zlib level (run on the Pi)"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import app.compression as compression
+import app.presenters as presenters
+import app.serializers as serializers
+from bench.bench_serializers import populate, payloads
+from bench.helpers import connect, report
+
+LEVELS = (1, 6, 9)
+
+if __name__ == '__main__':
+    connect()
+    plant = populate()
+    bodies = [(label, serializers.serializer.dumps(payload))
+              for label, payload in payloads(plant)]
+    bodies.append(("log download",
+                   presenters.LogDataPresenter(plant).log_string()))
+    for label, body in bodies:
+        for level in LEVELS:
+            compress = compression.Compress(None, level=level)
+            size = len(compress.compress(body, "gzip"))
+            report("{} level {} ({}->{} B)".format(
+                       label, level, len(body), size),
+                   lambda: compress.compress(body, "gzip"), number=50)
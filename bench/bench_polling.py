@@ -0,0 +1,74 @@
+"""Polling sensor clusters: serially vs through a Poller"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import threading
+import time
+import mock
+import app.services as services
+import app.drivers as drivers
+import app.polling as polling
+from bench.helpers import report
+
+SLOTS = (2, 64)
+# Seconds a cluster takes to convert and read its sensors
+LATENCY = 0.02
+
+class FakeSensorCluster(object):
+    """Stands in for greenhouse_envmgmt's SensorCluster"""
+
+    # Slots that never answer within the poll timeout
+    stalled = set()
+
+    def __init__(self, ID):
+        self.ID = ID
+
+    def sensor_values(self):
+        time.sleep(1.0 if self.ID in self.stalled else LATENCY)
+        return {"light": 50.0, "water": 50.0,
+                "humidity": 50.0, "temperature": 50.0}
+
+
+def plants(slots):
+    return [mock.Mock(name="plant", slot_id=slot_id)
+            for slot_id in range(1, slots + 1)]
+
+def serially(plants):
+    return [(plant, services.Sensor(plant).read()) for plant in plants]
+
+def pooled(plants, lock=None):
+    poller = polling.Poller(lambda plant: services.Sensor(plant).read(),
+                            workers=16, timeout=0.25,
+                            lock_for=lambda plant: lock)
+    return poller.poll(plants)
+
+class NoLock(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+def with_bus_lock(plants):
+    return pooled(plants, drivers.HardwareDriver.lock)
+
+if __name__ == '__main__':
+    driver = drivers.HardwareDriver()
+    with mock.patch("app.drivers.SensorCluster", new=FakeSensorCluster), \
+            mock.patch("app.drivers.current", return_value=driver):
+        for slots in SLOTS:
+            print "{} slots, {:.0f} ms per read".format(slots, LATENCY * 1000)
+            report("  serially", lambda: serially(plants(slots)), number=1)
+            report("  Poller, shared bus", lambda: with_bus_lock(plants(slots)),
+                   number=1)
+            with mock.patch.object(drivers.HardwareDriver, "lock", new=NoLock()):
+                report("  Poller, independent buses",
+                       lambda: pooled(plants(slots)), number=1)
+        FakeSensorCluster.stalled = {1}
+        print "64 slots, slot 1 stalled"
+        report("  serially", lambda: serially(plants(64)), number=1)
+        report("  Poller, shared bus", lambda: with_bus_lock(plants(64)),
+               number=1)
+        with mock.patch.object(drivers.HardwareDriver, "lock", new=NoLock()):
+            report("  Poller, independent buses",
+                   lambda: pooled(plants(64)), number=1)
@@ -0,0 +1,39 @@
+"""Read-only scans of sensor data: records vs Reading tuples"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import datetime
+import random
+import app.models as models
+from bench.helpers import connect, report
+
+POINTS = 20000
+
+def populate():
+    now = datetime.datetime.today()
+    rows = [(1, random.choice(models.SensorDataPoint.SENSORS),
+             random.uniform(0, 100), now, now)
+            for _ in range(POINTS)]
+    with models.lazy_record.repo.Repo.db as db:
+        db.executemany("insert into sensor_data_points (plant_id, "
+                       "sensor_name, sensor_value, created_at, updated_at) "
+                       "values (?, ?, ?, ?, ?)", rows)
+
+def log_lines(points):
+    return "\n".join("[{}] {} {}".format(
+                         point.created_at.strftime("%d/%b/%Y:%H:%M:%S"),
+                         point.sensor_name, point.sensor_value)
+                     for point in points)
+
+def with_records():
+    return log_lines(models.SensorDataPoint.where(plant_id=1))
+
+def with_readings():
+    return log_lines(models.SensorDataPoint.values(1))
+
+if __name__ == '__main__':
+    connect()
+    populate()
+    print "{} points".format(POINTS)
+    report("log lines from lazy_record objects", with_records, number=1)
+    report("log lines from SensorDataPoint.values", with_readings, number=1)
@@ -0,0 +1,54 @@
+"""API responses: flask.jsonify vs the compact serializer"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import datetime
+import random
+import flask
+import app.models as models
+import app.presenters as presenters
+import app.serializers as serializers
+import app.webservice as webservice
+from bench.helpers import connect, report
+
+def populate():
+    plant = models.Plant(name="bench", photo_url="bench.png",
+                         water_ideal=57.0, water_tolerance=30.0,
+                         light_ideal=50.0, light_tolerance=10.0,
+                         humidity_ideal=0.2, humidity_tolerance=0.1,
+                         temperature_ideal=11.2, temperature_tolerance=15.3,
+                         mature_on=datetime.datetime(2016, 1, 10),
+                         slot_id=1, plant_database_id=1)
+    plant.save()
+    now = datetime.datetime.today()
+    rows = [(plant.id, sensor, random.uniform(0, 100),
+             now - datetime.timedelta(hours=hours),
+             now - datetime.timedelta(hours=hours))
+            for hours in range(24 * 7)
+            for sensor in models.SensorDataPoint.SENSORS]
+    with models.lazy_record.repo.Repo.db as db:
+        db.executemany("insert into sensor_data_points (plant_id, "
+                       "sensor_name, sensor_value, created_at, updated_at) "
+                       "values (?, ?, ?, ?, ?)", rows)
+    return plant
+
+def payloads(plant):
+    presenter = presenters.ChartDataPresenter(plant)
+    return [
+        ("plant", presenters.APIPlantPresenter(plant).long_info()),
+        ("chart data", {
+            "ideal": presenter.ideal_chart_data(),
+            "history": {sensor: presenter.history_chart_data_for(sensor)
+                        for sensor in models.SensorDataPoint.SENSORS},
+        }),
+    ]
+
+if __name__ == '__main__':
+    connect()
+    plant = populate()
+    with webservice.app.test_request_context("/api/plants/1"):
+        for label, payload in payloads(plant):
+            report("{} with flask.jsonify".format(label),
+                   lambda: flask.jsonify(payload), number=200)
+            report("{} with serializers.jsonify".format(label),
+                   lambda: serializers.jsonify(payload), number=200)
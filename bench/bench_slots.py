@@ -0,0 +1,44 @@
+"""Plant lookups for every slot: a query per slot vs one query"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import datetime
+import mock
+import app.webservice as webservice
+import app.models as models
+from bench.helpers import connect, report
+
+SLOTS = (2, 32, 256)
+
+def populate(slots):
+    # Fill every other slot, so half of the lookups find nothing
+    with mock.patch("app.models.NUMBER_OF_PLANTS", new=slots):
+        for slot_id in range(1, slots + 1, 2):
+            models.Plant.create(name="plant {}".format(slot_id),
+                                photo_url="plant.png",
+                                water_ideal=50.0, water_tolerance=10.0,
+                                light_ideal=50.0, light_tolerance=10.0,
+                                humidity_ideal=50.0, humidity_tolerance=10.0,
+                                temperature_ideal=50.0,
+                                temperature_tolerance=10.0,
+                                mature_on=datetime.datetime.today(),
+                                slot_id=slot_id,
+                                plant_database_id=1)
+
+def per_slot(slots):
+    return [models.Plant.for_slot(slot_id, False)
+            for slot_id in range(1, slots + 1)]
+
+def all_slots(slots):
+    return models.Plant.for_slots(range(1, slots + 1))
+
+if __name__ == '__main__':
+    client = webservice.app.test_client()
+    for slots in SLOTS:
+        connect()
+        populate(slots)
+        print "{} slots".format(slots)
+        report("  Plant.for_slot per slot", lambda: per_slot(slots))
+        report("  Plant.for_slots", lambda: all_slots(slots))
+        with mock.patch("app.webservice.config.NUMBER_OF_PLANTS", new=slots):
+            report("  GET /plants", lambda: client.get("/plants"))
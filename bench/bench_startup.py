@@ -0,0 +1,30 @@
+"""Process startup: the imports of each command and time to first request"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import subprocess
+from bench.helpers import report
+
+ROOT = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+
+# Each is run in a fresh interpreter, as the command would be
+STARTUPS = [
+    ("import for db and console", "import app.seeds"),
+    ("import for server", "import app; app.green(); import app.webservice"),
+    ("time to first request", "\n".join([
+        "import app",
+        "app.green()",
+        "import app.webservice as webservice",
+        "from bench.helpers import connect",
+        "connect()",
+        "assert webservice.app.test_client().get('/').status_code == 200",
+    ])),
+]
+
+def start(code):
+    subprocess.check_call([sys.executable, "-c", code], cwd=ROOT)
+
+if __name__ == '__main__':
+    report("interpreter alone", lambda: start("pass"), number=3)
+    for label, code in STARTUPS:
+        report(label, lambda: start(code), number=3)
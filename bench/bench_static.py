@@ -0,0 +1,40 @@
+"""Static file requests: through the application vs the static fast path"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import flask
+from werkzeug.test import Client
+from werkzeug.wrappers import BaseResponse
+import app.webservice as webservice
+from bench.helpers import connect, report
+
+ASSETS = ("js/Chart.min.js", "css/layout.css",
+          "font/weathericons-regular-webfont.woff")
+
+def fetch(client, path, **kwargs):
+    response = client.get(path, **kwargs)
+    # Read the whole body, as a browser would
+    response.data
+    return response
+
+if __name__ == '__main__':
+    connect()
+    # The application alone, where Flask serves static files after running
+    # its request hooks
+    through_app = Client(webservice.static_files.app, BaseResponse)
+    fast_path = Client(webservice.app.wsgi_app, BaseResponse)
+    with webservice.app.test_request_context('/'):
+        urls = {asset: flask.url_for('static', filename=asset)
+                for asset in ASSETS}
+    for asset in ASSETS:
+        path = "/static/" + asset
+        etag = fetch(fast_path, urls[asset]).headers["ETag"]
+        print asset
+        report("  through application", lambda: fetch(through_app, path),
+               number=100)
+        report("  fast path", lambda: fetch(fast_path, urls[asset]),
+               number=100)
+        report("  fast path, revalidated (304)",
+               lambda: fetch(fast_path, path,
+                             headers={"If-None-Match": etag}),
+               number=100)
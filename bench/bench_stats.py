@@ -0,0 +1,49 @@
+"""Statistics over a 100k point window: records vs stats.Window"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import datetime
+import random
+import app.models as models
+import app.stats as stats
+from bench.helpers import connect, report
+
+POINTS = 100000
+
+def populate():
+    now = datetime.datetime.today()
+    rows = [(1, "light", random.uniform(0, 100), now, now)
+            for _ in range(POINTS)]
+    with models.lazy_record.repo.Repo.db as db:
+        db.executemany("insert into sensor_data_points (plant_id, "
+                       "sensor_name, sensor_value, created_at, updated_at) "
+                       "values (?, ?, ?, ?, ?)", rows)
+
+def with_records():
+    points = list(models.SensorDataPoint.where(plant_id=1,
+                                               sensor_name="light"))
+    values = [point.sensor_value for point in points]
+    mean = sum(values) / len(values)
+    within = len([v for v in values if 40.0 <= v <= 60.0])
+    all_out = all(v < 40.0 or v > 60.0 for v in values)
+    return mean, within, all_out
+
+def with_window():
+    window = models.SensorDataPoint.window(1, "light")
+    return (window.mean(), window.within_band_fraction(40.0, 60.0),
+            window.all_out_of_band(40.0, 60.0))
+
+def computation_only(window):
+    return lambda: (window.mean(), window.percentile(90),
+                    window.within_band_fraction(40.0, 60.0),
+                    window.out_of_band_runs(40.0, 60.0))
+
+if __name__ == '__main__':
+    connect()
+    populate()
+    print "{} points, numpy {}".format(
+        POINTS, "available" if stats.numpy else "unavailable")
+    report("lazy_record objects + python loops", with_records, number=1)
+    report("SensorDataPoint.window + statistics", with_window, number=1)
+    window = models.SensorDataPoint.window(1, "light")
+    report("statistics on a loaded window", computation_only(window))
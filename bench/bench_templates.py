@@ -0,0 +1,29 @@
+"""Loading every template: compiled from source vs from the bytecode cache"""
+import os
+import shutil
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import tempfile
+import jinja2
+import app.assets as assets
+import app.webservice as webservice
+from bench.helpers import report
+
+def environment(**options):
+    # A fresh environment, as the first render after a restart has
+    options = dict(webservice.app.jinja_options, **options)
+    return jinja2.Environment(loader=webservice.app.jinja_loader, **options)
+
+if __name__ == '__main__':
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache = assets.bytecode_cache(cache_dir)
+        assets.compile_templates(environment(bytecode_cache=cache))
+        report("compile from source",
+               lambda: assets.compile_templates(
+                   environment(bytecode_cache=None)))
+        report("load from bytecode cache",
+               lambda: assets.compile_templates(
+                   environment(bytecode_cache=cache)))
+    finally:
+        shutil.rmtree(cache_dir)
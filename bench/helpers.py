@@ -0,0 +1,16 @@
+import timeit
+import app.models as models
+from app.config import TEST_DATABASE, SCHEMA
+
+def connect():
+    """Connect to a fresh in-memory database with the schema loaded"""
+    models.lazy_record.close_db()
+    models.lazy_record.connect_db(TEST_DATABASE)
+    with open(SCHEMA) as schema:
+        models.lazy_record.load_schema(schema.read())
+
+def report(label, func, number=10):
+    """Print the best time per call of +func+ over 3 runs of +number+"""
+    best = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print "{:<48} {:>10.3f} ms".format(label, best * 1000)
+    return best
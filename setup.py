@@ -1,33 +1,85 @@
+import os
 import sys
+import app
 import app.config as config
-import lazy_record
-import app.models as models
-import app.webservice
-import app.seeds
-import app.lib.coffee as coffee
+
+# Each command imports only what it needs, so that those that don't serve
+# requests start without the webservice, Socket.IO or eventlet
+
+def webservice():
+    """The webservice, its greenhouses installed and patched for eventlet"""
+    app.green()
+    import app.tenancy as tenancy
+    import app.webservice as service
+    tenancy.install()
+    return service
+
+def build(service=None):
+    """
+    Compiles the CoffeeScript and the templates, and bundles the scripts of
+    the layout
+    """
+    import app.lib.coffee as coffee
+    import app.assets as assets
+    static = os.path.join(os.path.dirname(app.__file__), "static")
+    print coffee.compile_stale(static, config.COFFEE_CACHE)
+    assets.build(static, config.BUNDLES)
+    service = service or webservice()
+    templates = assets.compile_templates(service.app.jinja_env)
+    print "Compiled {} templates".format(len(templates))
+
+def routes():
+    """Prints each route with the time taken to match a request to it"""
+    import app.router as router
+    service = webservice()
+    print "{:<7} {:<45} {:<42} {:>8} {:>8}".format(
+        "METHOD", "RULE", "ENDPOINT", "TRIE us", "SCAN us")
+    for method, rule, endpoint, trie, scan in router.routes(service.app.url_map):
+        print "{:<7} {:<45} {:<42} {:>8.1f} {:>8.1f}".format(
+            method, rule, endpoint, trie * 1e6, scan * 1e6)
 
 def main():
+    # Left in the namespace of the interactive session by console
+    global lazy_record, models
     if sys.argv[1] == "db":
-        lazy_record.connect_db(config.DATABASE)
+        import lazy_record
+        import app.tenancy as tenancy
+        import app.seeds
+        tenancy.install()
         with open(config.SCHEMA) as schema:
-            lazy_record.load_schema(schema.read())
-        app.seeds.seed()
+            schema = schema.read()
+        for greenhouse in tenancy.greenhouses().values():
+            with tenancy.activate(greenhouse):
+                lazy_record.load_schema(schema)
+                app.seeds.seed()
     elif sys.argv[1] in ("server", "s"):
-        # Remove these for production
-        import mock
-        app.webservice.models.services.ControlCluster.bus = mock.Mock(
-            name="bus")
-        coffee.livecompile(app.webservice.app)
-        app.webservice.models.lazy_record.connect_db(config.DATABASE)
-        app.webservice.run()
+        import app.lib.coffee as coffee
+        # Simulate the sensors and controls unless told otherwise
+        config.DRIVER = os.environ.get("GREENHOUSE_DRIVER", "simulated")
+        service = webservice()
+        coffee.livecompile(service.app, cache_dir=config.COFFEE_CACHE)
+        service.run()
+    elif sys.argv[1] == "build":
+        config.TEMPLATE_CACHE = config.TEMPLATE_CACHE or \
+                                config.BUILD_TEMPLATE_CACHE
+        build()
+    elif sys.argv[1] == "routes":
+        routes()
     elif sys.argv[1] == "console":
-        app.webservice.models.lazy_record.connect_db(config.DATABASE)
+        import lazy_record
+        import app.models as models
+        lazy_record.connect_db(config.DATABASE)
     elif sys.argv[1] == "production":
-        app.webservice.models.lazy_record.connect_db(config.DATABASE)
-        coffee.precompile(app.webservice.app)
-        app.webservice.config.DEBUG = False
-        app.webservice.config.PORT = 80
-        app.webservice.run()
+        config.BUNDLE_ASSETS = True
+        config.TEMPLATE_AUTO_RELOAD = False
+        config.TEMPLATE_CACHE = config.TEMPLATE_CACHE or \
+                                config.BUILD_TEMPLATE_CACHE
+        config.DEBUG = False
+        config.PORT = 80
+        service = webservice()
+        # Leaves the templates compiled in this process as well
+        build(service)
+        service.run()
 
 if __name__ == '__main__':
     main()
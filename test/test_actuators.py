@@ -0,0 +1,133 @@
+import unittest
+import mock
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import app.actuators as actuators
+
+@mock.patch("app.actuators.time.time", return_value=1000.0)
+class TestActuators(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = mock.Mock(name="driver")
+        self.actuators = actuators.Actuators(self.driver, dwell=60)
+
+    def test_switches_control(self, time):
+        self.assertTrue(self.actuators.switch("fan", True))
+        self.driver.control.assert_called_with(on=["fan"], off=[])
+        self.assertEqual(self.actuators.state("fan"), True)
+
+    def test_state_is_unknown_until_switched(self, time):
+        self.assertEqual(self.actuators.state("fan"), None)
+        self.actuators.switch("fan", False)
+        self.driver.control.assert_called_with(on=[], off=["fan"])
+
+    def test_does_not_send_commands_that_change_nothing(self, time):
+        self.actuators.switch("fan", True)
+        time.return_value = 2000.0
+        self.assertTrue(self.actuators.switch("fan", True))
+        self.assertEqual(self.driver.control.call_count, 1)
+
+    def test_keeps_state_for_dwell_time(self, time):
+        self.actuators.switch("fan", True)
+        time.return_value = 1059.0
+        self.assertFalse(self.actuators.switch("fan", False))
+        self.assertEqual(self.actuators.state("fan"), True)
+        time.return_value = 1060.0
+        self.assertTrue(self.actuators.switch("fan", False))
+        self.driver.control.assert_called_with(on=[], off=["fan"])
+
+    def test_forced_commands_ignore_dwell_time(self, time):
+        self.actuators.switch("fan", True)
+        self.assertTrue(self.actuators.switch("fan", False, force=True))
+        self.assertEqual(self.actuators.state("fan"), False)
+
+    def test_dwell_is_per_control(self, time):
+        self.actuators.switch("fan", True)
+        self.assertTrue(self.actuators.switch("pump", True))
+
+    def test_sends_batch_at_once(self, time):
+        with self.actuators.batch():
+            self.actuators.switch("fan", True)
+            self.actuators.switch("pump", False)
+            self.actuators.switch("light", True)
+            self.assertEqual(self.actuators.state("fan"), True)
+            self.driver.control.assert_not_called()
+        self.driver.control.assert_called_once_with(on=["fan", "light"],
+                                                    off=["pump"])
+
+    def test_batch_drops_commands_undone_within_it(self, time):
+        self.actuators.switch("fan", False)
+        with self.actuators.batch():
+            self.actuators.switch("fan", True, force=True)
+            self.actuators.switch("light", True)
+            self.actuators.switch("fan", False, force=True)
+        self.driver.control.assert_called_with(on=["light"], off=["fan"])
+
+    def test_empty_batch_sends_nothing(self, time):
+        with self.actuators.batch():
+            pass
+        self.driver.control.assert_not_called()
+
+    def test_nested_batches_send_once(self, time):
+        with self.actuators.batch():
+            self.actuators.switch("fan", True)
+            with self.actuators.batch():
+                self.actuators.switch("pump", True)
+            self.driver.control.assert_not_called()
+        self.driver.control.assert_called_once_with(on=["fan", "pump"],
+                                                    off=[])
+
+    def test_retries_commands_the_driver_failed(self, time):
+        self.driver.control.side_effect = IOError
+        with self.assertRaises(IOError):
+            self.actuators.switch("fan", True)
+        self.assertEqual(self.actuators.state("fan"), None)
+        self.driver.control.side_effect = None
+        self.actuators.switch("fan", True)
+        self.assertEqual(self.actuators.state("fan"), True)
+
+    def test_calls_back_once_switched(self, time):
+        then = mock.Mock(name="then")
+        self.actuators.switch("fan", True, then=then)
+        then.assert_called_once_with()
+        self.actuators.switch("fan", True, then=then)
+        self.assertEqual(then.call_count, 2)
+
+    def test_calls_back_once_batch_is_sent(self, time):
+        then = mock.Mock(name="then", side_effect=lambda:
+                         self.driver.control.assert_called_once_with(
+                             on=["fan"], off=[]))
+        with self.actuators.batch():
+            self.actuators.switch("fan", True, then=then)
+            then.assert_not_called()
+        then.assert_called_once_with()
+
+    def test_does_not_call_back_if_batch_fails(self, time):
+        self.driver.control.side_effect = IOError
+        then = mock.Mock(name="then")
+        with self.assertRaises(IOError):
+            with self.actuators.batch():
+                self.actuators.switch("fan", True, then=then)
+        then.assert_not_called()
+        self.driver.control.side_effect = None
+        with self.actuators.batch():
+            pass
+        then.assert_not_called()
+
+
+@mock.patch.dict("app.actuators._actuators", clear=True)
+@mock.patch("app.actuators.drivers.current")
+class TestCurrentActuators(unittest.TestCase):
+
+    def test_drives_current_driver(self, current):
+        self.assertIs(actuators.current().driver, current.return_value)
+        self.assertIs(actuators.current(), actuators.current())
+
+    @mock.patch("app.actuators.config.CONTROL_DWELL", new=5)
+    def test_uses_configured_dwell(self, current):
+        self.assertEqual(actuators.current().dwell, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
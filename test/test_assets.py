@@ -0,0 +1,187 @@
+import unittest
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import jinja2
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+from werkzeug.test import Client
+from werkzeug.wrappers import BaseResponse
+import app.assets as assets
+
+class TestFingerprints(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        os.mkdir(os.path.join(self.directory, "js"))
+        self.write("js/app.min.js", "var a = 1;")
+        self.fingerprints = assets.Fingerprints(self.directory)
+
+    def write(self, filename, content, mtime=1000):
+        path = os.path.join(self.directory, filename)
+        with open(path, "w") as asset:
+            asset.write(content)
+        os.utime(path, (mtime, mtime))
+
+    def test_links_files_by_digest_of_content(self):
+        name = self.fingerprints.fingerprinted("js/app.min.js")
+        self.assertRegexpMatches(name, r"^js/app\.min\.[0-9a-f]{10}\.js$")
+
+    def test_changes_name_with_content(self):
+        before = self.fingerprints.fingerprinted("js/app.min.js")
+        self.write("js/app.min.js", "var a = 2;", mtime=2000)
+        self.assertNotEqual(self.fingerprints.fingerprinted("js/app.min.js"),
+                            before)
+
+    def test_only_reads_modified_files(self):
+        self.fingerprints.digest("js/app.min.js")
+        with mock.patch("app.assets.open", create=True) as open:
+            self.fingerprints.digest("js/app.min.js")
+            open.assert_not_called()
+
+    def test_links_missing_files_by_name(self):
+        self.assertEqual(self.fingerprints.fingerprinted("js/missing.js"),
+                         "js/missing.js")
+        self.assertEqual(self.fingerprints.fingerprinted("../secret"),
+                         "../secret")
+
+    def test_resolves_fingerprinted_names(self):
+        name = self.fingerprints.fingerprinted("js/app.min.js")
+        self.assertEqual(self.fingerprints.resolve(name),
+                         ("js/app.min.js", name.split(".")[-2]))
+        self.assertEqual(self.fingerprints.resolve("js/app.min.js"),
+                         ("js/app.min.js", None))
+
+
+class TestStaticFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        with open(os.path.join(self.directory, "app.js"), "w") as asset:
+            asset.write("var a = 1;")
+        self.requests = []
+        def app(environ, start_response):
+            self.requests.append(environ["PATH_INFO"])
+            start_response("200 OK", [])
+            return ["app"]
+        self.app = app
+        self.fingerprints = assets.Fingerprints(self.directory)
+        self.client = Client(assets.StaticFiles(self.app, self.fingerprints,
+                                                max_age=3600),
+                             BaseResponse)
+
+    def test_serves_fingerprinted_files_with_long_cache(self):
+        name = self.fingerprints.fingerprinted("app.js")
+        response = self.client.get("/static/" + name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, "var a = 1;")
+        self.assertEqual(response.headers["Cache-Control"],
+                         "public, max-age=3600, immutable")
+        self.assertIn("javascript", response.headers["Content-Type"])
+        self.assertEqual(self.requests, [])
+
+    def test_serves_other_names_to_be_revalidated(self):
+        response = self.client.get("/static/app.js")
+        self.assertEqual(response.data, "var a = 1;")
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+    def test_serves_stale_fingerprints_to_be_revalidated(self):
+        response = self.client.get("/static/app.0123456789.js")
+        self.assertEqual(response.data, "var a = 1;")
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+    def test_responds_not_modified_to_matching_etag(self):
+        etag = self.client.get("/static/app.js").headers["ETag"]
+        response = self.client.get("/static/app.js",
+                                   headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, "")
+
+    def test_does_not_serve_files_outside_directory(self):
+        response = self.client.get("/static/../" +
+                                   os.path.basename(self.directory))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get("/static/missing.js").status_code,
+                         404)
+        self.assertEqual(self.requests, [])
+
+    def test_passes_other_requests_to_app(self):
+        self.client.get("/plants")
+        self.client.post("/static/app.js")
+        self.assertEqual(self.requests, ["/plants", "/static/app.js"])
+
+class TestBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for filename, content in [("a.js", "var a = 1"), ("b.js", "var b")]:
+            with open(os.path.join(self.directory, filename), "w") as asset:
+                asset.write(content)
+
+    def read(self, filename):
+        with open(os.path.join(self.directory, filename)) as asset:
+            return asset.read()
+
+    def test_bundles_scripts_in_order(self):
+        names = assets.build(self.directory,
+                             {"build/all.js": ["b.js", "a.js"]},
+                             minify=False)
+        self.assertEqual(names, ["build/all.js"])
+        self.assertEqual(self.read("build/all.js"), "var b\n;var a = 1")
+
+    @mock.patch("app.assets.rjsmin")
+    def test_minifies_bundles(self, rjsmin):
+        rjsmin.jsmin.return_value = "minified"
+        assets.build(self.directory, {"all.js": ["a.js"]})
+        rjsmin.jsmin.assert_called_with("var a = 1")
+        self.assertEqual(self.read("all.js"), "minified")
+
+    @mock.patch("app.assets.rjsmin", new=None)
+    def test_leaves_bundles_unminified_without_rjsmin(self):
+        assets.build(self.directory, {"all.js": ["a.js"]})
+        self.assertEqual(self.read("all.js"), "var a = 1")
+
+class TestCompileTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache_dir = os.path.join(self.directory, "cache", "templates")
+        self.loader = jinja2.DictLoader({"a.html": "{{ 1 + 1 }}",
+                                         "b/c.html": "{% include 'a.html' %}"})
+
+    def environment(self):
+        return jinja2.Environment(
+            loader=self.loader, auto_reload=False,
+            bytecode_cache=assets.bytecode_cache(self.cache_dir))
+
+    def test_compiles_every_template(self):
+        environment = self.environment()
+        names = assets.compile_templates(environment)
+        self.assertEqual(sorted(names), ["a.html", "b/c.html"])
+        with mock.patch.object(environment, "compile") as compile:
+            self.assertEqual(environment.get_template("b/c.html").render(),
+                             "2")
+        self.assertFalse(compile.called)
+
+    def test_creates_cache_directory_once_written_to(self):
+        environment = self.environment()
+        self.assertFalse(os.path.exists(self.cache_dir))
+        environment.get_template("a.html")
+        self.assertTrue(os.path.isdir(self.cache_dir))
+
+    def test_later_environments_load_compiled_templates(self):
+        assets.compile_templates(self.environment())
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        environment = self.environment()
+        with mock.patch.object(environment, "compile") as compile:
+            self.assertEqual(environment.get_template("a.html").render(), "2")
+        self.assertFalse(compile.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+import mock
+import os
+import shutil
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import app.lib.coffee as coffee
+
+@mock.patch("app.lib.coffee.subprocess.call")
+class TestCoffee(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        os.mkdir(os.path.join(self.directory, "plants"))
+        self.fresh = self.write("plants/show.coffee", 1000)
+        self.write("plants/show.js", 2000)
+        self.stale = self.write("flash.coffee", 3000)
+        self.write("flash.js", 2000)
+        self.new = self.write("logs.coffee", 1000)
+
+    def write(self, filename, mtime):
+        path = os.path.join(self.directory, filename)
+        open(path, "w").close()
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_finds_sources(self, call):
+        self.assertItemsEqual(coffee.sources(self.directory),
+                              [self.fresh, self.stale, self.new])
+
+    def compile(self, args, shell):
+        # Writes what the compiler would
+        for path in args[2:]:
+            with open(coffee.js_path_for(path), "w") as output:
+                output.write("compiled " + os.path.basename(path))
+        return 0
+
+    def compile_but(self, broken):
+        # As the compiler does, stopping at the first source it can't compile
+        def compile(args, shell):
+            for path in args[2:]:
+                if path == broken:
+                    return 1
+                self.compile(["coffee", "-c", path], shell)
+            return 0
+        return compile
+
+    def test_compiles_stale_sources_at_once(self, call):
+        call.return_value = 0
+        compilation = coffee.compile_stale(self.directory)
+        self.assertItemsEqual(compilation.compiled, [self.stale, self.new])
+        self.assertEqual(call.call_count, 1)
+        args = call.call_args[0][0]
+        self.assertEqual(args[:2], ["coffee", "-c"])
+        self.assertItemsEqual(args[2:], [self.stale, self.new])
+
+    def test_does_not_run_compiler_when_nothing_is_stale(self, call):
+        call.side_effect = self.compile
+        coffee.compile_stale(self.directory)
+        compilation = coffee.compile_stale(self.directory)
+        self.assertEqual(compilation.compiled + compilation.cached, [])
+        self.assertEqual(call.call_count, 1)
+
+    def test_copies_previously_compiled_sources_from_cache(self, call):
+        call.side_effect = self.compile
+        cache = os.path.join(self.directory, "cache")
+        coffee.compile_stale(self.directory, cache)
+        # As a deploy would, replacing the output of unchanged sources
+        os.remove(coffee.js_path_for(self.stale))
+        os.remove(coffee.js_path_for(self.new))
+        with open(self.new, "w") as source:
+            source.write("changed")
+        compilation = coffee.compile_stale(self.directory, cache)
+        self.assertEqual(compilation.cached, [self.stale])
+        self.assertEqual(compilation.compiled, [self.new])
+        self.assertEqual(call.call_args[0][0], ["coffee", "-c", self.new])
+        with open(coffee.js_path_for(self.stale)) as output:
+            self.assertEqual(output.read(), "compiled flash.coffee")
+
+    def test_does_not_cache_failed_compilation(self, call):
+        cache = os.path.join(self.directory, "cache")
+        coffee.compile_stale(self.directory, cache)
+        self.assertFalse(os.path.isfile(coffee.cache_path_for(cache,
+                                                              self.new)))
+
+    def test_compiles_the_others_on_their_own_if_one_fails(self, call):
+        sources = sorted([self.stale, self.new])
+        call.side_effect = self.compile_but(sources[0])
+        compilation = coffee.compile_stale(self.directory)
+        self.assertEqual(compilation.compiled, sources[1:])
+        self.assertEqual(compilation.failed, sources[:1])
+        self.assertTrue(coffee.is_stale(sources[0]))
+        self.assertFalse(coffee.is_stale(sources[1]))
+
+    def test_reports_compilation(self, call):
+        compilation = coffee.Compilation(["a", "b"], ["c"], [], 1.234)
+        self.assertEqual(str(compilation), "Compiled 3 CoffeeScript sources "
+                                           "(1 from cache) in 1.23s")
+
+    def test_reports_sources_that_failed(self, call):
+        compilation = coffee.Compilation(["a"], [], ["b", "c"], 1.234)
+        self.assertEqual(str(compilation), "Compiled 1 CoffeeScript sources "
+                                           "(0 from cache) in 1.23s; could "
+                                           "not compile b, c")
+
+    def test_watcher_compiles_until_stopped(self, call):
+        watcher = coffee.Watcher(self.directory, interval=0.01)
+        compilation = coffee.Compilation([], [], [], 0.0)
+        with mock.patch("app.lib.coffee.compile_stale",
+                        side_effect=lambda *args: watcher.stop() or compilation
+                        ) as compile_stale:
+            watcher.run()
+        compile_stale.assert_called_once_with(self.directory, None, set())
+
+    def test_watcher_skips_failed_sources_until_they_change(self, call):
+        call.side_effect = self.compile_but(self.new)
+        watcher = coffee.Watcher(self.directory, interval=0.01)
+        compilations = []
+        real_compile_stale = coffee.compile_stale
+        def compile_stale(*args):
+            compilations.append(real_compile_stale(*args))
+            if len(compilations) == 2:
+                os.utime(self.new, (5000, 5000))
+            elif len(compilations) == 3:
+                watcher.stop()
+            return compilations[-1]
+        with mock.patch("app.lib.coffee.compile_stale",
+                        side_effect=compile_stale):
+            watcher.run()
+        self.assertEqual([compilation.failed for compilation in compilations],
+                         [[self.new], [], [self.new]])
+
+    @mock.patch("app.lib.coffee.Watcher")
+    def test_livecompile_watches_instead_of_hooking_requests(self, Watcher,
+                                                             call):
+        app = mock.Mock(name="app", root_path=self.directory,
+                        static_url_path="")
+        call.return_value = 0
+        coffee.livecompile(app, interval=2)
+        Watcher.assert_called_with(self.directory, 2, None)
+        Watcher.return_value.start.assert_called_with()
+        app.before_request.assert_not_called()
+        self.assertEqual(call.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
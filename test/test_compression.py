@@ -0,0 +1,69 @@
+import unittest
+import gzip
+import os
+import StringIO
+import sys
+import zlib
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+from werkzeug.test import Client
+from werkzeug.wrappers import BaseResponse
+import app.compression as compression
+
+def gunzip(data):
+    return gzip.GzipFile(fileobj=StringIO.StringIO(data)).read()
+
+class TestCompress(unittest.TestCase):
+
+    def setUp(self):
+        self.content_type = "application/json"
+        self.body = ['{"data": "', "x" * 2000, '"}']
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", self.content_type)])
+            return self.body
+
+        self.client = Client(compression.Compress(app, minimum_size=1024),
+                             BaseResponse)
+
+    def get(self, encoding="gzip, deflate"):
+        return self.client.get("/", headers={"Accept-Encoding": encoding})
+
+    def test_gzips_large_json(self):
+        response = self.get()
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+        self.assertEqual(int(response.headers["Content-Length"]),
+                         len(response.data))
+        self.assertEqual(gunzip(response.data), "".join(self.body))
+
+    def test_deflates_when_gzip_not_accepted(self):
+        response = self.get("deflate")
+        self.assertEqual(response.headers["Content-Encoding"], "deflate")
+        self.assertEqual(zlib.decompress(response.data), "".join(self.body))
+
+    def test_compresses_log_downloads(self):
+        self.content_type = "text/plain; charset=utf-8"
+        self.assertEqual(self.get().headers["Content-Encoding"], "gzip")
+
+    def test_leaves_small_responses(self):
+        self.body = ['{"a": 1}']
+        response = self.get()
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+        self.assertEqual(response.data, '{"a": 1}')
+
+    def test_leaves_other_types(self):
+        self.content_type = "text/html"
+        response = self.get()
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.data, "".join(self.body))
+
+    def test_leaves_responses_when_not_accepted(self):
+        for encoding in ("", "identity", "gzip;q=0"):
+            response = self.get(encoding)
+            self.assertNotIn("Content-Encoding", response.headers)
+            self.assertEqual(response.data, "".join(self.body))
+
+
+if __name__ == '__main__':
+    unittest.main()
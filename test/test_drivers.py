@@ -0,0 +1,129 @@
+import unittest
+import mock
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import app.drivers as drivers
+import app.tenancy as tenancy
+
+@mock.patch("app.drivers.smbus", new=None)
+@mock.patch("app.drivers.SensorCluster")
+class TestHardwareDriver(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = drivers.HardwareDriver(bus=1)
+
+    def test_reads_sensor_cluster_of_slot(self, SensorCluster):
+        SensorCluster.return_value.sensor_values.return_value = {"light": 1}
+        self.assertEqual(self.driver.sensor_values(2), {"light": 1})
+        SensorCluster.assert_called_with(ID=2)
+
+    def test_reads_water_level(self, SensorCluster):
+        SensorCluster.get_water_level.return_value = 0.5
+        self.assertEqual(self.driver.water_level(), 0.5)
+
+    def test_reads_on_its_own_bus(self, SensorCluster):
+        self.driver.bus = bus = mock.Mock(name="bus")
+        self.driver.clusters = [mock.Mock(name="cluster")]
+        def sensor_values():
+            self.assertIs(SensorCluster.bus, bus)
+            self.assertIs(drivers.ControlCluster.bus, bus)
+            return {}
+        SensorCluster.return_value.sensor_values.side_effect = sensor_values
+        self.driver.sensor_values(1)
+        self.assertIsNot(drivers.ControlCluster.bus, bus)
+
+    def test_keeps_its_own_control_states(self, SensorCluster):
+        other = drivers.HardwareDriver(bus=2)
+        self.driver.bus = mock.Mock(name="bus 1")
+        other.bus = mock.Mock(name="bus 2")
+        self.driver.control(on="light")
+        other.control(on="fan")
+        self.assertEqual(self.driver.clusters[0].controls["light"], "on")
+        self.assertEqual(self.driver.clusters[0].controls["fan"], "off")
+        self.assertEqual(other.clusters[0].controls["light"], "off")
+        self.assertNotIn(self.driver.clusters[0],
+                         drivers.ControlCluster._list)
+
+
+class TestSimulatedDriver(unittest.TestCase):
+
+    def driver(self, **kwargs):
+        return drivers.SimulatedDriver(**kwargs)
+
+    def test_starts_at_ambient_conditions(self):
+        values = self.driver().sensor_values(1)
+        self.assertEqual(values, drivers.SimulatedDriver.AMBIENT)
+
+    def test_is_deterministic_for_seed(self):
+        def readings(seed):
+            driver = self.driver(seed=seed, noise=5.0)
+            return [driver.sensor_values(slot_id) for slot_id in (1, 2, 1)]
+        self.assertEqual(readings(3), readings(3))
+        self.assertNotEqual(readings(3), readings(4))
+
+    def test_slots_do_not_depend_on_read_order(self):
+        first = self.driver(noise=5.0)
+        second = self.driver(noise=5.0)
+        first.sensor_values(2)
+        self.assertEqual(first.sensor_values(1), second.sensor_values(1))
+
+    def test_pump_waters_plants_and_drains_tank(self):
+        driver = self.driver(step=1.0)
+        driver.control(on="pump")
+        before = driver.sensor_values(1)["water"]
+        self.assertGreater(driver.sensor_values(1)["water"], before)
+        self.assertLess(driver.water_level(), 1.0)
+
+    def test_fan_cools_air(self):
+        driver = self.driver()
+        driver.control(on=["fan"])
+        self.assertLess(driver.sensor_values(1)["temperature"],
+                        drivers.SimulatedDriver.AMBIENT["temperature"])
+
+    def test_light_brightens(self):
+        driver = self.driver()
+        driver.control(on="light")
+        self.assertGreater(driver.sensor_values(1)["light"],
+                           drivers.SimulatedDriver.AMBIENT["light"])
+
+    def test_conditions_return_to_ambient(self):
+        driver = self.driver()
+        driver.control(on="all")
+        driver.sensor_values(1)
+        driver.control(off="all")
+        for _ in range(100):
+            values = driver.sensor_values(1)
+        self.assertAlmostEqual(values["light"],
+                               drivers.SimulatedDriver.AMBIENT["light"], 1)
+
+    def test_fails_at_failure_rate(self):
+        driver = self.driver(failure_rate=1.0)
+        with self.assertRaises(drivers.SensorError):
+            driver.sensor_values(1)
+
+    @mock.patch("app.drivers.time.sleep")
+    def test_takes_latency_to_read(self, sleep):
+        self.driver(latency=0.25).sensor_values(1)
+        sleep.assert_called_with(0.25)
+
+
+@mock.patch.dict("app.drivers._drivers", clear=True)
+class TestCurrentDriver(unittest.TestCase):
+
+    @mock.patch("app.drivers.config.DRIVER", new="simulated")
+    def test_builds_configured_driver(self):
+        self.assertIsInstance(drivers.current(), drivers.SimulatedDriver)
+        self.assertIs(drivers.current(), drivers.current())
+
+    def test_builds_driver_of_greenhouse(self):
+        greenhouse = tenancy.Greenhouse("north", ":memory:", bus=3,
+                                        driver="hardware")
+        with tenancy.activate(greenhouse):
+            driver = drivers.current()
+        self.assertIsInstance(driver, drivers.HardwareDriver)
+        self.assertEqual(driver.bus_id, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -94,19 +94,30 @@ class TestGlobalSettingsForm(unittest.TestCase):
 
     @mock.patch("app.forms.models.GlobalSetting")
     @mock.patch("app.forms.models.PlantDatabase")
-    def test_submit_saves_form(self, PlantDatabase, GS):
+    def test_submit_saves_form(self, PlantDatabase, GlobalSetting):
         self.form_data['enabled'] = ['2']
         self.form_data['active_start'] = ['02:00 PM']
         self.form_data['active_end'] = ['01:30 AM']
         self.form.submit()
-        self.controls[0].update.assert_called_with(active_start=None,
-                                                   active_end=None,
-                                                   enabled=False)
-        self.controls[1].update.assert_called_with(active_start=time(14, 0),
-                                                   active_end=time(1, 30),
-                                                   enabled=True)
-        self.controls[0].save.assert_called_with()
-        self.controls[1].save.assert_called_with()
+        GlobalSetting.update_all.assert_called_once_with(
+            {
+                self.controls[0]: {'active_start': None,
+                                   'active_end': None,
+                                   'enabled': False},
+                self.controls[1]: {'active_start': time(14, 0),
+                                   'active_end': time(1, 30),
+                                   'enabled': True},
+            },
+            notify_plants=True,
+            notify_maintenance=False)
+
+    def test_parses_each_list_once(self):
+        form_data = FormDataStub(self.form_data)
+        controls = [mock.Mock(id=id) for id in range(1, 50)]
+        with mock.patch.object(form_data, "getlist",
+                               wraps=form_data.getlist) as getlist:
+            forms.GlobalSettingsForm(controls, form_data).data
+        self.assertEqual(len(getlist.mock_calls), 3)
 
     @mock.patch("app.forms.models.GlobalSetting")
     @mock.patch("app.forms.models.PlantDatabase")
@@ -121,8 +132,71 @@ class TestGlobalSettingsForm(unittest.TestCase):
     @mock.patch("app.forms.models.PlantDatabase")
     def test_submit_updates_global_settings(self, PD, GlobalSetting):
         self.form.submit()
-        self.assertEqual(GlobalSetting.notify_plants, True)
-        self.assertEqual(GlobalSetting.notify_maintenance, False)
+        _, kwargs = GlobalSetting.update_all.call_args
+        self.assertEqual(kwargs, {'notify_plants': True,
+                                  'notify_maintenance': False})
+
+class TestPlantSettingsForm(unittest.TestCase):
+
+    def form(self, *rows):
+        columns = zip(*rows) or [[]] * 5
+        return forms.PlantSettingsForm(FormDataStub(
+            dict(zip(forms.PlantSettingsForm.FIELDS, map(list, columns)))))
+
+    def test_parses_new_and_old_thresholds(self):
+        form = self.form(("water", "11", "1", "", "false"),
+                         ("humidity", "15.5", "1.25", "3", "false"))
+        self.assertTrue(form.valid)
+        self.assertEqual(form.new_thresholds, [{
+            'sensor_name': "water",
+            'deviation_percent': 11,
+            'deviation_time': 1.0,
+        }])
+        self.assertEqual(form.old_thresholds, [(3, {
+            'sensor_name': "humidity",
+            'deviation_percent': 15,
+            'deviation_time': 1.25,
+        })])
+
+    def test_deleted_rows_are_only_deleted(self):
+        form = self.form(("water", "11", "", "3", "true"),
+                         ("light", "11", "1", "", "true"))
+        self.assertTrue(form.valid)
+        self.assertEqual(form.deleted_ids, [3])
+        self.assertEqual(form.new_thresholds, [])
+        self.assertEqual(form.old_thresholds, [])
+
+    def test_ignores_blank_rows(self):
+        form = self.form(("", "", "", "", "false"))
+        self.assertTrue(form.valid)
+        self.assertEqual(form.new_thresholds, [])
+
+    def test_rows_partly_filled_in_have_errors(self):
+        form = self.form(("water", "11", "", "", "false"))
+        self.assertFalse(form.valid)
+        self.assertEqual(form.rows[0].errors, {'deviation_time': "is empty"})
+        self.assertEqual(form.new_thresholds, [])
+
+    def test_rows_with_invalid_values_have_errors(self):
+        form = self.form(("water", "11", "0", "", "false"),
+                         ("water", "lots", "1", "", "false"),
+                         ("light", "11", "1", "", "false"))
+        self.assertFalse(form.valid)
+        self.assertEqual(form.rows[0].errors,
+                         {'deviation_time': "is invalid"})
+        self.assertIn('deviation_percent', form.rows[1].errors)
+        self.assertEqual([kw['sensor_name'] for kw in form.new_thresholds],
+                         ["light"])
+
+    def test_parses_form_once(self):
+        form_data = FormDataStub({field: [] for field in
+                                  forms.PlantSettingsForm.FIELDS})
+        with mock.patch.object(form_data, "getlist",
+                               wraps=form_data.getlist) as getlist:
+            form = forms.PlantSettingsForm(form_data)
+            form.valid, form.new_thresholds, form.old_thresholds
+        self.assertEqual(len(getlist.mock_calls), 5)
+
 
 class FormDataStub(object):
     def __init__(self, data):
@@ -6,6 +6,7 @@ import json
 from datetime import datetime as dt, time
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 import app.models as models
+import app.actuators as actuators
 from app.config import TEST_DATABASE, SCHEMA
 
 class TestPlant(unittest.TestCase):
@@ -51,6 +52,14 @@ class TestPlant(unittest.TestCase):
         plant.slot_id = 3
         self.assertFalse(plant.is_valid())
 
+    @mock.patch("app.models.NUMBER_OF_PLANTS", new=32)
+    def test_permits_configured_number_of_plants(self):
+        plant = plant_fixture()
+        plant.slot_id = 32
+        self.assertTrue(plant.is_valid())
+        plant.slot_id = 33
+        self.assertFalse(plant.is_valid())
+
     def test_looks_up_by_slot_id(self):
         plant = plant_fixture()
         plant.save()
@@ -126,6 +135,35 @@ class TestPlant(unittest.TestCase):
         plant.save()
         self.assertEqual(plant.humidity, 0)
 
+    def test_gets_all_current_values(self):
+        plant = plant_fixture()
+        plant.save()
+        plant.record_sensor("light", 17.6)
+        plant.record_sensor("light", 18.1)
+        plant.record_sensor("water", 3.0)
+        self.assertEqual(plant.current_values(), {
+            "light": 18.1,
+            "water": 3.0,
+            "humidity": 0,
+            "temperature": 0,
+        })
+
+    def test_gets_plants_for_slots_in_order(self):
+        plant = plant_fixture()
+        plant.slot_id = 2
+        plant.save()
+        self.assertEqual(models.Plant.for_slots([1, 2]), [None, plant])
+
+    def test_for_slot_preloads_included_associations(self):
+        plant = plant_fixture()
+        plant.plant_setting = models.PlantSetting()
+        plant.save()
+        plant = models.Plant.for_slot(plant.slot_id,
+                                      include=["plant_setting"])
+        with mock.patch("lazy_record.associations.query.Query") as Query:
+            self.assertIsNotNone(plant.plant_setting)
+            Query.assert_not_called()
+
     def test_raises_attribute_error_on_bad_access(self):
         with self.assertRaises(AttributeError):
             plant_fixture().asfasdfsadfas
@@ -156,6 +194,24 @@ class TestPlantDatabase(unittest.TestCase):
         from_json.assert_called_with(plant_json())
         json.load.assert_called_with(response)
 
+    @mock.patch("app.models.PLANT_DATABASE", new="PLANT_DATABASE")
+    @mock.patch("app.models.json")
+    @mock.patch("app.models.urllib2")
+    def test_fetches_params_of_plants_in_one_request(self, urllib2, json):
+        first, second, other = plant_json(), plant_json(), plant_json()
+        for params, id in [(first, 1), (second, 2), (other, 3)]:
+            params["id"] = id
+            del params["plant_database_id"]
+        json.load.return_value = [first, second, other]
+        params = models.PlantDatabase.plants_params([1, 2, 4],
+                                                    filter=["maturity"])
+        urllib2.urlopen.assert_called_once_with(
+            "http://PLANT_DATABASE/api/plants")
+        self.assertEqual(sorted(params), [1, 2])
+        expected = plant_json()
+        del expected["maturity"]
+        self.assertEqual(params[1], expected)
+
     @mock.patch("app.models.PLANT_DATABASE", new="PLANT_DATABASE")
     @mock.patch("app.models.urllib2.urlopen")
     def test_list_raises_if_cannot_connect_to_plant_database(self, urlopen):
@@ -276,7 +332,7 @@ class TestPlantDatabase(unittest.TestCase):
     @mock.patch("app.models.Token")
     @mock.patch("app.models.requests.post")
     def test_adds_device_to_plant_database(self, post, Token):
-        Token.last.return_value = mock.Mock(name="token", token="TOKEN")
+        Token.current.return_value = mock.Mock(name="token", token="TOKEN")
         models.PlantDatabase.add_device("DEVICE_ID")
         post.assert_called_with("http://PLANT_DATABASE/api/devices",
                                 json={"token": "TOKEN",
@@ -287,7 +343,7 @@ class TestPlantDatabase(unittest.TestCase):
     @mock.patch("app.models.requests.post")
     def test_add_fails_silently_if_cannot_connect(self, post, Token):
         post.side_effect = models.requests.exceptions.ConnectionError
-        Token.last.return_value = mock.Mock(name="token", token="TOKEN")
+        Token.current.return_value = mock.Mock(name="token", token="TOKEN")
         models.PlantDatabase.add_device("DEVICE_ID")
         post.assert_called_with("http://PLANT_DATABASE/api/devices",
                                 json={"token": "TOKEN",
@@ -297,16 +353,17 @@ class TestPlantDatabase(unittest.TestCase):
     @mock.patch("app.models.Token")
     @mock.patch("app.models.requests.post")
     def test_add_fails_silently_if_no_token(self, post, Token):
-        Token.last.return_value = None
+        Token.current.return_value = None
         self.assertEqual(models.PlantDatabase.add_device("DEVICE_ID"), None)
 
     @mock.patch("app.models.PLANT_DATABASE", new="PLANT_DATABASE")
     @mock.patch("app.models.Token")
     @mock.patch("app.models.requests.post")
     def test_update_notification_settings_calls_database(self, post, Token):
-        Token.last.return_value = mock.Mock(name="token", token="TOKEN")
-        models.PlantDatabase.update_notification_settings({'email': True,
-                                                           'push': False})
+        Token.current.return_value = mock.Mock(name="token", token="TOKEN")
+        self.assertEqual(
+            models.PlantDatabase.update_notification_settings(
+            {'email': True, 'push': False}), post.return_value)
         post.assert_called_with(
             "http://PLANT_DATABASE/api/notification_settings",
             json={"token": "TOKEN",
@@ -318,9 +375,10 @@ class TestPlantDatabase(unittest.TestCase):
     @mock.patch("app.models.requests.post")
     def test_add_fails_silently_if_cannot_connect(self, post, Token):
         post.side_effect = models.requests.exceptions.ConnectionError
-        Token.last.return_value = mock.Mock(name="token", token="TOKEN")
-        models.PlantDatabase.update_notification_settings({'email': True,
-                                                           'push': False})
+        Token.current.return_value = mock.Mock(name="token", token="TOKEN")
+        self.assertEqual(
+            models.PlantDatabase.update_notification_settings(
+            {'email': True, 'push': False}), None)
         post.assert_called_with(
             "http://PLANT_DATABASE/api/notification_settings",
             json={"token": "TOKEN",
@@ -331,7 +389,7 @@ class TestPlantDatabase(unittest.TestCase):
     @mock.patch("app.models.Token")
     @mock.patch("app.models.requests.post")
     def test_add_fails_silently_if_no_token(self, post, Token):
-        Token.last.return_value = None
+        Token.current.return_value = None
         self.assertEqual(
             models.PlantDatabase.update_notification_settings(
             {'email': True, 'push': False}), None)
@@ -340,7 +398,7 @@ class TestPlantDatabase(unittest.TestCase):
     @mock.patch("app.models.Token")
     @mock.patch("app.models.requests.post")
     def test_returns_notification_settings(self, post, Token):
-        Token.last.return_value = mock.Mock(name="token", token="TOKEN")
+        Token.current.return_value = mock.Mock(name="token", token="TOKEN")
         json_value = {'email': False, 'push': True}
         post.return_value.content = json.dumps(json_value)
         self.assertEqual(models.PlantDatabase.get_notification_settings(),
@@ -353,7 +411,7 @@ class TestPlantDatabase(unittest.TestCase):
     @mock.patch("app.models.Token")
     @mock.patch("app.models.requests.post")
     def test_get_notification_settings_raises_if_no_token(self, post, Token):
-        Token.last.return_value = None
+        Token.current.return_value = None
         json_value = {'email': False, 'push': True}
         post.return_value.content = json.dumps(json_value)
         with self.assertRaises(models.PlantDatabase.CannotConnect):
@@ -363,7 +421,7 @@ class TestPlantDatabase(unittest.TestCase):
     @mock.patch("app.models.Token")
     @mock.patch("app.models.requests.post")
     def test_get_notification_settings_raises_no_connect(self, post, Token):
-        Token.last.return_value = mock.Mock(name="token", token="TOKEN")
+        Token.current.return_value = mock.Mock(name="token", token="TOKEN")
         post.side_effect = models.requests.exceptions.ConnectionError
         with self.assertRaises(models.PlantDatabase.CannotConnect):
             models.PlantDatabase.get_notification_settings()
@@ -400,6 +458,49 @@ class TestSensorDataPoint(unittest.TestCase):
         self.assertIn(in_scope, models.SensorDataPoint.light())
         self.assertNotIn(out_scope, models.SensorDataPoint.light())
 
+    def create_point(self, value, sensor_name="light", plant_id=1):
+        return models.SensorDataPoint.create(plant_id=plant_id,
+                                             sensor_name=sensor_name,
+                                             sensor_value=value)
+
+    def test_values_gives_readings_for_plant_in_order(self):
+        with mock.patch("lazy_record.base.datetime.datetime") as datetime:
+            datetime.today.return_value = dt(2016, 1, 1)
+            self.create_point(3.0)
+            self.create_point(1.0, sensor_name="water")
+            self.create_point(9.0, plant_id=2)
+        self.assertEqual(list(models.SensorDataPoint.values(1)), [
+            models.SensorDataPoint.Reading(dt(2016, 1, 1), "light", 3.0),
+            models.SensorDataPoint.Reading(dt(2016, 1, 1), "water", 1.0),
+        ])
+
+    def test_values_filters_by_sensor(self):
+        self.create_point(3.0)
+        self.create_point(1.0, sensor_name="water")
+        readings = list(models.SensorDataPoint.values(1, "water"))
+        self.assertEqual([r.sensor_value for r in readings], [1.0])
+
+    def test_values_filters_by_time(self):
+        with mock.patch("lazy_record.base.datetime.datetime") as datetime:
+            datetime.today.return_value = dt(2016, 1, 1)
+            self.create_point(3.0)
+            datetime.today.return_value = dt(2016, 1, 3)
+            self.create_point(4.0)
+        readings = models.SensorDataPoint.values(1, since=dt(2016, 1, 2))
+        self.assertEqual([r.sensor_value for r in readings], [4.0])
+
+    def test_column_gives_single_column(self):
+        self.create_point(3.0)
+        self.create_point(5.0)
+        self.assertEqual(list(models.SensorDataPoint.column(
+            "sensor_value", 1, "light")), [3.0, 5.0])
+
+    def test_window_holds_sensor_values(self):
+        self.create_point(3.0)
+        self.create_point(1.0, sensor_name="water")
+        window = models.SensorDataPoint.window(1, "light")
+        self.assertEqual(list(window.values), [3.0])
+
 
 class TestNotificationThreshold(unittest.TestCase):
 
@@ -433,6 +534,9 @@ class TestNotificationThreshold(unittest.TestCase):
         self.assertNotIn(self.point2, self.nt.sensor_data_points)
         self.assertNotIn(self.point3, self.nt.sensor_data_points)
 
+    def test_loads_window_of_sensor_values(self):
+        self.assertEqual(list(self.nt.window().values), [17.3])
+
     def test_is_invalid_if_time_is_zero(self):
         self.nt.deviation_time = 0
         self.assertFalse(self.nt.is_valid())
@@ -444,6 +548,70 @@ class TestNotificationThreshold(unittest.TestCase):
     def test_sets_triggered_at_to_creation_time(self):
         self.assertEqual(self.nt.triggered_at, self.start_time)
 
+class TestPlantSetting(unittest.TestCase):
+
+    def setUp(self):
+        models.lazy_record.connect_db(TEST_DATABASE)
+        with open(SCHEMA) as schema:
+            models.lazy_record.load_schema(schema.read())
+        plant = plant_fixture()
+        plant.plant_setting = models.PlantSetting()
+        plant.save()
+        self.setting = plant.plant_setting
+        self.light = self.setting.notification_thresholds.create(
+            sensor_name="light", deviation_percent=15, deviation_time=1)
+        self.water = self.setting.notification_thresholds.create(
+            sensor_name="water", deviation_percent=20, deviation_time=2)
+
+    def thresholds(self):
+        return sorted((t.sensor_name, t.deviation_percent, t.deviation_time)
+                      for t in models.NotificationThreshold.all())
+
+    def test_replace_thresholds_creates_updates_and_destroys(self):
+        thresholds = self.setting.replace_thresholds([
+            {"id": self.light.id, "sensor_name": "light",
+             "deviation_percent": 30, "deviation_time": 1},
+            {"sensor_name": "humidity", "deviation_percent": 5,
+             "deviation_time": 4},
+        ])
+        self.assertEqual(self.thresholds(), [("humidity", 5, 4.0),
+                                             ("light", 30, 1.0)])
+        self.assertEqual(sorted(t.sensor_name for t in thresholds),
+                         ["humidity", "light"])
+        self.assertEqual(models.NotificationThreshold.find(
+            self.light.id).plant_setting_id, self.setting.id)
+
+    def test_replace_thresholds_leaves_unchanged_thresholds(self):
+        updated_at = models.NotificationThreshold.find(
+            self.water.id).updated_at
+        self.setting.replace_thresholds([
+            {"id": self.light.id, "sensor_name": "light",
+             "deviation_percent": 30, "deviation_time": 1},
+            {"id": self.water.id, "sensor_name": "water",
+             "deviation_percent": "20", "deviation_time": 2},
+        ])
+        self.assertEqual(models.NotificationThreshold.find(
+            self.water.id).updated_at, updated_at)
+
+    def test_replace_thresholds_changes_nothing_if_one_is_invalid(self):
+        with self.assertRaises(models.lazy_record.RecordInvalid):
+            self.setting.replace_thresholds([
+                {"sensor_name": "humidity", "deviation_percent": 5,
+                 "deviation_time": 4},
+                {"sensor_name": "light", "deviation_percent": 0,
+                 "deviation_time": 1},
+            ])
+        self.assertEqual(self.thresholds(), [("light", 15, 1.0),
+                                             ("water", 20, 2.0)])
+
+    def test_replace_thresholds_refuses_thresholds_of_other_settings(self):
+        with self.assertRaises(models.lazy_record.RecordNotFound):
+            self.setting.replace_thresholds([
+                {"id": 99, "sensor_name": "light", "deviation_percent": 5,
+                 "deviation_time": 1},
+            ])
+        self.assertEqual(len(models.NotificationThreshold), 2)
+
 @mock.patch("app.models.PLANT_DATABASE", new="PLANT_DATABASE")
 @mock.patch("app.models.requests.post")
 class TestToken(unittest.TestCase):
@@ -511,6 +679,48 @@ class TestToken(unittest.TestCase):
         models.Token.refresh()
         get.assert_called_with(token="mytoken")
 
+    def test_keeps_only_newest_token(self, _post):
+        models.Token.create(token="old")
+        models.Token.create(token="new")
+        self.assertEqual([token.token for token in models.Token.all()],
+                         ["new"])
+
+    def test_keeps_old_token_if_save_fails(self, _post):
+        models.Token.create(token="old")
+        with mock.patch.object(models.lazy_record.base.Repo, "insert",
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                models.Token.create(token="new")
+        self.assertEqual([token.token for token in models.Token.all()],
+                         ["old"])
+
+    def test_keeps_old_token_if_deleting_it_fails(self, _post):
+        models.Token.create(token="old")
+        with mock.patch.object(models.lazy_record.repo.Repo, "delete",
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                models.Token.create(token="new")
+        self.assertEqual([token.token for token in models.Token.all()],
+                         ["old"])
+
+    def test_current_is_newest_token(self, _post):
+        self.assertEqual(models.Token.current(), None)
+        models.Token.create(token="mytoken")
+        self.assertEqual(models.Token.current().token, "mytoken")
+
+    def test_current_is_read_once(self, _post):
+        models.Token.create(token="mytoken")
+        with mock.patch("app.models.Token.last") as last:
+            models.Token.current()
+            last.assert_not_called()
+
+    def test_current_is_updated_by_get(self, post):
+        models.Token.create(token="old")
+        post.return_value = mock.Mock(ok=True, status_code=200,
+                                      text='{"token":"new"}')
+        models.Token.refresh()
+        self.assertEqual(models.Token.current().token, "new")
+
 class TestControl(unittest.TestCase):
 
     def setUp(self):
@@ -613,22 +823,75 @@ class TestControl(unittest.TestCase):
         dat.today.return_value = dt(2015, 01, 15)
         control = models.Control.create(enabled=True,
                                         name="fan")
+        Control.return_value.on.side_effect = switch
         control.activate()
         Control.assert_called_with("fan")
-        Control.return_value.on.assert_called_with()
+        Control.return_value.on.assert_called_with(force=True,
+                                                   then=mock.ANY)
         self.assertEqual(control.disabled_at, None)
         self.assertEqual(control.active, True)
 
+    @mock.patch("app.models.services.Control")
+    def test_does_not_save_when_already_active(self, Control):
+        control = models.Control.create(enabled=True,
+                                        name="fan",
+                                        active=True)
+        Control.return_value.on.side_effect = switch
+        with mock.patch.object(control, "save") as save:
+            self.assertTrue(control.activate())
+            save.assert_not_called()
+
+    @mock.patch("app.models.services.Control")
+    def test_does_not_activate_while_dwelling(self, Control):
+        Control.return_value.on.return_value = False
+        control = models.Control.create(enabled=True,
+                                        name="fan",
+                                        active=False)
+        self.assertFalse(control.activate(force=False))
+        Control.return_value.on.assert_called_with(force=False,
+                                                   then=mock.ANY)
+        self.assertEqual(models.Control.find(control.id).active, False)
+
     @mock.patch("app.models.services.Control")
     def test_deactivates(self, Control):
         control = models.Control.create(enabled=True,
                                         name="fan",
                                         active=True)
+        Control.return_value.off.side_effect = switch
         control.deactivate()
         Control.assert_called_with("fan")
-        Control.return_value.off.assert_called_with()
+        Control.return_value.off.assert_called_with(force=True,
+                                                    then=mock.ANY)
         self.assertEqual(control.active, False)
 
+    @mock.patch("app.models.services.actuators.current")
+    def test_saved_only_once_batch_is_sent(self, current):
+        current.return_value = actuators.Actuators(mock.Mock(name="driver"))
+        current.return_value.driver.control.side_effect = IOError
+        control = models.Control.create(enabled=True,
+                                        name="fan",
+                                        active=False)
+        with self.assertRaises(IOError):
+            with current.return_value.batch():
+                self.assertTrue(control.activate(force=False))
+                self.assertEqual(models.Control.find(control.id).active,
+                                 False)
+        self.assertEqual(models.Control.find(control.id).active, False)
+        self.assertEqual(control.active, False)
+        current.return_value.driver.control.side_effect = None
+        with current.return_value.batch():
+            control.activate(force=False)
+        self.assertEqual(models.Control.find(control.id).active, True)
+
+    @mock.patch("app.models.services.Control")
+    def test_temporarily_disables_inactive_control(self, Control):
+        control = models.Control.create(enabled=True,
+                                        name="fan",
+                                        active=False)
+        control.temporarily_disable()
+        self.assertEqual(models.Control.find(control.id).enabled,
+                         models.Control.TemporarilyDisabled)
+
     def test_may_activate_when_enabled(self):
         control = models.Control.create(name="fan",
                                         enabled=True)
@@ -688,28 +951,169 @@ class TestControl(unittest.TestCase):
                                         enabled=True)
         self.assertFalse(control.may_activate)
 
+    def test_pump_may_activate_once_refilled(self):
+        models.WaterLevel.create(level=12)
+        control = models.Control.create(name="pump",
+                                        enabled=True)
+        control.may_activate
+        models.WaterLevel.create(level=80)
+        with mock.patch("app.models.WaterLevel.last") as last:
+            self.assertTrue(control.may_activate)
+            last.assert_not_called()
+
 class TestGlobalSetting(unittest.TestCase):
 
-    @mock.patch("app.models.Control")
-    def test_finds_controls(self, Control):
+    def setUp(self):
+        models.lazy_record.connect_db(TEST_DATABASE)
+        with open(SCHEMA) as schema:
+            models.lazy_record.load_schema(schema.read())
+
+    def tearDown(self):
+        models.lazy_record.close_db()
+
+    def test_finds_controls(self):
+        fan = models.Control.create(name="fan", enabled=True)
+        self.assertEqual([control.id for control in
+                          models.GlobalSetting.controls], [fan.id])
+
+    @mock.patch("app.models.Control.all", return_value=[])
+    def test_loads_controls_once(self, all):
         models.GlobalSetting.controls
-        Control.all.assert_called_with()
+        models.GlobalSetting.controls
+        all.assert_called_once_with()
 
-    @mock.patch("app.models.Control")
-    def test_finds_enabled_controls(self, Control):
-        models.GlobalSetting.enabled_controls
-        Control.where.assert_called_with(enabled=True)
+    def test_keeps_controls_up_to_date(self):
+        fan = models.Control.create(name="fan", enabled=True)
+        models.GlobalSetting.controls
+        pump = models.Control.create(name="pump", enabled=True)
+        fan.enabled = False
+        fan.save()
+        controls = models.GlobalSetting.controls
+        self.assertEqual([(control.id, control.enabled)
+                          for control in controls],
+                         [(fan.id, False), (pump.id, True)])
+        pump.destroy()
+        self.assertEqual(len(models.GlobalSetting.controls), 1)
+
+    def test_finds_controls_by_id(self):
+        fan = models.Control.create(name="fan", enabled=True)
+        self.assertEqual(models.GlobalSetting.controls.find(fan.id).name,
+                         "fan")
+        with self.assertRaises(models.lazy_record.RecordNotFound):
+            models.GlobalSetting.controls.find(fan.id + 1)
 
-    @mock.patch("app.models.Control")
-    def test_finds_controls_by_name(self, Control):
-        models.GlobalSetting.control("fans")
-        Control.find_by.assert_called_with(name="fans")
+    def test_finds_enabled_controls(self):
+        models.Control.create(name="fan", enabled=True,
+                              disabled_at=dt.now())
+        models.Control.create(name="pump", enabled=False)
+        self.assertEqual([control.name for control in
+                          models.GlobalSetting.enabled_controls], ["fan"])
 
-    @mock.patch("app.models.Control")
-    def test_control_returns_none_if_no_control(self, Control):
-        Control.find_by.side_effect = models.lazy_record.RecordNotFound
+    def test_finds_controls_by_name(self):
+        models.Control.create(name="fans", enabled=True)
+        self.assertEqual(models.GlobalSetting.control("fans").name, "fans")
+
+    def test_control_returns_none_if_no_control(self):
         self.assertEqual(models.GlobalSetting.control("fans"), None)
 
+    @mock.patch("app.models.GlobalSetting.last")
+    def test_reads_singleton_once(self, last):
+        last.return_value = mock.Mock(name="GlobalSetting", notify_plants=True)
+        models.GlobalSetting.notify_plants
+        models.GlobalSetting.notify_maintenance
+        last.assert_called_once_with()
+
+    def test_keeps_singleton_up_to_date(self):
+        models.GlobalSetting.create(notify_plants=True,
+                                    notify_maintenance=True)
+        models.GlobalSetting.notify_plants
+        setting = models.GlobalSetting.last()
+        setting.notify_plants = False
+        setting.save()
+        self.assertEqual(models.GlobalSetting.notify_plants, False)
+
+    def test_drops_controls_if_save_fails(self):
+        fan = models.Control.create(name="fan", enabled=True)
+        control = models.GlobalSetting.controls.find(fan.id)
+        control.enabled = False
+        with mock.patch.object(models.lazy_record.Base, "save",
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                control.save()
+        self.assertEqual(models.GlobalSetting.controls.find(fan.id).enabled,
+                         True)
+
+    def test_drops_singleton_if_save_fails(self):
+        models.GlobalSetting.create(notify_plants=True,
+                                    notify_maintenance=True)
+        with mock.patch.object(models.lazy_record.Base, "save",
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                models.GlobalSetting.notify_plants = False
+        self.assertEqual(models.GlobalSetting.notify_plants, True)
+
+    def test_notifies_of_changes(self):
+        listener = mock.Mock(name="listener")
+        models.settings.store.subscribe(listener)
+        self.addCleanup(models.settings.store.listeners.remove, listener)
+        control = models.Control.create(name="fan", enabled=True)
+        listener.assert_called_with("controls", control)
+
+    def test_update_all_saves_controls_and_settings(self):
+        models.GlobalSetting.create(notify_plants=True,
+                                    notify_maintenance=True)
+        fan = models.Control.create(name="fan", enabled=True)
+        pump = models.Control.create(name="pump", enabled=True)
+        models.GlobalSetting.update_all(
+            {fan: {'enabled': False},
+             pump: {'active_start': time(2, 5), 'active_end': time(3, 11)}},
+            notify_plants=False)
+        models.settings.store.clear()
+        self.assertEqual(models.Control.find(fan.id).enabled, False)
+        self.assertEqual(models.Control.find(pump.id).active_during,
+                         (time(2, 5), time(3, 11)))
+        self.assertEqual(models.GlobalSetting.notify_plants, False)
+        self.assertEqual(models.GlobalSetting.notify_maintenance, True)
+
+    def test_update_all_keeps_store_up_to_date(self):
+        models.GlobalSetting.create(notify_plants=True,
+                                    notify_maintenance=True)
+        fan = models.Control.create(name="fan", enabled=True)
+        listener = mock.Mock(name="listener")
+        models.settings.store.subscribe(listener)
+        self.addCleanup(models.settings.store.listeners.remove, listener)
+        models.GlobalSetting.update_all({fan: {'enabled': False}},
+                                        notify_plants=False)
+        self.assertEqual(models.GlobalSetting.notify_plants, False)
+        self.assertEqual(models.GlobalSetting.controls.find(fan.id).enabled,
+                         False)
+        listener.assert_any_call("controls", fan)
+
+    def test_update_all_saves_nothing_if_any_save_fails(self):
+        models.GlobalSetting.create(notify_plants=True,
+                                    notify_maintenance=True)
+        fan = models.Control.create(name="fan", enabled=True)
+        with mock.patch.object(models.GlobalSetting, "_do_save",
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                models.GlobalSetting.update_all({fan: {'enabled': False}},
+                                                notify_plants=False)
+        self.assertEqual(models.Control.find(fan.id).enabled, True)
+
+    def test_update_all_keeps_store_as_saved_if_any_save_fails(self):
+        models.GlobalSetting.create(notify_plants=True,
+                                    notify_maintenance=True)
+        models.Control.create(name="fan", enabled=True)
+        fan = models.GlobalSetting.controls.find_by(name="fan")
+        with mock.patch.object(models.GlobalSetting, "_do_save",
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                models.GlobalSetting.update_all({fan: {'enabled': False}},
+                                                notify_plants=False)
+        self.assertEqual(models.GlobalSetting.controls.find(fan.id).enabled,
+                         True)
+        self.assertEqual(models.GlobalSetting.notify_plants, True)
+
     @mock.patch("app.models.GlobalSetting.last")
     def test_delegates_notification_settings_to_singleton(self, last):
         last.return_value = mock.Mock(name="GlobalSetting", notify_plants=True,
@@ -790,6 +1194,11 @@ class TestWaterLevel(unittest.TestCase):
         self.assertEqual(models.WaterLevel.current(), 8)
 
 
+def switch(force, then):
+    # As the actuators do, once the control has been switched
+    then()
+    return True
+
 def plant_json():
     return {
                "water_tolerance": 30.0,
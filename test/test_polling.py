@@ -0,0 +1,93 @@
+import unittest
+import mock
+import os
+import sys
+import time
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import app.polling as polling
+import app.tenancy as tenancy
+
+class TestPoller(unittest.TestCase):
+
+    def test_reads_every_plant(self):
+        poller = polling.Poller(lambda plant: {"light": plant * 10.0})
+        self.assertEqual(poller.poll([1, 2, 3]),
+                         [(1, {"light": 10.0}),
+                          (2, {"light": 20.0}),
+                          (3, {"light": 30.0})])
+
+    def test_is_empty_without_plants(self):
+        self.assertEqual(polling.Poller(mock.Mock()).poll([]), [])
+
+    def test_reads_concurrently(self):
+        def read(plant):
+            time.sleep(0.05)
+            return {}
+        poller = polling.Poller(read, workers=8)
+        started = time.time()
+        poller.poll(range(8))
+        self.assertLess(time.time() - started, 0.2)
+
+    def test_uses_at_most_workers_threads(self):
+        active = []
+        most = []
+        lock = threading.Lock()
+        def read(plant):
+            with lock:
+                active.append(plant)
+                most.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.remove(plant)
+            return {}
+        polling.Poller(read, workers=3).poll(range(9))
+        self.assertLessEqual(max(most), 3)
+
+    def test_skips_failed_reads(self):
+        def read(plant):
+            if plant == 2:
+                raise IOError
+            return {}
+        poller = polling.Poller(read)
+        self.assertEqual(poller.poll([1, 2, 3]), [(1, {}), (3, {})])
+
+    def test_skips_reads_that_time_out(self):
+        def read(plant):
+            if plant == 2:
+                time.sleep(0.2)
+            return {}
+        poller = polling.Poller(read, workers=2, timeout=0.05)
+        started = time.time()
+        self.assertEqual(poller.poll([1, 2, 3]), [(1, {}), (3, {})])
+        self.assertLess(time.time() - started, 0.2)
+
+    def test_holds_lock_while_reading(self):
+        lock = threading.Lock()
+        held = []
+        def read(plant):
+            held.append(lock.locked())
+            return {}
+        polling.Poller(read, lock_for=lambda plant: lock).poll([1, 2])
+        self.assertEqual(held, [True, True])
+
+    def test_skips_reads_left_waiting_for_lock_at_timeout(self):
+        read = mock.Mock(side_effect=lambda plant: time.sleep(0.05) or {})
+        poller = polling.Poller(read, workers=4, timeout=0.125,
+                                lock_for=lambda plant: lock)
+        lock = threading.Lock()
+        started = time.time()
+        self.assertEqual(len(poller.poll(range(4))), 2)
+        self.assertLess(time.time() - started, 0.15)
+        time.sleep(0.1)
+        self.assertEqual(read.call_count, 3)
+
+    def test_reads_in_current_greenhouse(self):
+        greenhouse = mock.Mock(name="greenhouse")
+        poller = polling.Poller(lambda plant: tenancy.current())
+        with tenancy.activate(greenhouse):
+            self.assertEqual(poller.poll([1]), [(1, greenhouse)])
+
+
+if __name__ == '__main__':
+    unittest.main()
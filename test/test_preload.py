@@ -0,0 +1,142 @@
+import unittest
+import mock
+import os
+import sys
+from datetime import datetime as dt
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import app.preload as preload
+import app.models as models
+from app.config import TEST_DATABASE, SCHEMA
+
+class TestPreload(unittest.TestCase):
+
+    def setUp(self):
+        models.lazy_record.connect_db(TEST_DATABASE)
+        with open(SCHEMA) as schema:
+            models.lazy_record.load_schema(schema.read())
+        self.plants = [create_plant(slot_id) for slot_id in (1, 2)]
+        self.thresholds = [
+            models.NotificationThreshold.create(
+                plant_setting=plant.plant_setting,
+                sensor_name=sensor_name,
+                deviation_percent=10,
+                deviation_time=1)
+            for plant in self.plants
+            for sensor_name in ("light", "water")]
+
+    def tearDown(self):
+        models.lazy_record.close_db()
+
+    def assertDoesNotQuery(self, func):
+        with mock.patch("lazy_record.associations.query.Query") as Query:
+            result = func()
+            Query.assert_not_called()
+        return result
+
+    def test_preloads_belongs_to(self):
+        settings = [plant.plant_setting for plant in self.plants]
+        setting = models.PlantSetting.find(settings[0].id)
+        preload.preload([setting], "plant")
+        plant = self.assertDoesNotQuery(lambda: setting.plant)
+        self.assertEqual(plant, self.plants[0])
+
+    def test_preloads_has_one(self):
+        plants = list(models.Plant.all())
+        preload.preload(plants, "plant_setting")
+        settings = self.assertDoesNotQuery(
+            lambda: [plant.plant_setting for plant in plants])
+        self.assertEqual(settings,
+                         [plant.plant_setting for plant in self.plants])
+
+    def test_preloads_has_many_as_lists(self):
+        settings = list(models.PlantSetting.all())
+        preload.preload(settings, "notification_thresholds")
+        thresholds = self.assertDoesNotQuery(
+            lambda: settings[1].notification_thresholds)
+        self.assertEqual(thresholds, self.thresholds[2:])
+
+    def test_preloads_has_many_as_empty_lists(self):
+        setting = models.PlantSetting.find(1)
+        for threshold in setting.notification_thresholds:
+            threshold.destroy()
+        preload.preload([setting], "notification_thresholds")
+        self.assertEqual(setting.notification_thresholds, [])
+
+    def test_has_many_children_refer_back_to_parent(self):
+        settings = list(models.PlantSetting.all())
+        preload.preload(settings, "notification_thresholds")
+        threshold = settings[0].notification_thresholds[0]
+        self.assertIs(self.assertDoesNotQuery(lambda: threshold.plant_setting),
+                      settings[0])
+
+    def test_loads_each_association_in_one_query(self):
+        thresholds = list(models.NotificationThreshold.all())
+        with mock.patch("app.preload.lazy_record.Query",
+                        wraps=models.lazy_record.Query) as Query:
+            preload.include(thresholds, ["plant_setting.plant"])
+            self.assertEqual(Query.call_count, 2)
+        plants = self.assertDoesNotQuery(
+            lambda: [threshold.plant for threshold in thresholds])
+        self.assertEqual(plants, [self.plants[0]] * 2 + [self.plants[1]] * 2)
+
+    def test_shares_one_instance_per_record(self):
+        thresholds = preload.include(models.NotificationThreshold.all(),
+                                     ["plant_setting"])
+        self.assertIs(thresholds[0].plant_setting,
+                      thresholds[1].plant_setting)
+
+    def test_does_not_reload_records_in_identity_map(self):
+        identity_map = preload.IdentityMap()
+        setting = identity_map.add(models.PlantSetting.find(1))
+        thresholds = list(models.NotificationThreshold.where(
+                              plant_setting_id=1))
+        with mock.patch("app.preload.lazy_record.Query") as Query:
+            preload.preload(thresholds, "plant_setting", identity_map)
+            Query.assert_not_called()
+        self.assertIs(thresholds[0].plant_setting, setting)
+
+    def test_reloads_parent_when_foreign_key_changes(self):
+        threshold = models.NotificationThreshold.find(1)
+        preload.preload([threshold], "plant_setting")
+        threshold.plant_setting_id = 2
+        self.assertEqual(threshold.plant_setting.id, 2)
+
+    def test_setting_association_discards_preloaded_record(self):
+        plant = models.Plant.find(1)
+        preload.preload([plant], "plant_setting")
+        plant.plant_setting = models.PlantSetting()
+        self.assertNotIn("plant_setting", plant._preloaded)
+
+    def test_ignores_empty_records(self):
+        self.assertEqual(preload.preload([None], "plant_setting"), [])
+
+    def test_cannot_preload_through_associations(self):
+        with mock.patch.dict(
+            "lazy_record.associations.associations",
+            {"Plant": dict(models.lazy_record.associations.associations_for(
+                               models.Plant), plant_setting="other")}):
+            with self.assertRaises(ValueError):
+                preload.preload(self.plants, "plant_setting")
+
+
+def create_plant(slot_id):
+    plant = models.Plant(name="testPlant",
+                         photo_url="testPlant.png",
+                         water_ideal=57.0,
+                         water_tolerance=30.0,
+                         light_ideal=50.0,
+                         light_tolerance=10.0,
+                         temperature_ideal=55.5,
+                         temperature_tolerance=11.3,
+                         humidity_ideal=0.2,
+                         humidity_tolerance=0.1,
+                         mature_on=dt(2016, 1, 10),
+                         slot_id=slot_id,
+                         plant_database_id=1)
+    plant.plant_setting = models.PlantSetting()
+    plant.save()
+    return plant
+
+
+if __name__ == '__main__':
+    unittest.main()
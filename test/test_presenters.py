@@ -5,6 +5,7 @@ import sys
 from datetime import datetime as dt
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 import app.presenters as presenters
+import app.stats as stats
 class TestPlantPresenter(unittest.TestCase):
 
     def test_light_bar_width_within_tolerance(self):
@@ -93,32 +94,54 @@ class TestPlantPresenter(unittest.TestCase):
         presenter = presenters.PlantPresenter(plant(water=90.0))
         self.assertFalse(presenter.over_ideal("water"))
 
+    def test_fetches_current_values_once(self):
+        p = plant()
+        presenter = presenters.PlantPresenter(p)
+        for metric in ("light", "water"):
+            presenter.bar_width(metric)
+            presenter.error_bar_width(metric)
+            presenter.within_tolerance(metric)
+            presenter.formatted_value(metric)
+        p.current_values.assert_called_once_with()
+
+    def test_formats_values_of_metrics_without_an_ideal(self):
+        presenter = presenters.PlantPresenter(plant(light_ideal=0.0))
+        self.assertEqual(presenter.formatted_value("light"), "56.0")
+        self.assertEqual(presenter.formatted_value("water"), "80.0")
+        self.assertEqual(presenter.bar_width("water"), 40.0)
+
+    def test_gives_vital_view_model(self):
+        presenter = presenters.PlantPresenter(plant(light=80.0))
+        self.assertEqual(presenter.vital("light"),
+                         presenters.PlantPresenter.Vital(value=80.0,
+                                                         bar_width=60.0,
+                                                         error_bar_width=20.0,
+                                                         within_tolerance=False,
+                                                         over_ideal=True))
+
 class TestLogDataPresenter(unittest.TestCase):
 
-    def test_formats_data(self):
-        data = [
-            {"sensor_name": "water", "sensor_value": 21.4,
-                "created_at": dt(2016, 04, 11, 5, 32, 11)},
-            {"sensor_name": "light", "sensor_value": 23.4,
-                "created_at": dt(2016, 04, 11, 5, 32, 15)},
-            {"sensor_name": "humidity", "sensor_value": 0.71,
-                "created_at": dt(2016, 04, 11, 5, 32, 31)},
+    @mock.patch("app.presenters.models.SensorDataPoint.values")
+    def test_formats_data(self, values):
+        Reading = presenters.models.SensorDataPoint.Reading
+        values.return_value = [
+            Reading(dt(2016, 04, 11, 5, 32, 11), "water", 21.4),
+            Reading(dt(2016, 04, 11, 5, 32, 15), "light", 23.4),
+            Reading(dt(2016, 04, 11, 5, 32, 31), "humidity", 0.71),
         ]
-        p = plant(sensor_data_points=[mock.Mock(**point) for point in data])
-        presenter = presenters.LogDataPresenter(p)
+        presenter = presenters.LogDataPresenter(plant(id=3))
         self.assertEqual(presenter.log_string(),
             "[11/Apr/2016:05:32:11] water 21.4\n"
             "[11/Apr/2016:05:32:15] light 23.4\n"
             "[11/Apr/2016:05:32:31] humidity 0.71\n")
+        values.assert_called_with(3)
 
 
 class TestChartDataPresenter(unittest.TestCase):
 
     def test_formats_and_filters_history_chart_data_light(self):
         data = [3.6, 12.0, 65.0, 11.0, 3.2, 6.7, 15.2, 88.5]
-        p = plant(sensor_data_points=mock.Mock(light=mock.Mock(
-            return_value=mock.Mock(last=mock.Mock(return_value=[mock.Mock(sensor_value=v)
-                          for v in data])))))
+        p = plant(recent=mock.Mock(return_value=data))
         presenter = presenters.ChartDataPresenter(p)
         self.assertEqual(presenter.history_chart_data_for("light"), {
             "labels": ["", "", "", "", "", "", "", ""],
@@ -131,12 +154,11 @@ class TestChartDataPresenter(unittest.TestCase):
                                      3.2, 6.7, 15.2, 88.5],
                         }]
         })
+        p.recent.assert_called_with("light", 8)
 
     def test_formats_and_filters_history_chart_data_water(self):
         data = [3.6, 12.0, 65.0, 11.0, 3.2, 6.7, 15.2, 88.5]
-        p = plant(sensor_data_points=mock.Mock(water=mock.Mock(
-            return_value=mock.Mock(last=mock.Mock(return_value=[mock.Mock(sensor_value=v)
-                          for v in data])))))
+        p = plant(recent=mock.Mock(return_value=data))
         presenter = presenters.ChartDataPresenter(p)
         self.assertEqual(presenter.history_chart_data_for("water"), {
             "labels": ["", "", "", "", "", "", "", ""],
@@ -149,31 +171,18 @@ class TestChartDataPresenter(unittest.TestCase):
                                      3.2, 6.7, 15.2, 88.5],
                         }]
         })
-
-    def test_formats_ideal_chart_data(self):
-        # Note: mocking queries is awful
-        p = plant()
-        p.sensor_data_points=mock.Mock(
-            light=mock.Mock(
-                return_value=mock.Mock(where=mock.Mock(
-                return_value=mock.Mock(__len__=mock.Mock(
-                return_value=15))), __len__=mock.Mock(
-                return_value=19))),
-            water=mock.Mock(
-                return_value=mock.Mock(where=mock.Mock(
-                return_value=mock.Mock(__len__=mock.Mock(
-                return_value=5))), __len__=mock.Mock(
-                return_value=19))),
-            humidity=mock.Mock(
-                return_value=mock.Mock(where=mock.Mock(
-                return_value=mock.Mock(__len__=mock.Mock(
-                return_value=18))), __len__=mock.Mock(
-                return_value=19))),
-            temperature=mock.Mock(
-                return_value=mock.Mock(where=mock.Mock(
-                return_value=mock.Mock(__len__=mock.Mock(
-                return_value=17))), __len__=mock.Mock(
-                return_value=19))))
+        p.recent.assert_called_with("water", 8)
+
+    @mock.patch("app.presenters.models.SensorDataPoint.window")
+    def test_formats_ideal_chart_data(self, load):
+        p = plant(id=4)
+        windows = {
+            "light": window(within=15, total=19, ideal=50.0),
+            "water": window(within=5, total=19, ideal=100.0),
+            "humidity": window(within=18, total=19, ideal=20.0),
+            "temperature": window(within=17, total=19, ideal=68.2),
+        }
+        load.side_effect = lambda plant_id, sensor: windows[sensor]
         presenter = presenters.ChartDataPresenter(p)
         self.assertEqual(presenter.ideal_chart_data(), [
             {
@@ -201,31 +210,12 @@ class TestChartDataPresenter(unittest.TestCase):
                 "highlight": "#FF5A5E",
             },
         ])
+        load.assert_any_call(4, "light")
 
-    def test_formats_ideal_chart_data_with_no_data(self):
-        # Note: mocking queries is awful
+    @mock.patch("app.presenters.models.SensorDataPoint.window")
+    def test_formats_ideal_chart_data_with_no_data(self, load):
         p = plant()
-        p.sensor_data_points=mock.Mock(
-            light=mock.Mock(
-                return_value=mock.Mock(where=mock.Mock(
-                return_value=mock.Mock(__len__=mock.Mock(
-                return_value=0))), __len__=mock.Mock(
-                return_value=0))),
-            water=mock.Mock(
-                return_value=mock.Mock(where=mock.Mock(
-                return_value=mock.Mock(__len__=mock.Mock(
-                return_value=0))), __len__=mock.Mock(
-                return_value=0))),
-            humidity=mock.Mock(
-                return_value=mock.Mock(where=mock.Mock(
-                return_value=mock.Mock(__len__=mock.Mock(
-                return_value=0))), __len__=mock.Mock(
-                return_value=0))),
-            temperature=mock.Mock(
-                return_value=mock.Mock(where=mock.Mock(
-                return_value=mock.Mock(__len__=mock.Mock(
-                return_value=0))), __len__=mock.Mock(
-                return_value=0))))
+        load.return_value = stats.Window([])
         presenter = presenters.ChartDataPresenter(p)
         self.assertEqual(presenter.ideal_chart_data(), [
             {
@@ -306,6 +296,10 @@ class TestAPIPlantPresenter(unittest.TestCase):
         info = presenters.APIPlantPresenter(None).long_info()
         self.assertEqual(info, {})
 
+def window(within, total, ideal):
+    # Values outside of the tolerance band are far above the ideal
+    return stats.Window([ideal] * within + [ideal * 10] * (total - within))
+
 def plant(**kwargs):
     p = mock.Mock(photo_url="testPlant.png",
                   water=80.0,
@@ -329,6 +323,10 @@ def plant(**kwargs):
     p.name = "testPlant"
     for k, v in kwargs.items():
         setattr(p, k, v)
+    p.current_values.return_value = {
+        metric: getattr(p, metric)
+        for metric in ("light", "water", "humidity", "temperature")
+    }
     return p
 
 if __name__ == '__main__':
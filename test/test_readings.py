@@ -0,0 +1,114 @@
+import unittest
+import mock
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import app.readings as readings
+import app.models as models
+from app.config import TEST_DATABASE, SCHEMA
+
+class TestRingBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer = readings.RingBuffer(4)
+
+    def test_is_empty_initially(self):
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.last(3), [])
+
+    def test_gives_last_values_newest_first(self):
+        for i in range(3):
+            self.buffer.append(i * 10.0)
+        self.assertEqual(self.buffer.last(2), [20.0, 10.0])
+        self.assertEqual(self.buffer.last(5), [20.0, 10.0, 0.0])
+
+    def test_overwrites_oldest_values_when_full(self):
+        for i in range(6):
+            self.buffer.append(float(i))
+        self.assertEqual(len(self.buffer), 4)
+        self.assertEqual(self.buffer.last(4), [5.0, 4.0, 3.0, 2.0])
+
+
+class TestRecentReadings(unittest.TestCase):
+
+    def setUp(self):
+        models.lazy_record.connect_db(TEST_DATABASE)
+        with open(SCHEMA) as schema:
+            models.lazy_record.load_schema(schema.read())
+        self.recent = readings.RecentReadings()
+
+    def tearDown(self):
+        models.lazy_record.close_db()
+
+    def create_point(self, value, sensor_name="light", plant_id=1):
+        return models.SensorDataPoint.create(plant_id=plant_id,
+                                             sensor_name=sensor_name,
+                                             sensor_value=value)
+
+    def test_loads_from_database(self):
+        for value in [1.0, 2.0, 3.0]:
+            self.create_point(value)
+        self.create_point(7.0, sensor_name="water")
+        self.create_point(9.0, plant_id=2)
+        self.assertEqual(self.recent.last(1, "light", 5), [3.0, 2.0, 1.0])
+
+    def test_only_loads_buffer_size_points(self):
+        for value in range(20):
+            self.create_point(value)
+        self.assertEqual(len(self.recent.last(1, "light", 20)),
+                         readings.RecentReadings.size)
+
+    def test_records_points_once_loaded(self):
+        self.create_point(1.0)
+        self.recent.last(1, "light")
+        self.recent.record(1, "light", 4.0)
+        self.assertEqual(self.recent.last(1, "light", 2), [4.0, 1.0])
+
+    def test_does_not_query_once_loaded(self):
+        self.recent.last(1, "light")
+        with mock.patch.object(self.recent, "_load") as load:
+            self.recent.last(1, "light")
+            load.assert_not_called()
+
+    def test_gives_current_values_of_sensors(self):
+        self.create_point(1.0)
+        self.create_point(2.0)
+        self.create_point(7.0, sensor_name="water")
+        self.assertEqual(self.recent.current(1, ["light", "water", "humidity"]),
+                         {"light": 2.0, "water": 7.0, "humidity": None})
+
+    def test_loads_missing_sensors_in_one_query(self):
+        self.recent.last(1, "light")
+        with mock.patch.object(self.recent, "_load",
+                               wraps=self.recent._load) as load:
+            self.recent.current(1, ["light", "water", "humidity"])
+            load.assert_called_once_with(1, ["water", "humidity"])
+
+    def test_is_empty_for_unsaved_plant(self):
+        self.assertEqual(self.recent.last(None, "light"), [])
+
+    def test_discards_plant(self):
+        self.recent.last(1, "light")
+        self.recent.last(2, "light")
+        self.recent.discard(1)
+        self.assertNotIn((1, "light"), self.recent.buffers)
+        self.assertIn((2, "light"), self.recent.buffers)
+
+    def test_reloads_when_database_changes(self):
+        self.create_point(1.0)
+        self.recent.last(1, "light")
+        models.lazy_record.close_db()
+        models.lazy_record.connect_db(TEST_DATABASE)
+        with open(SCHEMA) as schema:
+            models.lazy_record.load_schema(schema.read())
+        self.assertEqual(self.recent.last(1, "light"), [])
+
+    def test_saving_point_updates_shared_store(self):
+        plant_id = 1
+        readings.recent.last(plant_id, "light")
+        self.create_point(12.5)
+        self.assertEqual(readings.recent.last(plant_id, "light"), [12.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+from flask import Flask
+from werkzeug.exceptions import NotFound, MethodNotAllowed
+from werkzeug.routing import Map, Rule, RequestRedirect
+from app.router import Router, RouteTable
+import app.router as router
+
+class TestRouteTable(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = [
+            Rule("/", endpoint="root"),
+            Rule("/plants", endpoint="plants", methods=["GET"]),
+            Rule("/plants", endpoint="create_plant", methods=["POST"]),
+            Rule("/plants/new", endpoint="new_plant"),
+            Rule("/plants/<id>", endpoint="plant"),
+            Rule("/plants/<plant_id>/logs", endpoint="logs"),
+            Rule("/settings/", endpoint="settings"),
+            Rule("/static/<path:filename>", endpoint="static"),
+        ]
+        self.table = RouteTable([rule.empty() for rule in self.rules])
+        self.linear = Map([rule.empty() for rule in self.rules])
+
+    def match(self, url_map, path, method="GET"):
+        try:
+            return url_map.bind("localhost").match(path, method)
+        except (NotFound, MethodNotAllowed, RequestRedirect) as error:
+            return type(error)
+
+    def test_matches_as_werkzeug_does(self):
+        for path, method in [("/", "GET"), ("/plants", "GET"),
+                             ("/plants", "POST"), ("/plants/new", "GET"),
+                             ("/plants/3", "GET"), ("/plants/3/logs", "GET"),
+                             ("/static/js/app.js", "GET"), ("/settings", "GET"),
+                             ("/settings/", "GET"), ("/missing", "GET"),
+                             ("/plants", "DELETE"), ("/plants/3/x", "GET")]:
+            self.assertEqual(self.match(self.table, path, method),
+                             self.match(self.linear, path, method))
+
+    def test_redirects_to_trailing_slash(self):
+        self.assertEqual(self.match(self.table, "/settings"), RequestRedirect)
+
+    def test_method_not_allowed(self):
+        self.assertEqual(self.match(self.table, "/plants", "DELETE"),
+                         MethodNotAllowed)
+
+    def test_candidates_are_narrowed_to_branch(self):
+        endpoints = [rule.endpoint
+                     for rule in self.table.candidates("/plants/3")]
+        self.assertNotIn("static", endpoints)
+        self.assertNotIn("settings", endpoints)
+        self.assertIn("plant", endpoints)
+
+    def test_rules_added_later_are_matched(self):
+        self.table.bind("localhost").match("/")
+        self.table.add(Rule("/about", endpoint="about"))
+        self.assertEqual(self.match(self.table, "/about"), ("about", {}))
+
+
+class TestRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.router = Router(self.app)
+
+        @self.router.route("/things", only=["index", "show"])
+        class ThingsController(object):
+            def index():
+                return "index"
+
+            def show(id):
+                return "show " + id
+
+            @self.router.endpoint("latest")
+            def latest():
+                return "latest"
+
+        self.client = self.app.test_client()
+
+    def test_routes_actions(self):
+        self.assertEqual(self.client.get("/things").data, "index")
+        self.assertEqual(self.client.get("/things/4").data, "show 4")
+        self.assertEqual(self.client.get("/things/latest").data, "latest")
+
+    def test_routes_lists_each_route(self):
+        listing = router.routes(self.app.url_map, number=1)
+        self.assertIn(("GET", "/things/<id>", "ThingsController.show"),
+                      [route[:3] for route in listing])
+        for route in listing:
+            self.assertGreater(route[3], 0)
+            self.assertGreater(route[4], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import datetime
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import flask
+import socketio.packet
+import app.serializers as serializers
+import app.webservice as webservice
+
+class TestSerializer(unittest.TestCase):
+
+    def setUp(self):
+        self.serializer = serializers.Serializer(json)
+
+    def test_encodes_compactly(self):
+        self.assertEqual(self.serializer.dumps({"a": [1, 2]}), '{"a":[1,2]}')
+
+    def test_encodes_datetimes_as_flask_does(self):
+        self.assertEqual(
+            self.serializer.dumps([datetime.datetime(2016, 1, 10)]),
+            '["Sun, 10 Jan 2016 00:00:00 GMT"]')
+
+    def test_encodes_dates_and_times(self):
+        self.assertEqual(
+            self.serializer.dumps([datetime.date(2016, 1, 10),
+                                   datetime.time(8, 30)]),
+            '["2016-01-10","08:30:00"]')
+
+    def test_refuses_other_values(self):
+        with self.assertRaises(TypeError):
+            self.serializer.dumps(object())
+
+    def test_decodes(self):
+        self.assertEqual(self.serializer.loads('{"a":1}'), {"a": 1})
+
+    def test_jsonify_responds_with_json(self):
+        with webservice.app.test_request_context("/api/plants"):
+            response = self.serializer.jsonify({"a": 1}, b=2)
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(json.loads(response.data), {"a": 1, "b": 2})
+
+    def test_socketio_packets_are_encoded_by_serializer(self):
+        self.assertIs(socketio.packet.Packet.json, serializers.serializer)
+        packet = socketio.packet.Packet(
+            data=[u"new-data", {u"at": datetime.datetime(2016, 1, 10)}])
+        self.assertIn('"Sun, 10 Jan 2016 00:00:00 GMT"', packet.encode())
+
+
+if __name__ == '__main__':
+    unittest.main()
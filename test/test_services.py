@@ -2,10 +2,12 @@ import unittest
 import mock
 import os
 import sys
+import threading
+import time
 from datetime import datetime as dt
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 import app.services as services
-from app.config import PLANT_DATABASE
+from app.config import PLANT_DATABASE, TEST_DATABASE, SCHEMA
 import app.models as models
 
 @mock.patch("app.models.Token")
@@ -39,7 +41,7 @@ class TestPlantNotifier(unittest.TestCase):
 
     def test_sends_notification_when_high(self, post, Token):
         self.notifier.notify()
-        token = Token.last.return_value.token
+        token = Token.current.return_value.token
         post.assert_called_with(
             "http://{}/api/notify".format(PLANT_DATABASE),
             data={'title': '"Hydrangea" water high!',
@@ -64,7 +66,7 @@ class TestPlantNotifier(unittest.TestCase):
             sensor_data_points=query_mock)
         notifier = services.PlantNotifier(notification_threshold)
         notifier.notify()
-        token = Token.last.return_value.token
+        token = Token.current.return_value.token
         post.assert_called_with(
             "http://{}/api/notify".format(PLANT_DATABASE),
             data={'title': '"Hydrangea" water low!',
@@ -101,7 +103,7 @@ class TestWaterLevelNotifier(unittest.TestCase):
 
     def test_sends_notification(self, post, Token):
         self.notifier.notify()
-        token = Token.last.return_value.token
+        token = Token.current.return_value.token
         post.assert_called_with(
             "http://{}/api/notify".format(PLANT_DATABASE),
             data={'title': 'Greenhouse Water Level Low!',
@@ -115,115 +117,198 @@ class TestWaterLevelNotifier(unittest.TestCase):
                          services.Notifier.InvalidCredentials)
 
     def test_errors_silently_if_no_token(self, post, Token):
-        Token.last.return_value = None
+        Token.current.return_value = None
         self.assertEqual(None, self.notifier.notify())
 
 
-@mock.patch("app.models.PlantDatabase.plant_params")
+@mock.patch("app.models.PlantDatabase.plants_params")
 class TestPlantUpdater(unittest.TestCase):
 
     def setUp(self):
-        self.plant = mock.Mock(name="plant", plant_database_id=11)
-        self.updater = services.PlantUpdater(self.plant)
-
-    def test_gets_plant_data(self, plant_params):
-        self.updater.update()
-        plant_params.assert_called_with(11, filter=["maturity"])
-
-    def test_returns_false_if_cannot_connect(self, plant_params):
-        plant_params.side_effect = models.PlantDatabase.CannotConnect("PLANT_DATABASE")
-        self.assertEqual(self.updater.update(), False)
-
-    def test_updates_plant_with_data(self, plant_params):
-        plant_data = {
-            "water_tolerance": 30.0,
-            "water_ideal": 57.0,
-            "photo_url": "testPlant.png",
-            "name": "testPlant",
-            "light_tolerance": 10.0,
-            "light_ideal": 50.0,
-            "plant_database_id": 1,
-            "humidity_tolerance": 0.01,
-            "humidity_ideal": 0.2,
-        }
-        plant_params.return_value = plant_data
-        self.updater.update()
-        self.plant.update.assert_called_with(**plant_data)
-
-    def test_returns_true_on_success(self, plant_params):
-        self.assertEqual(self.updater.update(), True)
-
-    def test_saves_updated_plant(self, plant_params):
-        self.updater.update()
-        self.plant.save.assert_called_with()
-
-@mock.patch("app.services.Control.cluster")
+        models.lazy_record.connect_db(TEST_DATABASE)
+        with open(SCHEMA) as schema:
+            models.lazy_record.load_schema(schema.read())
+        self.plants = [models.Plant.create(
+                           name="plant{}".format(slot_id),
+                           photo_url="plant.png",
+                           water_ideal=57.0, water_tolerance=30.0,
+                           light_ideal=50.0, light_tolerance=10.0,
+                           temperature_ideal=55.5, temperature_tolerance=11.3,
+                           humidity_ideal=0.2, humidity_tolerance=0.1,
+                           mature_on=dt(2016, 1, 10), slot_id=slot_id,
+                           plant_database_id=slot_id)
+                       for slot_id in (1, 2)]
+
+    def params(self, id, **changes):
+        params = {"name": "plant{}".format(id), "photo_url": "plant.png",
+                  "water_ideal": 57, "water_tolerance": 30.0,
+                  "light_ideal": 50.0, "light_tolerance": 10.0,
+                  "plant_database_id": id}
+        params.update(changes)
+        return params
+
+    def test_fetches_all_plants_at_once(self, plants_params):
+        plants_params.return_value = {}
+        services.PlantUpdater.update_all(self.plants)
+        plants_params.assert_called_once_with([1, 2], filter=["maturity"])
+
+    def test_saves_only_changed_plants(self, plants_params):
+        plants_params.return_value = {1: self.params(1),
+                                      2: self.params(2, water_ideal=60)}
+        with mock.patch("app.models.Plant.save") as save:
+            changed = services.PlantUpdater.update_all(self.plants)
+        self.assertEqual(changed, [self.plants[1]])
+        self.assertFalse(save.called)
+        self.assertEqual(models.Plant.find(self.plants[1].id).water_ideal,
+                         60.0)
+        self.assertEqual(models.Plant.find(self.plants[0].id).water_ideal,
+                         57.0)
+
+    def test_leaves_plants_missing_from_plant_database(self, plants_params):
+        plants_params.return_value = {2: self.params(2, light_ideal=20)}
+        self.assertEqual(services.PlantUpdater.update_all(self.plants),
+                         [self.plants[1]])
+
+    def test_ignores_fields_plants_do_not_have(self, plants_params):
+        plants_params.return_value = {
+            1: self.params(1, family="Solanaceae"),
+            2: self.params(2, family="Solanaceae", light_ideal=20)}
+        self.assertEqual(services.PlantUpdater.update_all(self.plants),
+                         [self.plants[1]])
+        self.assertEqual(models.Plant.find(self.plants[1].id).light_ideal,
+                         20.0)
+
+    def test_raises_if_cannot_connect(self, plants_params):
+        plants_params.side_effect = models.PlantDatabase.CannotConnect(
+            "PLANT_DATABASE")
+        with self.assertRaises(models.PlantDatabase.CannotConnect):
+            services.PlantUpdater.update_all(self.plants)
+
+@mock.patch("app.services.actuators.current")
 class TestControl(unittest.TestCase):
 
-    def test_drives_element(self, cluster):
+    def test_drives_element(self, current):
         control = services.Control("light")
-        control.on()
-        cluster.control.assert_called_with(on="light")
+        self.assertEqual(control.on(), current.return_value.switch.return_value)
+        current.return_value.switch.assert_called_with("light", True,
+                                                       force=True, then=None)
 
-    def test_disables_element(self, cluster):
+    def test_disables_element(self, current):
         control = services.Control("light")
         control.off()
-        cluster.control.assert_called_with(off="light")
+        current.return_value.switch.assert_called_with("light", False,
+                                                       force=True, then=None)
 
-@mock.patch("app.services.SensorCluster")
+    def test_drives_element_unless_dwelling(self, current):
+        control = services.Control("light")
+        control.on(force=False)
+        current.return_value.switch.assert_called_with("light", True,
+                                                       force=False, then=None)
+
+    def test_passes_on_callback(self, current):
+        then = mock.Mock(name="then")
+        services.Control("light").on(then=then)
+        current.return_value.switch.assert_called_with("light", True,
+                                                       force=True, then=then)
+
+@mock.patch("app.services.drivers.current")
 class TestSensor(unittest.TestCase):
 
-    def test_gets_values(self, SensorCluster):
+    def test_reads_values_without_recording(self, current):
+        plant = mock.Mock(name="plant", slot_id=2)
+        current.return_value.sensor_values.return_value = {"light": 15.0}
+        self.assertEqual(services.Sensor(plant).read(), {"light": 15.0})
+        current.return_value.sensor_values.assert_called_with(2)
+        plant.record_sensor.assert_not_called()
+
+    def test_records_values(self, current):
         plant = mock.Mock(name="plant", slot_id=1)
-        sensor = services.Sensor(plant)
-        cluster = SensorCluster.return_value
-        cluster.sensor_values.return_value = {
-            "light": 15.0,
-            "water": 19.1,
-            "humidity": 94.2,
-            "temperature": 57.2
-        }
-        sensor.get_values()
-        SensorCluster.assert_called_with(ID=1)
-        cluster.sensor_values.assert_called_with()
-        self.assertItemsEqual(plant.record_sensor.mock_calls, [
-            mock.call("light", 15.0),
-            mock.call("water", 19.1),
-            mock.call("humidity", 94.2),
-            mock.call("temperature", 57.2)
-        ])
+        services.Sensor(plant).record({"light": 15.0})
+        plant.record_sensor.assert_called_with("light", 15.0)
 
     @mock.patch("app.services.models.WaterLevel")
-    def test_gets_water_level(self, WaterLevel, SensorCluster):
-        SensorCluster.get_water_level.return_value = 0.87
+    def test_gets_water_level(self, WaterLevel, current):
+        current.return_value.water_level.return_value = 0.87
         services.Sensor.get_water_level()
-        SensorCluster.get_water_level.assert_called_with()
+        current.return_value.water_level.assert_called_with()
         WaterLevel.create.assert_called_with(level=87)
 
-    def test_get_values_silently_exits_on_ioerror(self, SensorCluster):
-        plant = mock.Mock(name="plant", slot_id=1)
-        sensor = services.Sensor(plant)
-        cluster = SensorCluster.return_value
-        cluster.sensor_values.side_effect = IOError
-        self.assertEqual(sensor.get_values(), None)
-
-    def test_get_values_silently_exits_on_buserror(self, SensorCluster):
-        plant = mock.Mock(name="plant", slot_id=1)
-        sensor = services.Sensor(plant)
-        cluster = SensorCluster.return_value
-        cluster.sensor_values.side_effect = services.greenhouse_envmgmt.sense.I2CBusError
-        self.assertEqual(sensor.get_values(), None)
+    def test_get_water_level_silently_exits_on_ioerror(self, current):
+        current.return_value.water_level.side_effect = IOError
+        self.assertEqual(services.Sensor.get_water_level(), None)
 
-    def test_get_values_silently_exits_on_sensorerror(self, SensorCluster):
-        plant = mock.Mock(name="plant", slot_id=1)
-        sensor = services.Sensor(plant)
-        cluster = SensorCluster.return_value
-        cluster.sensor_values.side_effect = services.greenhouse_envmgmt.sense.SensorError
-        self.assertEqual(sensor.get_values(), None)
+@mock.patch("app.models.PlantDatabase.update_notification_settings")
+@mock.patch("app.models.PlantDatabase.get_notification_settings")
+class TestNotificationSettings(unittest.TestCase):
 
-    def test_get_water_level_silently_exits_on_ioerror(self, SensorCluster):
-        SensorCluster.get_water_level.side_effect = IOError
-        self.assertEqual(services.Sensor.get_water_level(), None)
+    def setUp(self):
+        self.settings = services.NotificationSettings(ttl=60, timeout=0.05)
+
+    def test_fetches_settings(self, get, update):
+        get.return_value = {'email': True, 'push': False}
+        self.assertEqual(self.settings.get(), {'email': True, 'push': False})
+
+    def test_keeps_settings_for_ttl(self, get, update):
+        get.return_value = {'email': True}
+        self.settings.get()
+        self.settings.get()
+        get.assert_called_once_with()
+
+    def test_fetches_again_after_ttl(self, get, update):
+        self.settings.ttl = 0
+        get.return_value = {'email': True}
+        self.settings.get()
+        get.return_value = {'email': False}
+        self.assertEqual(self.settings.get(), {'email': False})
+
+    def test_fetches_while_caller_works(self, get, update):
+        released = threading.Event()
+        get.side_effect = lambda: released.wait() and {'email': True}
+        self.settings.start()
+        released.set()
+        self.assertEqual(self.settings.get(), {'email': True})
+        get.assert_called_once_with()
+
+    def test_gives_last_settings_when_slow(self, get, update):
+        self.settings.ttl = 0
+        get.return_value = {'email': True}
+        self.settings.get()
+        released = threading.Event()
+        self.addCleanup(released.set)
+        get.side_effect = lambda: released.wait() and {'email': False}
+        started = time.time()
+        self.assertEqual(self.settings.get(), {'email': True})
+        self.assertLess(time.time() - started, 1)
+
+    def test_raises_if_never_fetched(self, get, update):
+        get.side_effect = models.PlantDatabase.CannotConnect
+        with self.assertRaises(models.PlantDatabase.CannotConnect):
+            self.settings.get()
+
+    def test_gives_last_settings_if_cannot_connect(self, get, update):
+        self.settings.ttl = 0
+        get.return_value = {'email': True}
+        self.settings.get()
+        get.side_effect = models.PlantDatabase.CannotConnect
+        self.assertEqual(self.settings.get(), {'email': True})
+
+    def test_update_sends_and_keeps_settings(self, get, update):
+        get.return_value = {'email': True, 'push': True}
+        update.return_value = mock.Mock(ok=True)
+        self.settings.get()
+        self.assertTrue(self.settings.update({'push': False}))
+        update.assert_called_with({'push': False})
+        self.assertEqual(self.settings.get(), {'email': True, 'push': False})
+        get.assert_called_once_with()
+
+    def test_update_keeps_nothing_unless_sent(self, get, update):
+        get.return_value = {'email': True, 'push': True}
+        self.settings.get()
+        # No token or no connection, then an error from the Plant Database
+        for response in (None, mock.Mock(ok=False)):
+            update.return_value = response
+            self.assertFalse(self.settings.update({'push': False}))
+        self.assertEqual(self.settings.get(), {'email': True, 'push': True})
 
 
 if __name__ == '__main__':
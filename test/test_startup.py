@@ -0,0 +1,37 @@
+import unittest
+import os
+import subprocess
+import sys
+ROOT = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+
+class TestStartup(unittest.TestCase):
+
+    def imports(self, code):
+        """The modules imported by running +code+ in a fresh interpreter"""
+        output = subprocess.check_output(
+            [sys.executable, "-c", code + "\nimport sys\nprint ' '.join(sys.modules)"],
+            cwd=ROOT)
+        return set(output.split())
+
+    def test_cli_commands_do_not_import_webservice(self):
+        modules = self.imports("import app.seeds")
+        for module in ("app.webservice", "flask", "flask_socketio",
+                       "eventlet"):
+            self.assertNotIn(module, modules)
+
+    def test_importing_app_does_not_patch(self):
+        modules = self.imports("import app")
+        self.assertNotIn("eventlet", modules)
+
+    def test_green_patches_threads(self):
+        # In a fresh interpreter, so that the suite runs on native threads
+        output = subprocess.check_output(
+            [sys.executable, "-c", "import app\napp.green()\n"
+             "import eventlet.patcher\n"
+             "print eventlet.patcher.is_monkey_patched('thread')"],
+            cwd=ROOT)
+        self.assertEqual(output.strip(), "True")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import mock
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import app.stats as stats
+
+class TestWindow(unittest.TestCase):
+
+    def window(self, *values):
+        return stats.Window(values)
+
+    def test_mean(self):
+        self.assertEqual(self.window(1.0, 2.0, 6.0).mean(), 3.0)
+
+    def test_mean_is_None_when_empty(self):
+        self.assertEqual(self.window().mean(), None)
+
+    def test_percentile(self):
+        window = self.window(4.0, 1.0, 3.0, 2.0, 5.0)
+        self.assertEqual(window.percentile(50), 3.0)
+        self.assertEqual(window.percentile(100), 5.0)
+        self.assertEqual(window.percentile(25), 2.0)
+        self.assertEqual(window.percentile(90), 4.6)
+
+    def test_percentile_is_None_when_empty(self):
+        self.assertEqual(self.window().percentile(50), None)
+
+    def test_within_band_fraction_is_inclusive(self):
+        window = self.window(10.0, 15.0, 20.0, 25.0)
+        self.assertEqual(window.within_band_fraction(10.0, 20.0), 0.75)
+
+    def test_within_band_fraction_is_zero_when_empty(self):
+        self.assertEqual(self.window().within_band_fraction(0, 1), 0.0)
+
+    def test_all_out_of_band(self):
+        self.assertTrue(self.window(1.0, 9.0).all_out_of_band(2.0, 8.0))
+        self.assertFalse(self.window(1.0, 8.0).all_out_of_band(2.0, 8.0))
+        self.assertTrue(self.window().all_out_of_band(2.0, 8.0))
+
+    def test_out_of_band_runs(self):
+        window = self.window(1.0, 1.0, 5.0, 9.0, 5.0, 9.0, 9.0, 9.0)
+        self.assertEqual(window.out_of_band_runs(2.0, 8.0), [2, 1, 3])
+
+    def test_out_of_band_runs_when_none(self):
+        self.assertEqual(self.window(5.0).out_of_band_runs(2.0, 8.0), [])
+
+    def test_builds_from_iterator(self):
+        window = stats.Window(value for value in [1.0, 2.0])
+        self.assertEqual(list(window.values), [1.0, 2.0])
+
+
+@mock.patch("app.stats.numpy", new=None)
+class TestWindowWithoutNumpy(TestWindow):
+    pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,16 +5,75 @@ import sys
 from datetime import datetime as dt
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 import app.webservice as webservice
+import app.tenancy as tenancy
 
 
 @mock.patch("app.webservice.socketio")
 class TestBackgroundTasks(unittest.TestCase):
 
     def test_sends_data_update(self, socketio):
-        webservice.load_sensor_data()
+        greenhouse = tenancy.Greenhouse("north", ":memory:")
+        with tenancy.activate(greenhouse):
+            webservice.load_sensor_data()
         socketio.emit.assert_called_with('data-update',
                                          True,
-                                         namespace="/plants")
+                                         namespace="/plants",
+                                         room="north")
+
+    @mock.patch("app.webservice.services.PlantUpdater.update_all")
+    def test_sends_data_update_when_plants_are_updated(self, update_all,
+                                                       socketio):
+        update_all.return_value = [mock.Mock(name="plant")]
+        with mock.patch("app.webservice.models.Plant.all"):
+            webservice.updated_plants()
+        socketio.emit.assert_called_with('data-update',
+                                         True,
+                                         namespace="/plants",
+                                         room="default")
+
+    @mock.patch("app.webservice.models.Plant.all")
+    @mock.patch("app.webservice.services.PlantUpdater.update_all")
+    def test_logs_failure_to_connect_to_plant_database(self, update_all, _all,
+                                                       socketio):
+        update_all.side_effect = webservice.models.PlantDatabase.CannotConnect(
+            "PLANT_DATABASE")
+        with mock.patch.object(webservice.app.logger, "warning") as warning:
+            webservice.updated_plants()
+        self.assertTrue(warning.called)
+        socketio.emit.assert_not_called()
+
+    @mock.patch("app.webservice.models.Plant.all")
+    @mock.patch("app.webservice.services.PlantUpdater.update_all")
+    def test_logs_plants_that_cannot_be_updated(self, update_all, _all,
+                                                socketio):
+        for error in (ValueError("No JSON object could be decoded"),
+                      KeyError("id"),
+                      webservice.models.lazy_record.RecordInvalid(None)):
+            update_all.side_effect = error
+            with mock.patch.object(webservice.app.logger,
+                                   "exception") as exception:
+                webservice.updated_plants()
+            self.assertTrue(exception.called)
+        socketio.emit.assert_not_called()
+
+    @mock.patch("app.webservice.services.Sensor.get_water_level")
+    @mock.patch("app.webservice.models.Plant.all")
+    @mock.patch("app.webservice.sensors.poll")
+    def test_logs_sensor_data_that_cannot_be_recorded(self, poll, _all,
+                                                      get_water_level,
+                                                      socketio):
+        broken = mock.Mock(name="plant", id=1)
+        broken.record_sensor.side_effect = \
+            webservice.models.lazy_record.RecordInvalid(None)
+        plant = mock.Mock(name="plant", id=2)
+        poll.return_value = [(broken, {"light": 15.0}),
+                             (plant, {"light": 20.0})]
+        with mock.patch.object(webservice.app.logger,
+                               "exception") as exception:
+            webservice.create_sensor_data()
+        self.assertTrue(exception.called)
+        plant.record_sensor.assert_called_with("light", 20.0)
+        get_water_level.assert_called_with()
 
 
 if __name__ == '__main__':
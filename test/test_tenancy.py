@@ -0,0 +1,155 @@
+import unittest
+import mock
+import os
+import sys
+from datetime import datetime as dt
+sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
+import app.webservice as webservice
+import app.tenancy as tenancy
+import app.readings as readings
+from app.config import TEST_DATABASE, SCHEMA
+
+GREENHOUSES = {
+    "default": {"database": TEST_DATABASE, "bus": 1},
+    "north": {"database": TEST_DATABASE, "bus": 2,
+              "refresh": {"background": 30}},
+}
+
+class TestTenancy(unittest.TestCase):
+
+    def setUp(self):
+        for patcher in (mock.patch.dict("app.tenancy.config.GREENHOUSES",
+                                        GREENHOUSES, clear=True),
+                        mock.patch.dict("app.tenancy._greenhouses",
+                                        clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        tenancy.install()
+        with open(SCHEMA) as schema:
+            schema = schema.read()
+        for greenhouse in tenancy.greenhouses().values():
+            with tenancy.activate(greenhouse):
+                webservice.models.lazy_record.load_schema(schema)
+        self.north = tenancy.greenhouses()["north"]
+        self.app = webservice.app.test_client()
+        self.app.testing = True
+
+    def tearDown(self):
+        webservice.models.lazy_record.close_db()
+        for greenhouse in tenancy.greenhouses().values():
+            greenhouse.connection().close()
+
+    def test_builds_greenhouses_from_config(self):
+        self.assertEqual(sorted(tenancy.greenhouses()), ["default", "north"])
+        self.assertEqual(self.north.bus, 2)
+        self.assertEqual(self.north.prefix, "/greenhouses/north")
+
+    def test_current_greenhouse_is_default_unless_activated(self):
+        self.assertIs(tenancy.current(), tenancy.default())
+        with tenancy.activate(self.north):
+            self.assertIs(tenancy.current(), self.north)
+        self.assertIs(tenancy.current(), tenancy.default())
+
+    def test_keeps_data_of_greenhouses_apart(self):
+        with tenancy.activate(self.north):
+            create_plant()
+            self.assertEqual(len(webservice.models.Plant.all()), 1)
+        self.assertEqual(len(webservice.models.Plant.all()), 0)
+
+    def test_gives_connection_of_current_greenhouse(self):
+        with tenancy.activate(self.north):
+            self.assertIs(tenancy.connection(), self.north.connection())
+
+    def test_serves_greenhouse_under_its_prefix(self):
+        with tenancy.activate(self.north):
+            create_plant()
+        with mock.patch("app.webservice.flask.render_template") as render:
+            render.return_value = ""
+            self.app.get("/greenhouses/north/plants")
+            (north_plant, _), _ = render.call_args[1]["plants"]
+            self.app.get("/plants")
+            (default_plant, _), _ = render.call_args[1]["plants"]
+        self.assertEqual(north_plant.name, "testPlant")
+        self.assertIsNone(default_plant)
+
+    def test_generates_urls_with_prefix(self):
+        response = self.app.get("/greenhouses/north/plants/1")
+        self.assertEqual(response.headers["Location"],
+                         "http://localhost/greenhouses/north/plants")
+
+    def test_unknown_greenhouse_is_not_found(self):
+        response = self.app.get("/greenhouses/south/plants")
+        self.assertEqual(response.status_code, 404)
+
+    def test_socketio_requests_go_to_greenhouse_of_page(self):
+        app = mock.Mock(name="app")
+        middleware = tenancy.PrefixMiddleware(app)
+        environ = {"PATH_INFO": "/socket.io/",
+                   "HTTP_REFERER": "http://localhost/greenhouses/north/plants"}
+        middleware(environ, None)
+        self.assertEqual(environ[tenancy.ENVIRON_KEY], "north")
+        self.assertEqual(environ["PATH_INFO"], "/socket.io/")
+
+    def test_keeps_recent_readings_of_greenhouses_apart(self):
+        with tenancy.activate(self.north):
+            create_plant().record_sensor("light", 12.0)
+            self.assertEqual(readings.recent.last(1, "light"), [12.0])
+        self.assertEqual(readings.recent.last(1, "light"), [])
+
+    def test_schedules_tasks_for_each_greenhouse(self):
+        runner = tenancy.BackgroundTaskRunner(refresh=10)
+        seen = []
+        runner.tasks.append(lambda: seen.append(tenancy.current()))
+        scheduled = []
+        def build(refresh):
+            scheduled.append(mock.Mock(name="runner", refresh=refresh))
+            return scheduled[-1]
+        with mock.patch("app.tenancy.BackgroundTaskRunner", side_effect=build):
+            tenancy.schedule(runner, "background")
+        for scheduled_runner in scheduled:
+            scheduled_runner.run.assert_called_with()
+            for task in scheduled_runner.tasks:
+                task()
+        self.assertEqual(sorted(runner.refresh for runner in scheduled),
+                         [10, 30])
+        self.assertEqual(sorted(greenhouse.name for greenhouse in seen),
+                         ["default", "north"])
+
+    def test_keeps_values_per_connection(self):
+        values = tenancy.PerConnection(dict)
+        values.get()["key"] = 1
+        with tenancy.activate(self.north):
+            self.assertEqual(values.get(), {})
+        self.assertEqual(values.get(), {"key": 1})
+
+    def test_keeps_settings_of_greenhouses_apart(self):
+        with tenancy.activate(self.north):
+            webservice.models.GlobalSetting.create(notify_plants=True,
+                                                   notify_maintenance=True)
+            self.assertEqual(webservice.models.GlobalSetting.notify_plants,
+                             True)
+        webservice.models.GlobalSetting.create(notify_plants=False,
+                                               notify_maintenance=True)
+        self.assertEqual(webservice.models.GlobalSetting.notify_plants, False)
+
+
+def create_plant(slot_id=1):
+    plant = webservice.models.Plant(name="testPlant",
+                                    photo_url="testPlant.png",
+                                    water_ideal=57.0,
+                                    water_tolerance=30.0,
+                                    light_ideal=50.0,
+                                    light_tolerance=10.0,
+                                    humidity_ideal=0.2,
+                                    humidity_tolerance=0.1,
+                                    temperature_ideal=11.2,
+                                    temperature_tolerance=15.3,
+                                    mature_on=dt(2016, 1, 10),
+                                    slot_id=slot_id,
+                                    plant_database_id=1)
+    plant.save()
+    return plant
+
+
+if __name__ == '__main__':
+    unittest.main()
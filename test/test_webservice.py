@@ -3,6 +3,8 @@ import mock
 import os
 import sys
 import json
+import gzip
+import StringIO
 from datetime import datetime as dt, time
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
 import app.webservice as webservice
@@ -827,6 +829,53 @@ class TestAPIPlantSettingsController(unittest.TestCase):
         self.assertEqual(response.status_code, 404)
         self.assertEqual(len(webservice.models.NotificationThreshold), 1)
 
+    def test_put_replaces_settings(self):
+        response = self.app.put("/api/plants/1/settings", data=json.dumps({
+            'settings': [
+                {'id': 1, 'sensor_name': 'light', 'deviation_time': 3,
+                 'deviation_percent': 40},
+                {'sensor_name': 'water', 'deviation_time': 5,
+                 'deviation_percent': 5},
+            ]
+        }))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {
+            'settings': [
+                {'id': 1, 'sensor_name': 'light', 'deviation_time': 3,
+                 'deviation_percent': 40},
+                {'id': 2, 'sensor_name': 'water', 'deviation_time': 5,
+                 'deviation_percent': 5},
+            ]
+        })
+
+    def test_put_with_no_settings_removes_them(self):
+        response = self.app.put("/api/plants/1/settings",
+                                data=json.dumps({'settings': []}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(webservice.models.NotificationThreshold), 0)
+
+    def test_put_errors_if_invalid(self):
+        response = self.app.put("/api/plants/1/settings", data=json.dumps({
+            'settings': [
+                {'sensor_name': 'water', 'deviation_time': 0,
+                 'deviation_percent': 5},
+            ]
+        }))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(webservice.models.NotificationThreshold), 1)
+
+    def test_put_errors_if_setting_missing_attributes(self):
+        response = self.app.put("/api/plants/1/settings", data=json.dumps({
+            'settings': [{'sensor_name': 'water'}]
+        }))
+        self.assertEqual(response.status_code, 400)
+
+    def test_put_errors_if_no_plant(self):
+        self.plant.destroy()
+        response = self.app.put("/api/plants/1/settings",
+                                data=json.dumps({'settings': []}))
+        self.assertEqual(response.status_code, 404)
+
 class TestAPILogsController(unittest.TestCase):
 
     def setUp(self):
@@ -860,6 +909,13 @@ class TestAPILogsController(unittest.TestCase):
         response = self.app.get("/api/plants/1/logs")
         self.assertEqual(response.status_code, 404)
 
+    def test_compresses_chart_data(self):
+        response = self.app.get("/api/plants/1/logs",
+                                headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        data = gzip.GzipFile(fileobj=StringIO.StringIO(response.data)).read()
+        self.assertIn("history", json.loads(data))
+
 
 @mock.patch("app.webservice.models.GlobalSetting")
 class TestAPIGlobalSettingsController(unittest.TestCase):
@@ -1110,6 +1166,43 @@ class TestAPIGlobalSettingsController(unittest.TestCase):
         control.save.assert_not_called()
 
 
+class TestAPIGlobalSettingsControllerUpdate(unittest.TestCase):
+    # Against the controls of the database, as held in settings.store
+
+    def setUp(self):
+        self.app = webservice.app.test_client()
+        self.app.testing = True
+        webservice.models.lazy_record.connect_db(TEST_DATABASE)
+        with open(SCHEMA) as schema:
+            webservice.models.lazy_record.load_schema(schema.read())
+
+    def tearDown(self):
+        webservice.models.lazy_record.close_db()
+
+    def update(self, id):
+        return self.app.post("/api/settings/{}".format(id), data=json.dumps({
+            'enabled': False,
+            'active': False,
+            'active_start': "01:02:00",
+            'active_end': "03:04:00"
+        }))
+
+    def test_updates_control(self):
+        control = webservice.models.Control.create(name="fan", enabled=True,
+                                                   active=False)
+        response = self.update(control.id)
+        self.assertEqual(response.status_code, 200)
+        control = webservice.models.Control.find(control.id)
+        self.assertEqual(control.enabled, False)
+        self.assertEqual(control.active_during, (time(1, 2), time(3, 4)))
+
+    def test_404s_for_unknown_control(self):
+        webservice.models.Control.create(name="fan", enabled=True,
+                                         active=False)
+        self.assertEqual(self.update(7).status_code, 404)
+        self.assertEqual(self.update("fan").status_code, 404)
+
+
 @mock.patch("app.webservice.models.PlantDatabase")
 class TestAPIDevicesController(unittest.TestCase):
 
@@ -1174,6 +1267,44 @@ class TestAPINotificationSettingsController(unittest.TestCase):
         self.assertEqual(GS.notify_maintenance, True)
 
 
+@mock.patch("app.webservice.socketio.emit")
+@mock.patch("app.webservice.models.services.Control")
+class TestUpdateControl(unittest.TestCase):
+
+    def setUp(self):
+        webservice.models.lazy_record.connect_db(TEST_DATABASE)
+        with open(SCHEMA) as schema:
+            webservice.models.lazy_record.load_schema(schema.read())
+        self.control = webservice.models.Control.create(name="fan",
+                                                        enabled=True,
+                                                        active=True)
+
+    def tearDown(self):
+        webservice.models.lazy_record.close_db()
+
+    def update_control(self, status):
+        client = webservice.socketio.test_client(webservice.app,
+                                                 namespace="/settings")
+        client.emit("update-control", str(self.control.id), status,
+                    namespace="/settings")
+
+    def test_confirms_update_once(self, Control, emit):
+        Control.return_value.off.side_effect = lambda force, then: then()
+        self.update_control("temporary_disable")
+        emit.assert_called_once_with('control-updated', {
+            'control_id': self.control.id,
+            'status': "temporary_disable"
+        }, namespace="/settings", room="default")
+
+    def test_confirms_update_that_changes_nothing(self, Control, emit):
+        Control.return_value.on.side_effect = lambda force, then: then()
+        self.update_control("activate")
+        emit.assert_called_once_with('control-updated', {
+            'control_id': self.control.id,
+            'status': "activate"
+        }, namespace="/settings", room="default")
+
+
 def build_plant(slot_id=1):
     return webservice.models.Plant(name="testPlant",
                                    photo_url="testPlant.png",
@@ -1194,5 +1325,40 @@ def create_plant(slot_id=1):
     plant.save()
     return plant
 
+class TestStaticFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.app = webservice.app.test_client()
+        self.app.testing = True
+
+    @mock.patch("app.webservice.policies.TokenRefreshPolicy")
+    def test_serves_static_files_without_request_hooks(self, policy):
+        result = self.app.get('/static/js/Chart.min.js')
+        self.assertEqual(result.status_code, 200)
+        policy.assert_not_called()
+
+    def test_links_static_files_by_fingerprint(self):
+        with webservice.app.test_request_context('/'):
+            url = webservice.flask.url_for('static',
+                                           filename='js/Chart.min.js')
+        self.assertRegexpMatches(url, r"^/static/js/Chart\.min\.\w{10}\.js$")
+        result = self.app.get(url)
+        self.assertIn("immutable", result.headers["Cache-Control"])
+
+    @mock.patch.dict("app.webservice.config.BUNDLES",
+                     {"build/head.js": ["js/flash.js", "js/Chart.min.js"]})
+    def test_links_scripts_of_bundle(self):
+        with webservice.app.test_request_context('/'):
+            urls = webservice.script_urls()["scripts"]("build/head.js")
+        self.assertEqual(len(urls), 2)
+        self.assertRegexpMatches(urls[1], r"^/static/js/Chart\.min\.")
+
+    @mock.patch("app.webservice.config.BUNDLE_ASSETS", new=True)
+    def test_links_built_bundle(self):
+        with webservice.app.test_request_context('/'):
+            urls = webservice.script_urls()["scripts"]("build/head.js")
+        self.assertEqual(urls, ["/static/build/head.js"])
+
+
 if __name__ == '__main__':
     unittest.main()